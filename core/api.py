@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, urlencode
+
+from .counters import ARTIST_COUNTER, artist_music_counter
+from .pagination import fetch_keyset_page
+
+# Columns a client may ask for with `?fields=`, the id is always returned
+ARTIST_API_FIELDS = [
+    'id', 'name', 'dob', 'gender', 'address', 'first_release_year', 'no_of_albums_released',
+    'created_at', 'updated_at',
+]
+MUSIC_API_FIELDS = ['id', 'title', 'album_name', 'genre', 'created_at', 'updated_at']
+
+DEFAULT_API_LIMIT = 50
+MAX_API_LIMIT = 500
+DEFAULT_API_GZIP_MIN_SIZE = 4 * 1024
+
+# Row count and latest change of a list in one round trip, the ETag is derived from them
+ARTIST_STATE_SQL = (
+    "SELECT 1, (SELECT value FROM core_rowcounter WHERE name = %s), (SELECT MAX(updated_at) FROM core_artist)"
+)
+MUSIC_STATE_SQL = (
+    "SELECT (SELECT 1 FROM core_artist WHERE id = %s AND deleted_at IS NULL), "
+    "(SELECT value FROM core_rowcounter WHERE name = %s), "
+    "(SELECT MAX(updated_at) FROM core_music WHERE artist_relation_id = %s)"
+)
+
+accepts_gzip = re.compile(r'\bgzip\b').search
+
+
+def api_role_required(*roles):
+    # JSON 401/403 replies instead of the login redirect of the HTML views
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({'error': 'Authentication required'}, status=401)
+            if request.user.role_type not in roles:
+                return JsonResponse({'error': 'Permission denied'}, status=403)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_fields(request, allowed):
+    """
+    Columns to select for `?fields=a,b`, all of them by default, None when one is unknown.
+    """
+    requested = [field for field in request.GET.get('fields', '').split(',') if field]
+    if not requested:
+        return list(allowed)
+    if any(field not in allowed for field in requested):
+        return None
+    # id first, keyset pagination seeks on it
+    return ['id'] + [field for field in dict.fromkeys(requested) if field != 'id']
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_API_LIMIT))
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= MAX_API_LIMIT else None
+
+
+def make_etag(count, last_updated):
+    # Every write changes the row count or moves MAX(updated_at) forward
+    digest = hashlib.sha1(f'{count or 0}:{last_updated}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def gzip_etag(etag):
+    # The gzipped body is a different representation, so it gets its own strong ETag
+    return f'{etag[:-1]}-gzip"'
+
+
+def matching_etag(request, etag):
+    tags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if '*' in tags or etag in tags:
+        return etag
+    if gzip_etag(etag) in tags:
+        return gzip_etag(etag)
+    return None
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{urlencode(params, doseq=True)}'
+
+
+def api_response(request, payload, etag):
+    """
+    JSON response carrying a strong ETag, gzipped when large and the client accepts it.
+    """
+    content = json.dumps(payload, cls=DjangoJSONEncoder).encode('utf-8')
+    response = HttpResponse(content_type='application/json')
+    min_size = getattr(settings, 'API_GZIP_MIN_SIZE', DEFAULT_API_GZIP_MIN_SIZE)
+    if len(content) >= min_size and accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        content = gzip.compress(content, compresslevel=6)
+        response['Content-Encoding'] = 'gzip'
+        etag = gzip_etag(etag)
+    response.content = content
+    response['ETag'] = etag
+    # always revalidate, a 304 costs one indexed query
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def list_params(request, allowed):
+    """
+    Returns (fields, limit, error), `error` being a 400 response for a bad query string.
+    """
+    fields = parse_fields(request, allowed)
+    if fields is None:
+        return None, None, JsonResponse({'error': f'Unknown field, choose from {", ".join(allowed)}'}, status=400)
+    limit = parse_limit(request)
+    if limit is None:
+        return None, None, JsonResponse({'error': f'limit must be between 1 and {MAX_API_LIMIT}'}, status=400)
+    return fields, limit, None
+
+
+def page_payload(request, fields, rows, next_cursor, prev_cursor):
+    return {
+        'results': [dict(zip(fields, row)) for row in rows],
+        'next': page_link(request, next_cursor),
+        'previous': page_link(request, prev_cursor),
+    }
+
+
+@api_role_required('super_admin', 'artist_manager')
+def artist_list(request):
+    # Artists as JSON, `?fields=`, `?limit=` and `?cursor=` [Role Access: super_admin, artist_manager]
+    fields, limit, error = list_params(request, ARTIST_API_FIELDS)
+    if error is not None:
+        return error
+
+    with connection.cursor() as cursor:
+        cursor.execute(ARTIST_STATE_SQL, [ARTIST_COUNTER])
+        _, count, last_updated = cursor.fetchone()
+        etag = make_etag(count, last_updated)
+        matched = matching_etag(request, etag)
+        if matched:
+            return not_modified(matched)
+        rows, next_cursor, prev_cursor = fetch_keyset_page(
+            cursor, fields, 'core_artist', limit, request.GET.get('cursor'), 'deleted_at IS NULL')
+
+    return api_response(request, page_payload(request, fields, rows, next_cursor, prev_cursor), etag)
+
+
+@api_role_required('super_admin')
+def song_list(request, artist_id):
+    # Songs of one artist as JSON, same parameters as artist_list [Role Access: super_admin]
+    fields, limit, error = list_params(request, MUSIC_API_FIELDS)
+    if error is not None:
+        return error
+
+    with connection.cursor() as cursor:
+        cursor.execute(MUSIC_STATE_SQL, [artist_id, artist_music_counter(artist_id), artist_id])
+        exists, count, last_updated = cursor.fetchone()
+        if not exists:
+            return JsonResponse({'error': 'Artist not found'}, status=404)
+        etag = make_etag(count, last_updated)
+        matched = matching_etag(request, etag)
+        if matched:
+            return not_modified(matched)
+        rows, next_cursor, prev_cursor = fetch_keyset_page(
+            cursor, fields, 'core_music', limit, request.GET.get('cursor'), 'artist_relation_id = %s', [artist_id])
+
+    return api_response(request, page_payload(request, fields, rows, next_cursor, prev_cursor), etag)
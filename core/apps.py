@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # pragmas for every SQLite connection (read-only on the replica), including the first one
+        from . import sqlite  # noqa: F401
+        from . import replica  # noqa: F401
+        # times queries from the first connection on, before any middleware is loaded
+        from . import metrics  # noqa: F401
\ No newline at end of file
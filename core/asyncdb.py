@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+DEFAULT_ASYNC_DB_THREADS = 8
+
+# Async views run their queries here instead of the single thread sync_to_async uses by
+# default, the pool size bounds how many connections async requests keep open
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_DB_THREADS', DEFAULT_ASYNC_DB_THREADS),
+    thread_name_prefix='core-db',
+)
+
+
+def call_db(func, *args, **kwargs):
+    # Pool threads live across requests, give their connections the request lifecycle
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Runs blocking database work from an async view on the DB pool and awaits its result.
+    """
+    return await sync_to_async(call_db, thread_sensitive=False, executor=DB_EXECUTOR)(func, *args, **kwargs)
@@ -0,0 +1,129 @@
+import time
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core import signing
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .asyncdb import run_db
+
+SNAPSHOT_SESSION_KEY = '_user_snapshot'
+SNAPSHOT_SALT = 'core.auth.snapshot'
+# What the role decorators, templates and admin read on every request, the rest is deferred
+SNAPSHOT_FIELDS = ['id', 'email', 'role_type', 'is_staff', 'is_superuser']
+
+DEFAULT_AUTH_SNAPSHOT_TTL = 300
+
+
+def get_snapshot_ttl():
+    return getattr(settings, 'AUTH_SNAPSHOT_TTL', DEFAULT_AUTH_SNAPSHOT_TTL)
+
+
+def check_revocation_cache():
+    """
+    Revocations must reach every server process, a per-process (or no-op) cache would let
+    a demoted or deleted user keep their old role on the others for a whole TTL.
+    """
+    if get_snapshot_ttl() and isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            'Auth snapshots need a cache shared by every server process: set CACHES["default"] '
+            'to a file, database, memcached or redis backend, or AUTH_SNAPSHOT_TTL = 0')
+
+
+def revoked_key(user_id):
+    return f'core.auth.revoked:{user_id}'
+
+
+def revoke_snapshot(user_id):
+    """
+    Makes every session of the user reload the row on its next request.
+
+    Revocation is recorded once the write commits, a request reloading the row before
+    that would otherwise keep the old values for a whole TTL.
+    """
+    transaction.on_commit(lambda: cache.set(revoked_key(user_id), time.time(), get_snapshot_ttl()))
+
+
+def make_snapshot(user, loaded_at):
+    """
+    `loaded_at` is taken before the row is read, a revocation committed while it was being
+    read is then newer than the snapshot.
+    """
+    return signing.dumps({
+        'user': {field: getattr(user, field) for field in SNAPSHOT_FIELDS},
+        # derived from the password hash the row held, like the session's own hash
+        'password': user.get_session_auth_hash(),
+        'at': loaded_at,
+    }, salt=SNAPSHOT_SALT)
+
+
+def user_from_snapshot(request):
+    """
+    Rebuilds the user from the session snapshot without a query, None when there is
+    no usable snapshot.
+    """
+    token = request.session.get(SNAPSHOT_SESSION_KEY)
+    if not token or not get_snapshot_ttl():
+        return None
+    try:
+        snapshot = signing.loads(token, salt=SNAPSHOT_SALT, max_age=get_snapshot_ttl())
+    except signing.BadSignature:
+        return None
+
+    values = snapshot['user']
+    # the snapshot must belong to the user and password the session was logged in with
+    if str(values['id']) != str(request.session.get(SESSION_KEY)):
+        return None
+    if not constant_time_compare(snapshot.get('password', ''), request.session.get(HASH_SESSION_KEY) or ''):
+        return None
+    revoked = cache.get(revoked_key(values['id']))
+    if revoked is not None and revoked >= snapshot['at']:
+        return None
+
+    User = auth.get_user_model()
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    # every other field is deferred, reading one loads the full row
+    return User.from_db(DEFAULT_DB_ALIAS, fields, [values[field] for field in fields])
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        user = user_from_snapshot(request)
+        if user is None:
+            # full check against the database, then remember the result
+            loaded_at = time.time()
+            user = auth.get_user(request)
+            if user.is_authenticated and get_snapshot_ttl():
+                request.session[SNAPSHOT_SESSION_KEY] = make_snapshot(user, loaded_at)
+        request._cached_user = user
+    return request._cached_user
+
+
+async def aget_user(request):
+    """
+    get_user for async views, the session and user lookups run on the DB pool.
+    """
+    return await run_db(get_user, request)
+
+
+class SnapshotAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware that reads the user from a signed snapshot kept in the
+    session, loading the `user` row only when the snapshot is missing, expired or revoked.
+    Refuses to start when revocations could not reach the other server processes.
+    """
+    def __init__(self, get_response):
+        check_revocation_cache()
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -16,4 +16,28 @@ GENRE_CHOICES = [
     ('classic', 'Classic'),
     ('rock', 'Rock'),
     ('jazz', 'Jazz'),
-]
\ No newline at end of file
+]
+
+BULK_SONG_ACTION_CHOICES = [
+    ('delete', 'Delete'),
+    ('set_genre', 'Change genre'),
+    ('move', 'Move to artist'),
+]
+
+IMPORT_JOB_KIND_CHOICES = [
+    ('artist', 'Artist'),
+    ('music', 'Music'),
+    ('user', 'User'),
+]
+
+IMPORT_MODE_CHOICES = [
+    ('insert', 'Insert, reject rows matching an existing artist'),
+    ('upsert', 'Upsert, update artists matching the natural key'),
+]
+
+IMPORT_JOB_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
@@ -0,0 +1,97 @@
+USER_COUNTER = 'user'
+ARTIST_COUNTER = 'core_artist'
+MUSIC_COUNTER = 'core_music'
+ARTIST_MUSIC_PREFIX = 'core_music:artist:'
+
+# Songs whose artist is not tombstoned
+LIVE_SONGS_SQL = "artist_relation_id IN (SELECT id FROM core_artist WHERE deleted_at IS NULL)"
+
+
+def artist_music_counter(artist_id):
+    # Counter of the songs belonging to a single artist
+    return f'{ARTIST_MUSIC_PREFIX}{artist_id}'
+
+
+def get_count(cursor, name):
+    """
+    Reads a maintained row count with a single indexed lookup.
+    """
+    cursor.execute("SELECT value FROM core_rowcounter WHERE name = %s", [name])
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def adjust_count(cursor, name, delta):
+    """
+    Adds `delta` to a counter, creating it when missing.
+
+    Call it in the same transaction as the insert/delete it accounts for.
+    """
+    if not delta:
+        return
+    cursor.execute(
+        "INSERT INTO core_rowcounter (name, value) VALUES (%s, %s) "
+        "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+        [name, delta]
+    )
+
+
+def drop_count(cursor, name):
+    cursor.execute("DELETE FROM core_rowcounter WHERE name = %s", [name])
+
+
+def drop_counts(cursor, names):
+    if names:
+        cursor.execute(f"DELETE FROM core_rowcounter WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+
+
+def compute_counts(cursor):
+    """
+    Counts every table the hard way, returns {counter name: rows}.
+    """
+    counts = {}
+    cursor.execute("SELECT COUNT(*) FROM user")
+    counts[USER_COUNTER] = cursor.fetchone()[0]
+    # tombstoned artists and their songs are not counted, the purge removes them later
+    cursor.execute("SELECT COUNT(*) FROM core_artist WHERE deleted_at IS NULL")
+    counts[ARTIST_COUNTER] = cursor.fetchone()[0]
+
+    cursor.execute(
+        f"SELECT artist_relation_id, COUNT(*) FROM core_music WHERE {LIVE_SONGS_SQL} GROUP BY artist_relation_id")
+    counts[MUSIC_COUNTER] = 0
+    for artist_id, total in cursor.fetchall():
+        counts[artist_music_counter(artist_id)] = total
+        counts[MUSIC_COUNTER] += total
+    return counts
+
+
+def stored_counts(cursor):
+    cursor.execute("SELECT name, value FROM core_rowcounter")
+    return dict(cursor.fetchall())
+
+
+def check_counts(cursor):
+    """
+    Returns [(name, stored, actual)] for every counter that drifted.
+    """
+    actual = compute_counts(cursor)
+    stored = stored_counts(cursor)
+    mismatches = []
+    for name in sorted(set(actual) | set(stored)):
+        # a missing per-artist counter is the same as zero songs
+        if stored.get(name, 0) != actual.get(name, 0):
+            mismatches.append((name, stored.get(name, 0), actual.get(name, 0)))
+    return mismatches
+
+
+def rebuild_counts(cursor):
+    """
+    Replaces every counter with a fresh count. Run it inside a transaction.
+    """
+    counts = compute_counts(cursor)
+    cursor.execute("DELETE FROM core_rowcounter")
+    cursor.executemany(
+        "INSERT INTO core_rowcounter (name, value) VALUES (%s, %s)",
+        list(counts.items())
+    )
+    return counts
@@ -0,0 +1,115 @@
+import csv
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .exports import Echo, iter_batches
+
+SYNC_TOKEN_SALT = 'core.delta'
+
+# Each pull starts this many seconds before the previous one ended, a transaction that
+# committed after the previous pull may carry an older updated_at
+DEFAULT_DELTA_OVERLAP_SECONDS = 60
+# Tombstones and song deletions are kept this long, older sync tokens are refused
+DEFAULT_DELTA_RETENTION_DAYS = 7
+
+# created_at/updated_at are stored as text, the same format as NOW_SQL
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+NOW_SQL = "SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Every row changed in (since, until], tombstones included, in updated_at order
+ARTIST_DELTA_HEADERS = [
+    'ID', 'Name', 'Date of Birth', 'Gender', 'Address', 'First Release Year', 'Number of Albums Released',
+    'Created At', 'Updated At', 'Deleted At',
+]
+ARTIST_DELTA_SQL = (
+    "SELECT id, name, dob, gender, address, first_release_year, no_of_albums_released, "
+    "created_at, updated_at, deleted_at "
+    "FROM core_artist WHERE updated_at > %s AND updated_at <= %s ORDER BY updated_at, id"
+)
+
+# Songs of an artist with a Deleted At are gone as well, they are not listed one by one
+MUSIC_DELTA_HEADERS = ['ID', 'Artist ID', 'Title', 'Album Name', 'Genre', 'Created At', 'Updated At', 'Deleted At']
+MUSIC_DELTA_SQL = (
+    "SELECT id, artist_relation_id, title, album_name, genre, created_at, updated_at, NULL "
+    "FROM core_music WHERE updated_at > %s AND updated_at <= %s ORDER BY updated_at, id"
+)
+MUSIC_DELETION_DELTA_SQL = (
+    "SELECT music_id, artist_id, NULL, NULL, NULL, NULL, deleted_at, deleted_at "
+    "FROM core_musicdeletion WHERE deleted_at > %s AND deleted_at <= %s ORDER BY deleted_at, id"
+)
+
+DELTA_QUERIES = {
+    'core_artist': [ARTIST_DELTA_SQL],
+    'core_music': [MUSIC_DELTA_SQL, MUSIC_DELETION_DELTA_SQL],
+}
+
+
+def get_delta_overlap():
+    return timedelta(seconds=getattr(settings, 'DELTA_OVERLAP_SECONDS', DEFAULT_DELTA_OVERLAP_SECONDS))
+
+
+def get_delta_retention():
+    return timedelta(days=getattr(settings, 'DELTA_RETENTION_DAYS', DEFAULT_DELTA_RETENTION_DAYS))
+
+
+def format_timestamp(value):
+    return value.strftime(TIMESTAMP_FORMAT)[:-3]
+
+
+def retention_cutoff():
+    """
+    Tombstones and song deletions older than this can be purged, no valid sync token predates it.
+    """
+    return format_timestamp(timezone.now() - get_delta_retention())
+
+
+def make_sync_token(table, until):
+    return signing.dumps({'table': table, 'until': until}, salt=SYNC_TOKEN_SALT)
+
+
+def read_sync_token(token, table):
+    """
+    Returns the end of the previous pull stored in a sync token, or None when the token
+    is malformed, tampered with or was issued for another table.
+    """
+    try:
+        data = signing.loads(token, salt=SYNC_TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get('table') != table or not isinstance(data.get('until'), str):
+        return None
+    return data['until']
+
+
+def delta_window(cursor, until=None, now=None):
+    """
+    Returns (since, until) for a pull following one that ended at `until`, None for a full pull.
+    `since` is None when the previous pull is older than the retention, deletions may be lost.
+    The pull ends `now`, the database clock by default, or the time a replica's rows stop at.
+    """
+    if now is None:
+        cursor.execute(NOW_SQL)
+        now = cursor.fetchone()[0]
+    if until is None:
+        return '', now
+    if until < retention_cutoff():
+        return None, now
+    since = datetime.strptime(until, TIMESTAMP_FORMAT) - get_delta_overlap()
+    return format_timestamp(since), now
+
+
+def stream_delta_csv(headers, queries, since, until, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Yields the rows of every query in `queries` changed in (since, until] as one CSV document.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+
+    with connections[using].cursor() as cursor:
+        for sql in queries:
+            for rows in iter_batches(cursor, sql, [since, until], batch_size):
+                yield ''.join([writer.writerow(row) for row in rows])
@@ -0,0 +1,235 @@
+import csv
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .asyncdb import run_db
+
+# Number of rows pulled from the cursor per `fetchmany` call
+DEFAULT_EXPORT_BATCH_SIZE = 2000
+
+# Layout of the `/export_csv/` downloads, the one the imports read: header labels and the
+# columns of the export engine's rows (see ARTIST_EXPORT_FIELDS) they are taken from
+ARTIST_EXPORT_HEADERS = ['Name', 'Date of Birth', 'Gender', 'Address', 'First Release Year', 'Number of Albums Released']
+ARTIST_EXPORT_COLUMNS = [1, 2, 3, 4, 5, 6]
+MUSIC_EXPORT_HEADERS = ['Artist', 'Title', 'Album Name', 'Genre']
+MUSIC_EXPORT_COLUMNS = [2, 3, 4, 5]
+# Header label of each export engine field in CSV, the imports find their columns by these
+EXPORT_LABELS = {
+    'id': 'ID',
+    'name': 'Name',
+    'dob': 'Date of Birth',
+    'gender': 'Gender',
+    'address': 'Address',
+    'first_release_year': 'First Release Year',
+    'no_of_albums_released': 'Number of Albums Released',
+    'artist_id': 'Artist ID',
+    'artist': 'Artist',
+    'title': 'Title',
+    'album_name': 'Album Name',
+    'genre': 'Genre',
+}
+
+
+class Echo:
+    """
+    File-like object whose `write` hands the value back, so `csv.writer`
+    formats a row without buffering it anywhere.
+    """
+    def write(self, value):
+        return value
+
+
+def get_export_batch_size():
+    return getattr(settings, 'EXPORT_BATCH_SIZE', DEFAULT_EXPORT_BATCH_SIZE)
+
+
+def iter_batches(cursor, sql, params=(), batch_size=None):
+    """
+    Runs `sql` and yields its rows `batch_size` at a time.
+    """
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size or get_export_batch_size())
+        if not rows:
+            break
+        yield rows
+
+
+def fetch_after(sql, last_id, batch_size, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [last_id, batch_size])
+        return cursor.fetchall()
+
+
+def to_bytes(chunk):
+    return chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def gzip_stream(chunks):
+    """
+    Compresses a stream of text or byte chunks into a gzip stream on the fly.
+    """
+    # wbits=31 writes the gzip header and trailer
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(to_bytes(chunk))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(to_bytes(chunk))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Export engine: `?format=`, `?gzip=1` and `?after_id=` resumption. The id is the first
+# column of every query and of the output, a broken download resumes after the last id received
+ARTIST_EXPORT_FIELDS = ['id', 'name', 'dob', 'gender', 'address', 'first_release_year', 'no_of_albums_released']
+ARTIST_EXPORT_ENGINE_SQL = (
+    f"SELECT {', '.join(ARTIST_EXPORT_FIELDS)} FROM core_artist "
+    "WHERE id > %s AND deleted_at IS NULL ORDER BY id"
+)
+ARTIST_EXPORT_ENGINE_AFTER_SQL = ARTIST_EXPORT_ENGINE_SQL + " LIMIT %s"
+
+MUSIC_EXPORT_FIELDS = ['id', 'artist_id', 'artist', 'title', 'album_name', 'genre']
+MUSIC_EXPORT_ENGINE_SQL = (
+    "SELECT core_music.id, core_music.artist_relation_id, core_artist.name, "
+    "core_music.title, core_music.album_name, core_music.genre "
+    "FROM core_music INNER JOIN core_artist ON core_artist.id = core_music.artist_relation_id "
+    "WHERE core_music.id > %s AND core_artist.deleted_at IS NULL ORDER BY core_music.id"
+)
+
+
+class CsvFormat:
+    """
+    CSV with a header row. The trailer is a `#` comment line, the CSV exports are also
+    import files so it is only written on request.
+    """
+    content_type = 'text/csv'
+    extension = 'csv'
+    trailer_by_default = False
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow([EXPORT_LABELS.get(field, field) for field in self.fields])
+
+    def rows(self, rows):
+        return ''.join([self.writer.writerow(row) for row in rows])
+
+    def trailer(self, summary):
+        return '# ' + ' '.join(f'{key}={value}' for key, value in summary.items()) + '\r\n'
+
+
+class NdjsonFormat:
+    """
+    One JSON object per line, the trailer is a last `{"trailer": {...}}` line.
+    """
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+    trailer_by_default = True
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+    def header(self):
+        return ''
+
+    def rows(self, rows):
+        return ''.join([self.encoder.encode(dict(zip(self.fields, row))) + '\n' for row in rows])
+
+    def trailer(self, summary):
+        return self.encoder.encode({'trailer': summary}) + '\n'
+
+
+# `?format=` values, add a class with the same interface to support another one
+EXPORT_FORMATS = {
+    'csv': CsvFormat,
+    'ndjson': NdjsonFormat,
+}
+
+
+class ExportEncoder:
+    """
+    Turns batches of rows into bytes of one format while counting them, the trailer
+    carries the row count, the last id and the SHA-256 of every byte between the
+    header and the trailer.
+
+    `columns`, when given, are the positions of the row written out under `fields`,
+    the id stays the first column of the rows either way.
+    """
+    def __init__(self, export_format, fields, after_id=0, trailer=None, columns=None):
+        self.format = EXPORT_FORMATS[export_format](fields)
+        self.with_trailer = self.format.trailer_by_default if trailer is None else trailer
+        self.columns = columns
+        self.after_id = after_id
+        self.checksum = hashlib.sha256()
+        self.count = 0
+        self.last_id = after_id
+
+    def header(self):
+        # a resumed download is appended to the part received before, which has the header
+        if self.after_id:
+            return b''
+        return self.format.header().encode('utf-8')
+
+    def batch(self, rows):
+        written = rows if self.columns is None else [[row[column] for column in self.columns] for row in rows]
+        data = self.format.rows(written).encode('utf-8')
+        self.checksum.update(data)
+        self.count += len(rows)
+        self.last_id = rows[-1][0]
+        return data
+
+    def trailer(self):
+        if not self.with_trailer:
+            return b''
+        summary = {'rows': self.count, 'last_id': self.last_id, 'sha256': self.checksum.hexdigest()}
+        return self.format.trailer(summary).encode('utf-8')
+
+
+def stream_export(encoder, sql, after_id=0, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Yields the rows of `sql` with an id above `after_id` as bytes, one batch at a time,
+    memory stays bounded by the batch size.
+    """
+    yield encoder.header()
+
+    with connections[using].cursor() as cursor:
+        for rows in iter_batches(cursor, sql, [after_id], batch_size):
+            yield encoder.batch(rows)
+
+    yield encoder.trailer()
+
+
+async def astream_export(encoder, sql, after_id=0, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    stream_export for async views, `sql` takes the id and a LIMIT like ARTIST_EXPORT_ENGINE_AFTER_SQL.
+    Each batch is its own keyset query on the DB pool, so no cursor is held across threads,
+    rows committed during the export may be included.
+    """
+    yield encoder.header()
+
+    batch_size = batch_size or get_export_batch_size()
+    last_id = after_id
+    while True:
+        rows = await run_db(fetch_after, sql, last_id, batch_size, using)
+        if rows:
+            last_id = rows[-1][0]
+            yield encoder.batch(rows)
+        if len(rows) < batch_size:
+            break
+
+    yield encoder.trailer()
@@ -1,6 +1,12 @@
 from django import forms
 
-from .constants import GENDER_CHOICES, ROLE_TYPE_CHOICES
+from .constants import (
+    BULK_SONG_ACTION_CHOICES,
+    GENDER_CHOICES,
+    GENRE_CHOICES,
+    IMPORT_MODE_CHOICES,
+    ROLE_TYPE_CHOICES
+    )
 from .models import Artist, Music
 
 
@@ -57,6 +63,21 @@ class ArtistUpdateForm(forms.Form):
 
 class ArtistImportForm(forms.Form):
     csv_file = forms.FileField(label='CSV File')
+    batch_size = forms.IntegerField(
+        min_value=1, required=False, help_text='Rows inserted per transaction')
+    in_background = forms.BooleanField(
+        required=False, help_text='Queue the file for the import worker, large files always are')
+    mode = forms.ChoiceField(
+        choices=IMPORT_MODE_CHOICES, initial='insert',
+        help_text='Rows are matched to existing artists on ARTIST_NATURAL_KEY, name and date of birth by default')
+
+
+class MusicImportForm(ArtistImportForm):
+    mode = None
+
+
+class UserImportForm(ArtistImportForm):
+    mode = None
 
 
 class MusicForm(forms.ModelForm):
@@ -67,4 +88,37 @@ class MusicForm(forms.ModelForm):
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'album_name': forms.TextInput(attrs={'class': 'form-control'}),
             'genre': forms.Select(attrs={'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+
+class IdListField(forms.Field):
+    # Ids of the rows ticked on a list page, sent as repeated `ids` values
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return sorted({int(item) for item in value or []})
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Invalid selection.')
+
+
+class BulkArtistForm(forms.Form):
+    action = forms.ChoiceField(choices=[('delete', 'Delete')])
+    ids = IdListField()
+
+
+class BulkSongForm(forms.Form):
+    action = forms.ChoiceField(choices=BULK_SONG_ACTION_CHOICES)
+    ids = IdListField()
+    genre = forms.ChoiceField(choices=GENRE_CHOICES, required=False)
+    target_artist = forms.IntegerField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+
+        if action == 'set_genre' and not cleaned_data.get('genre'):
+            self.add_error('genre', 'Pick the new genre.')
+        if action == 'move' and not cleaned_data.get('target_artist'):
+            self.add_error('target_artist', 'Pick the artist to move the songs to.')
+        return cleaned_data
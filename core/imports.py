@@ -0,0 +1,460 @@
+import codecs
+import csv
+import multiprocessing
+import os
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, connection, transaction
+
+from .constants import GENDER_CHOICES, GENRE_CHOICES, ROLE_TYPE_CHOICES
+
+from .counters import (
+    USER_COUNTER,
+    ARTIST_COUNTER,
+    MUSIC_COUNTER,
+    artist_music_counter,
+    adjust_count
+    )
+from .naturalkeys import ARTIST_KEY_FIELDS, make_artist_key
+from .pagecache import ARTIST_VERSION, bump_versions, music_version
+from .repositories import NOW_SQL, MUSIC_INSERT_SQL, USER_INSERT_SQL, id_batches
+from .stats import record_artists, record_songs
+from .validation import (
+    Column,
+    ErrorReport,
+    NumberedRow,
+    choice_check,
+    date_check,
+    email_check,
+    integer_check,
+    map_header,
+    text_check,
+    validate_batch
+    )
+
+# Number of rows sent per `executemany` call, each batch is one transaction
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+# Largest value of a PositiveIntegerField
+MAX_POSITIVE_INTEGER = 2147483647
+
+
+class ImportResult(namedtuple('ImportResult',
+                              ['imported', 'rejected', 'elapsed', 'updated', 'skipped', 'error_report'],
+                              defaults=(0, 0, None))):
+    __slots__ = ()
+
+    @property
+    def throughput(self):
+        # Rows imported per second
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+
+ARTIST_INSERT_SQL = (
+    "INSERT INTO core_artist (name, dob, gender, address, first_release_year, no_of_albums_released, "
+    "natural_key, created_at, updated_at) "
+    f"VALUES (%s, %s, %s, %s, %s, %s, %s, {NOW_SQL}, {NOW_SQL})"
+)
+# The partial unique index on natural_key is the conflict target, tombstones have no key
+ARTIST_UPSERT_SQL = (
+    f"{ARTIST_INSERT_SQL} ON CONFLICT (natural_key) WHERE natural_key IS NOT NULL DO UPDATE SET "
+    + ', '.join(f'{field} = excluded.{field}' for field in ARTIST_KEY_FIELDS)
+    + ", updated_at = excluded.updated_at"
+)
+ARTIST_BY_KEY_SQL = f"SELECT natural_key, {', '.join(ARTIST_KEY_FIELDS)} FROM core_artist WHERE natural_key IN "
+
+
+def get_import_batch_size():
+    return getattr(settings, 'IMPORT_BATCH_SIZE', DEFAULT_IMPORT_BATCH_SIZE)
+
+
+def read_csv(uploaded_file):
+    """
+    Reads an upload as a stream of CSV rows, without decoding it all up front.
+    """
+    return csv.reader(codecs.iterdecode(uploaded_file, 'utf-8-sig'))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_batches(sql, rows, batch_size=None, after_batch=None, progress=None, on_reject=None):
+    """
+    Inserts `rows` with one `executemany` per batch, each batch in its own transaction.
+
+    `after_batch(cursor, inserted_rows)` runs inside the batch transaction. A batch the
+    database refuses is replayed row by row so only the offending rows are rejected,
+    `on_reject(row, exc)` is called for each of them.
+    `progress(inserted, rejected)` is called with the running totals after each batch.
+    Returns (inserted, rejected).
+    """
+    inserted = rejected = 0
+    for batch in chunked(rows, batch_size or get_import_batch_size()):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+                if after_batch:
+                    after_batch(cursor, batch)
+            inserted += len(batch)
+            if progress:
+                progress(inserted, rejected)
+            continue
+        except DatabaseError:
+            pass
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            accepted = []
+            for row in batch:
+                try:
+                    with transaction.atomic():
+                        cursor.execute(sql, row)
+                    accepted.append(row)
+                except DatabaseError as exc:
+                    rejected += 1
+                    if on_reject:
+                        on_reject(row, exc)
+            if after_batch and accepted:
+                after_batch(cursor, accepted)
+        inserted += len(accepted)
+        if progress:
+            progress(inserted, rejected)
+    return inserted, rejected
+
+
+# Columns of an artist import, in ARTIST_KEY_FIELDS order, found by header name
+ARTIST_COLUMNS = [
+    Column('name', ['name', 'artist', 'artist_name'], text_check(max_length=255), True),
+    Column('dob', ['dob', 'date_of_birth', 'birth_date'], date_check(required=False), False),
+    Column('gender', ['gender'], choice_check(GENDER_CHOICES), True),
+    Column('address', ['address'], text_check(required=False), False),
+    Column('first_release_year', ['first_release_year', 'first_release'], date_check(), True),
+    Column(
+        'no_of_albums_released', ['no_of_albums_released', 'number_of_albums_released', 'albums_released', 'albums'],
+        integer_check(0, MAX_POSITIVE_INTEGER), True),
+]
+
+
+def read_rows(uploaded_file, columns, batch_size=None):
+    """
+    Reads an upload whose first line is a header, validating it a batch at a time and
+    column by column. Returns (report, rows): rows yields the valid ones as NumberedRow
+    of cleaned values in `columns` order, invalid ones go to the ErrorReport with their
+    line and reason. Raises CsvHeaderError when the header lacks a required column.
+    """
+    reader = read_csv(uploaded_file)
+    header = next(reader, [])
+    positions = map_header(header, columns)
+    report = ErrorReport(header)
+
+    def numbered_rows():
+        # a quoted value may span lines, rows are numbered by the line they start on
+        end = reader.line_num
+        for row in reader:
+            start, end = end + 1, reader.line_num
+            if any(row):
+                yield start, row
+
+    def valid_rows():
+        for batch in chunked(numbered_rows(), batch_size or get_import_batch_size()):
+            valid, invalid = validate_batch(batch, columns, positions)
+            for line, row, message in invalid:
+                report.add(line, row, message)
+            yield from valid
+
+    return report, valid_rows()
+
+
+def read_artist_rows(uploaded_file, batch_size=None):
+    """
+    Reads an artist upload, see read_rows. The valid rows are keyed on their natural key.
+    """
+    report, rows = read_rows(uploaded_file, ARTIST_COLUMNS, batch_size)
+    artist_key = make_artist_key()
+    return report, (NumberedRow(row + (artist_key(row),), row.line, row.source) for row in rows)
+
+
+def reject_row(report):
+    def on_reject(row, exc):
+        report.add(row.line, row.source, f'Refused by the database: {exc}')
+    return on_reject
+
+
+def count_artists(cursor, batch):
+    adjust_count(cursor, ARTIST_COUNTER, len(batch))
+    record_artists(cursor, ((row[2], row[4]) for row in batch))
+    bump_versions(cursor, [ARTIST_VERSION])
+
+
+def import_artists(uploaded_file, batch_size=None, progress=None):
+    """
+    Bulk imports artists, see read_artist_rows and insert_batches. Rows with the natural key
+    of a live artist are rejected. Every rejected row is listed in the stored error report.
+    `progress(imported, rejected)` is called after every batch.
+    """
+    started = time.monotonic()
+    report, rows = read_artist_rows(uploaded_file, batch_size)
+
+    def report_progress(inserted, rejected):
+        progress(inserted, report.count)
+
+    imported, _ = insert_batches(
+        ARTIST_INSERT_SQL, rows, batch_size, count_artists, report_progress if progress else None,
+        reject_row(report))
+    return ImportResult(
+        imported, report.count, time.monotonic() - started, error_report=report.save())
+
+
+def as_text(values):
+    # the database hands back dates and numbers, the CSV strings
+    return tuple(None if value is None else str(value) for value in values)
+
+
+def upsert_artist_batch(cursor, batch):
+    """
+    Upserts keyed artist rows, one lookup and one `executemany` for the batch. Rows equal
+    to the artist they match are skipped. Returns a Counter of inserted, updated and skipped.
+    """
+    existing = {}
+    for keys, marks in id_batches([row[-1] for row in batch]):
+        cursor.execute(f"{ARTIST_BY_KEY_SQL}({marks})", keys)
+        existing.update((row[0], row[1:]) for row in cursor.fetchall())
+
+    inserted, updated, skipped = [], [], 0
+    for row in batch:
+        current = existing.get(row[-1])
+        if current is None:
+            inserted.append(row)
+        elif as_text(current) == as_text(row[:-1]):
+            skipped += 1
+        else:
+            updated.append((row, current))
+
+    if inserted or updated:
+        cursor.executemany(ARTIST_UPSERT_SQL, inserted + [row for row, _ in updated])
+    if inserted:
+        count_artists(cursor, inserted)
+    if updated:
+        # move the updated artists between the gender/decade rollups
+        record_artists(cursor, ((current[2], current[4]) for _, current in updated), sign=-1)
+        record_artists(cursor, ((row[2], row[4]) for row, _ in updated))
+        bump_versions(cursor, [ARTIST_VERSION])
+    return Counter(inserted=len(inserted), updated=len(updated), skipped=skipped)
+
+
+def upsert_artists(uploaded_file, batch_size=None, progress=None):
+    """
+    Imports artists keyed on ARTIST_NATURAL_KEY: a live artist with the same key is updated
+    instead of copied. Later rows repeating a key of the file are skipped before they reach
+    the database, a set of the keys seen so far is kept in memory. Rows are validated and
+    rejected rows reported as in import_artists.
+
+    `progress(inserted, rejected, updated, skipped)` is called after every batch.
+    """
+    started = time.monotonic()
+    report, rows = read_artist_rows(uploaded_file, batch_size)
+    on_reject = reject_row(report)
+    totals = Counter()
+    seen = set()
+
+    def unseen_rows():
+        for row in rows:
+            if row[-1] in seen:
+                totals['skipped'] += 1
+            else:
+                seen.add(row[-1])
+                yield row
+
+    for batch in chunked(unseen_rows(), batch_size or get_import_batch_size()):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                totals.update(upsert_artist_batch(cursor, batch))
+        except DatabaseError:
+            # replayed row by row so only the offending rows are rejected
+            with transaction.atomic(), connection.cursor() as cursor:
+                for row in batch:
+                    try:
+                        with transaction.atomic():
+                            totals.update(upsert_artist_batch(cursor, [row]))
+                    except DatabaseError as exc:
+                        on_reject(row, exc)
+        if progress:
+            progress(totals['inserted'], report.count, totals['updated'], totals['skipped'])
+
+    return ImportResult(
+        totals['inserted'], report.count, time.monotonic() - started, totals['updated'], totals['skipped'],
+        report.save())
+
+
+def load_artist_ids(cursor):
+    """
+    Maps artist name to id in one pass over core_artist, the oldest artist wins on duplicate names.
+    """
+    cursor.execute("SELECT id, name FROM core_artist WHERE deleted_at IS NULL ORDER BY id")
+    artist_ids = {}
+    for artist_id, name in cursor:
+        artist_ids.setdefault(name, artist_id)
+    return artist_ids
+
+
+def count_music(cursor, batch):
+    adjust_count(cursor, MUSIC_COUNTER, len(batch))
+    artist_songs = Counter(row[0] for row in batch)
+    for artist_id, songs in artist_songs.items():
+        adjust_count(cursor, artist_music_counter(artist_id), songs)
+    record_songs(cursor, ((row[0], row[3]) for row in batch))
+    bump_versions(cursor, map(music_version, artist_songs))
+
+
+# Columns of a song import, the artist is resolved to its id by name
+MUSIC_COLUMNS = [
+    Column('artist', ['artist', 'artist_name'], text_check(max_length=255), True),
+    Column('title', ['title'], text_check(max_length=255), True),
+    Column('album_name', ['album_name', 'album'], text_check(max_length=255), True),
+    Column('genre', ['genre'], choice_check(GENRE_CHOICES), True),
+]
+
+
+def read_music_rows(uploaded_file, batch_size=None):
+    """
+    Reads a song upload, see read_rows. Artists are resolved by name from a lookup built
+    once per import, a row naming an unknown artist is reported and left out.
+    """
+    with connection.cursor() as cursor:
+        artist_ids = load_artist_ids(cursor)
+    report, rows = read_rows(uploaded_file, MUSIC_COLUMNS, batch_size)
+
+    def resolved_rows():
+        for row in rows:
+            artist_id = artist_ids.get(row[0])
+            if artist_id is None:
+                report.add(row.line, row.source, f'artist {row[0]!r} does not exist')
+            else:
+                yield NumberedRow((artist_id,) + row[1:], row.line, row.source)
+
+    return report, resolved_rows()
+
+
+def import_music(uploaded_file, batch_size=None, progress=None):
+    """
+    Bulk imports songs, see read_music_rows and insert_batches. Every rejected row is listed
+    in the stored error report. `progress(imported, rejected)` is called after every batch.
+    """
+    started = time.monotonic()
+    report, rows = read_music_rows(uploaded_file, batch_size)
+
+    def report_progress(inserted, rejected):
+        progress(inserted, report.count)
+
+    imported, _ = insert_batches(
+        MUSIC_INSERT_SQL, rows, batch_size, count_music, report_progress if progress else None,
+        reject_row(report))
+    return ImportResult(imported, report.count, time.monotonic() - started, error_report=report.save())
+
+
+# Columns of a user import, in USER_INSERT_SQL order
+USER_COLUMNS = [
+    Column('first_name', ['first_name', 'first'], text_check(max_length=50), True),
+    Column('last_name', ['last_name', 'last'], text_check(max_length=50, required=False), False),
+    Column('email', ['email', 'email_address'], email_check(), True),
+    Column('phone', ['phone', 'phone_number'], text_check(max_length=15, required=False), False),
+    Column('dob', ['dob', 'date_of_birth', 'birth_date'], date_check(required=False), False),
+    Column('gender', ['gender'], choice_check(GENDER_CHOICES), True),
+    Column('address', ['address'], text_check(required=False), False),
+    Column('role_type', ['role_type', 'role'], choice_check(ROLE_TYPE_CHOICES), True),
+    Column('password', ['password'], text_check(required=False), False),
+]
+USER_BY_EMAIL_SQL = "SELECT lower(email) FROM user WHERE lower(email) IN "
+
+
+def read_user_rows(uploaded_file, batch_size=None):
+    """
+    Reads a user upload, see read_rows. Emails are unique whatever their case: a row whose
+    email is already taken, by a user or an earlier row of the file, is reported and left
+    out. The valid rows carry the is_staff/is_superuser flags the create_user view sets.
+    """
+    report, rows = read_rows(uploaded_file, USER_COLUMNS, batch_size)
+    seen = set()
+
+    def unique_rows():
+        for batch in chunked(rows, batch_size or get_import_batch_size()):
+            taken = set()
+            with connection.cursor() as cursor:
+                for emails, marks in id_batches({row[2].lower() for row in batch}):
+                    cursor.execute(f"{USER_BY_EMAIL_SQL}({marks})", emails)
+                    taken.update(email for email, in cursor.fetchall())
+            for row in batch:
+                email = row[2].lower()
+                if email in taken:
+                    report.add(row.line, row.source, f'email {row[2]!r} belongs to an existing user')
+                elif email in seen:
+                    report.add(row.line, row.source, f'email {row[2]!r} repeats an earlier row')
+                else:
+                    seen.add(email)
+                    is_admin = row[7] == 'super_admin'
+                    yield NumberedRow(row + (is_admin, is_admin), row.line, row.source)
+
+    return report, unique_rows()
+
+
+def count_users(cursor, batch):
+    adjust_count(cursor, USER_COUNTER, len(batch))
+
+
+def hash_passwords(rows, workers=None, chunk_size=None):
+    """
+    Replaces the plain password of each user row with its hash.
+
+    PBKDF2 is slow on purpose, so a chunk of rows is hashed across every core while the
+    previous chunk is being inserted. An empty password becomes an unusable one.
+    """
+    workers = workers or os.cpu_count()
+    chunk_size = chunk_size or get_import_batch_size()
+
+    def with_hashes(chunk, hashes):
+        for row, password in zip(chunk, hashes):
+            yield NumberedRow(row[:8] + (password,) + row[9:], row.line, row.source)
+
+    # imports run in request and worker threads, forking a threaded process may copy a held
+    # lock into the child, so workers come from a fork server and django.setup() configures them
+    with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('forkserver'),
+            initializer=django.setup) as executor:
+        pending = None
+        for chunk in chunked(rows, chunk_size):
+            hashes = executor.map(
+                make_password, [row[8] for row in chunk], chunksize=max(1, len(chunk) // (workers * 4)))
+            if pending:
+                yield from with_hashes(*pending)
+            pending = chunk, hashes
+        if pending:
+            yield from with_hashes(*pending)
+
+
+def import_users(uploaded_file, batch_size=None, progress=None, workers=None):
+    """
+    Bulk imports users, see read_user_rows and insert_batches. Passwords are hashed by
+    `workers` processes, one per core by default. Every rejected row is listed in the stored
+    error report. `progress(imported, rejected)` is called after every batch.
+    """
+    started = time.monotonic()
+    report, rows = read_user_rows(uploaded_file, batch_size)
+
+    def report_progress(inserted, rejected):
+        progress(inserted, report.count)
+
+    imported, _ = insert_batches(
+        USER_INSERT_SQL, hash_passwords(rows, workers, batch_size), batch_size, count_users,
+        report_progress if progress else None, reject_row(report))
+    return ImportResult(imported, report.count, time.monotonic() - started, error_report=report.save())
@@ -0,0 +1,93 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .imports import import_artists, import_music, import_users, upsert_artists
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Import function for each ImportJob.kind, called as fn(file, batch_size, progress)
+IMPORTERS = {
+    'artist': import_artists,
+    'music': import_music,
+    'user': import_users,
+}
+# ImportJob.kind that also have an upsert mode
+UPSERT_IMPORTERS = {
+    'artist': upsert_artists,
+}
+
+DEFAULT_IMPORT_JOB_TIMEOUT = 120
+
+
+def get_job_timeout():
+    return getattr(settings, 'IMPORT_JOB_TIMEOUT', DEFAULT_IMPORT_JOB_TIMEOUT)
+
+
+def claim_next_job():
+    """
+    Marks the oldest pending job as running and returns it, or None when the queue is empty.
+
+    The conditional UPDATE makes the claim safe between several workers.
+    """
+    while True:
+        job = ImportJob.objects.filter(status='pending').order_by('id').first()
+        if job is None:
+            return None
+        started_at = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=started_at, heartbeat_at=started_at)
+        if claimed:
+            job.status, job.started_at, job.heartbeat_at = 'running', started_at, started_at
+            return job
+
+
+def beat(job_ids):
+    """
+    Records that the worker running these jobs is still alive.
+    """
+    return ImportJob.objects.filter(pk__in=job_ids, status='running').update(heartbeat_at=timezone.now())
+
+
+def fail_abandoned_jobs():
+    """
+    Fails jobs left running by a worker that died, seen by a heartbeat older than
+    IMPORT_JOB_TIMEOUT. Jobs of other live workers keep running. Their committed
+    batches stay in place, so they are not retried automatically.
+    """
+    now = timezone.now()
+    # jobs started before heartbeats were recorded have none
+    stale = Q(heartbeat_at__lt=now - timedelta(seconds=get_job_timeout())) | Q(heartbeat_at__isnull=True)
+    return ImportJob.objects.filter(stale, status='running').update(status='failed', error='Worker stopped before the job finished', finished_at=now)
+
+
+def run_job(job):
+    """
+    Processes a claimed job, recording progress after every batch.
+    """
+    def progress(rows_done, rows_failed, rows_updated=0, rows_skipped=0):
+        ImportJob.objects.filter(pk=job.pk).update(
+            rows_done=rows_done, rows_failed=rows_failed, rows_updated=rows_updated, rows_skipped=rows_skipped,
+            heartbeat_at=timezone.now())
+
+    try:
+        importer = UPSERT_IMPORTERS[job.kind] if job.mode == 'upsert' else IMPORTERS[job.kind]
+        with job.file.open('rb') as csv_file:
+            result = importer(csv_file, job.batch_size, progress)
+    except Exception as exc:
+        logger.exception('Import job %s failed', job.pk)
+        ImportJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(exc), finished_at=timezone.now())
+    else:
+        ImportJob.objects.filter(pk=job.pk).update(
+            status='done', rows_done=result.imported, rows_failed=result.rejected,
+            rows_updated=result.updated, rows_skipped=result.skipped, error_report=result.error_report,
+            finished_at=timezone.now())
+    finally:
+        # worker threads each hold their own connection
+        connection.close()
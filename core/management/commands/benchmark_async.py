@@ -0,0 +1,133 @@
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import include, path
+
+from core import views
+from core.models import User
+from core.pagecache import PAGE_CACHE
+
+# (name, sync view, async view, route), the route placeholders are filled by sample_kwargs
+READ_VIEWS = [
+    ('dashboard', views.dashboard, views.async_dashboard, 'dashboard/'),
+    ('artist_list', views.artist_list, views.async_artist_list, 'artists/'),
+    ('song_list', views.song_list, views.async_song_list, 'artists/songs/<int:artist_id>/'),
+    ('export_artist_csv', views.export_artist_csv, views.async_export_artist_csv, 'artists/export_csv/'),
+]
+
+# Every read view under both /bench/sync/ and /bench/async/, so a single ASGI handler
+# serves the two variants; the core routes stay for the {% url %} tags in the templates
+urlpatterns = [
+    path(f'bench/{mode}/{route}', view)
+    for _, sync_view, async_view, route in READ_VIEWS
+    for mode, view in (('sync', sync_view), ('async', async_view))
+] + [
+    path('', include('core.urls')),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the sync and async read views under the ASGI handler with many concurrent clients, '
+        'reporting requests per second and p95 latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=500, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per view and mode')
+        parser.add_argument('--email', help='super_admin to run as, defaults to the first one')
+        parser.add_argument(
+            '--no-page-cache', action='store_true', help='Render every list page instead of serving it cached')
+        parser.add_argument('--output', help='Where to save the JSON results')
+
+    def sample_url(self, mode, route):
+        if '<int:artist_id>' in route:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT artist_relation_id FROM core_music "
+                    "GROUP BY artist_relation_id ORDER BY COUNT(*) DESC LIMIT 1"
+                )
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            route = route.replace('<int:artist_id>', str(row[0]))
+        return f'/bench/{mode}/{route}?limit=50'
+
+    async def drive(self, client, url, clients, requests):
+        semaphore = asyncio.Semaphore(clients)
+        timings, statuses = [], set()
+
+        async def fetch():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                if response.streaming and response.is_async:
+                    async for _ in response.streaming_content:
+                        pass
+                elif response.streaming:
+                    # what the ASGI handler does with a sync stream
+                    await sync_to_async(list)(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses.add(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        return {
+            'url': url,
+            'statuses': sorted(statuses),
+            'requests_per_second': round(requests / elapsed, 1),
+            'p50_ms': round(cuts[49], 3),
+            'p95_ms': round(cuts[94], 3),
+        }
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(role_type='super_admin')
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError('No super_admin user to run the benchmark as')
+        if options['no_page_cache']:
+            PAGE_CACHE.max_entries = 0
+
+        results = {}
+        setup_test_environment()
+        try:
+            with override_settings(ROOT_URLCONF=__name__):
+                client = AsyncClient()
+                client.force_login(user)
+                for name, _, _, route in READ_VIEWS:
+                    results[name] = {}
+                    for mode in ('sync', 'async'):
+                        url = self.sample_url(mode, route)
+                        if url is None:
+                            self.stderr.write(f'Skipping {name}: no songs to list')
+                            break
+                        results[name][mode] = asyncio.run(
+                            self.drive(client, url, options['clients'], options['requests']))
+                    if len(results[name]) == 2:
+                        self.report(name, results[name])
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'Saved results to {options["output"]}'))
+
+    def report(self, name, result):
+        sync, asyn = result['sync'], result['async']
+        speedup = asyn['requests_per_second'] / sync['requests_per_second'] if sync['requests_per_second'] else 0.0
+        self.stdout.write(
+            f'{name:<20} sync {sync["requests_per_second"]:>8.1f} req/s p95 {sync["p95_ms"]:>9.2f}ms  '
+            f'async {asyn["requests_per_second"]:>8.1f} req/s p95 {asyn["p95_ms"]:>9.2f}ms  x{speedup:.2f}'
+        )
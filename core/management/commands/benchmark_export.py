@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import EXPORT_FORMATS, get_export_batch_size
+from core.shards import SHARD_TABLES, export_shard, export_shards, id_ranges
+
+
+class Command(BaseCommand):
+    help = (
+        'Times export_shards with 1, 2, 4, ... worker processes up to --max-workers and reports '
+        'rows/s and the speedup over a single process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(SHARD_TABLES), help='What to export')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson', help='Output format')
+        parser.add_argument('--gzip', action='store_true', help='Compress every shard')
+        parser.add_argument(
+            '--max-workers', type=int, default=os.cpu_count() or 1, help='Largest worker count to try')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per worker count, the fastest is kept')
+
+    def handle(self, *args, **options):
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('benchmark_export only runs against SQLite')
+        table = options['table']
+        self.stdout.write(f'{os.cpu_count()} CPU(s)')
+
+        with tempfile.TemporaryDirectory() as scratch:
+            # the baseline, the whole table serialized in this process
+            first, last = (id_ranges(table, 1) or [(0, 0)])[0]
+            database = str(settings.DATABASES['default']['NAME'])
+            baseline = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                entry = export_shard(
+                    database, table, options['format'], options['gzip'], first, last,
+                    Path(scratch) / 'serial', get_export_batch_size())
+                took = time.perf_counter() - started
+                baseline = took if baseline is None else min(baseline, took)
+            self.report('serial', entry['rows'], baseline, baseline)
+
+            workers = 1
+            while workers <= options['max_workers']:
+                best = None
+                for run in range(options['repeat']):
+                    manifest = export_shards(
+                        table, Path(scratch) / f'{workers}-{run}', options['format'], options['gzip'], workers)
+                    best = manifest['seconds'] if best is None else min(best, manifest['seconds'])
+                self.report(f'{workers} proc', manifest['rows'], best, baseline)
+                workers *= 2
+
+    def report(self, name, rows, seconds, baseline):
+        self.stdout.write(
+            f'{name:<8} {rows:>9} rows  {seconds:>7.2f}s  {rows / seconds if seconds else 0:>10.0f} rows/s  '
+            f'x{baseline / seconds if seconds else 0:.2f}'
+        )
@@ -0,0 +1,62 @@
+import timeit
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.repositories import ARTIST_LIST_COLUMNS, ArtistRecord
+
+
+def build_dicts(rows):
+    # what the list views did before the repository layer
+    return [{
+        'name': row[0],
+        'dob': row[1],
+        'gender': row[2],
+        'address': row[3],
+        'first_release_year': row[4],
+        'no_of_albums_released': row[5],
+        'id': row[6],
+    } for row in rows]
+
+
+def build_records(rows):
+    return list(map(ArtistRecord._make, rows))
+
+
+def peak_memory(build, rows):
+    tracemalloc.start()
+    try:
+        result = build(rows)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+class Command(BaseCommand):
+    help = 'Compares building artist list rows as dicts against namedtuple records, in time and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Artist rows to map')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per strategy')
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {', '.join(ARTIST_LIST_COLUMNS)} FROM core_artist ORDER BY id LIMIT %s",
+                [options['rows']]
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            self.stderr.write('No artists to map, run seed_data first')
+            return
+
+        self.stdout.write(f'Mapping {len(rows)} rows, best of {options["repeat"]} runs')
+        for label, build in (('dict', build_dicts), ('namedtuple', build_records)):
+            best = min(timeit.repeat(lambda: build(rows), number=1, repeat=options['repeat']))
+            self.stdout.write(
+                f'{label:<12} {best * 1000:>9.2f}ms  {best / len(rows) * 1e9:>7.0f}ns/row  '
+                f'peak {peak_memory(build, rows) / 1024:>9.1f}KiB'
+            )
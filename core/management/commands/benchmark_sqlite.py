@@ -0,0 +1,136 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.test import override_settings
+
+from core.repositories import ARTIST_LIST_COLUMNS, LIVE_ARTIST_SQL, MUSIC_INSERT_SQL
+from core.sqlite import get_pragmas
+
+BENCH_ALIAS = 'sqlite_benchmark'
+
+READ_SQL = (
+    f"SELECT {', '.join(ARTIST_LIST_COLUMNS)} FROM core_artist WHERE {LIVE_ARTIST_SQL} ORDER BY id LIMIT 50 OFFSET %s"
+)
+
+# (name, pragmas, keep the connection between operations)
+PROFILES = [
+    ('default', {}, False),
+    ('tuned', None, True),
+]
+
+
+def copy_database(source, target, journal_mode):
+    # a scratch copy, the benchmark writes songs and switches journal modes
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode = {journal_mode}')
+    dst.close()
+    src.close()
+
+
+def p95(timings):
+    if len(timings) < 2:
+        return timings[0] if timings else 0.0
+    return statistics.quantiles(timings, n=100, method='inclusive')[94]
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs concurrent readers and import-sized writers against a copy of the SQLite database, '
+        'with SQLite defaults and a new connection per operation, then with SQLITE_PRAGMAS and '
+        'persistent connections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Threads reading artist list pages')
+        parser.add_argument('--writers', type=int, default=2, help='Threads inserting song batches')
+        parser.add_argument('--batch-size', type=int, default=500, help='Songs per write transaction')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each profile')
+
+    def handle(self, *args, **options):
+        source = connections['default'].settings_dict
+        if source['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('benchmark_sqlite only runs against SQLite')
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), MIN(id) FROM core_artist")
+            artists, artist_id = cursor.fetchone()
+        if not artists:
+            raise CommandError('No artists to read, run seed_data first')
+
+        with tempfile.TemporaryDirectory() as scratch:
+            for name, pragmas, persistent in PROFILES:
+                pragmas = get_pragmas() if pragmas is None else pragmas
+                path = Path(scratch) / f'{name}.sqlite3'
+                copy_database(source['NAME'], path, pragmas.get('journal_mode', 'DELETE'))
+                connections.settings[BENCH_ALIAS] = {
+                    **source, 'NAME': str(path), 'CONN_MAX_AGE': None if persistent else 0,
+                }
+                try:
+                    with override_settings(SQLITE_PRAGMAS=pragmas):
+                        result = self.run_profile(artists, artist_id, persistent, options)
+                finally:
+                    del connections.settings[BENCH_ALIAS]
+                self.report(name, result, options)
+
+    def run_profile(self, artists, artist_id, persistent, options):
+        deadline = time.perf_counter() + options['seconds']
+        result = {'reads': [], 'writes': [], 'locked': 0}
+        lock = threading.Lock()
+
+        def timed(operation, timings):
+            connection = connections[BENCH_ALIAS]
+            started = time.perf_counter()
+            try:
+                operation(connection)
+            except OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                with lock:
+                    result['locked'] += 1
+            else:
+                with lock:
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                if not persistent:
+                    # what the end of a request does with CONN_MAX_AGE = 0
+                    connection.close()
+
+        def read(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(READ_SQL, [random.randrange(max(artists - 50, 1))])
+                cursor.fetchall()
+
+        def write(connection):
+            rows = [(artist_id, f'bench {i}', 'bench', 'rock') for i in range(options['batch_size'])]
+            with transaction.atomic(using=BENCH_ALIAS), connection.cursor() as cursor:
+                cursor.executemany(MUSIC_INSERT_SQL, rows)
+
+        def worker(operation, timings):
+            try:
+                while time.perf_counter() < deadline:
+                    timed(operation, timings)
+            finally:
+                connections[BENCH_ALIAS].close()
+
+        threads = [threading.Thread(target=worker, args=(read, result['reads'])) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=(write, result['writes'])) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, options):
+        seconds = options['seconds']
+        self.stdout.write(
+            f'{name:<8} reads {len(result["reads"]) / seconds:>8.1f}/s p95 {p95(result["reads"]):>8.2f}ms  '
+            f'writes {len(result["writes"]) * options["batch_size"] / seconds:>9.1f} rows/s '
+            f'p95 {p95(result["writes"]):>8.2f}ms  locked {result["locked"]}'
+        )
@@ -0,0 +1,161 @@
+import json
+import statistics
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core import urls as core_urls
+from core.models import ImportJob, User
+from core.replica import REPLICA_ALIAS, replica_state
+
+# Routes that would end the benchmark session
+SKIPPED_ROUTES = {'logout'}
+
+# Query strings sent to each route, lists are read a realistic page at a time
+ROUTE_QUERIES = {
+    'user_list': 'limit=50',
+    'artist_list': 'limit=50',
+    'song_list': 'limit=50',
+    'search': 'q=ka',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives every route in core/urls.py through the test client against the configured '
+        'database and reports p50/p95/p99 latency and query counts per route'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per route')
+        parser.add_argument('--email', help='super_admin to run as, defaults to the first one')
+        parser.add_argument('--output', default='view-benchmark.json', help='Where to save the JSON results')
+        parser.add_argument('--compare', help='Earlier JSON results to compare against')
+
+    def sample_kwargs(self):
+        # Benchmark the heaviest artist, the worst case for song pages
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT artist_relation_id, MAX(id) FROM core_music "
+                "GROUP BY artist_relation_id ORDER BY COUNT(*) DESC LIMIT 1"
+            )
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("SELECT MAX(id), NULL FROM core_artist")
+                row = cursor.fetchone()
+            cursor.execute("SELECT MAX(id) FROM user")
+            user_id = cursor.fetchone()[0]
+        job = ImportJob.objects.order_by('-id').first()
+        return {
+            'artist_id': row[0],
+            'song_id': row[1],
+            'user_id': user_id,
+            'job_id': job.id if job else None,
+        }
+
+    def routes(self):
+        samples = self.sample_kwargs()
+        for pattern in core_urls.urlpatterns:
+            name = pattern.name
+            if name in SKIPPED_ROUTES:
+                continue
+            params = list(pattern.pattern.converters)
+            if any(samples.get(param) is None for param in params):
+                self.stderr.write(f'Skipping {name}: no rows to fill {", ".join(params)}')
+                continue
+            url = reverse(f'{core_urls.app_name}:{name}', kwargs={param: samples[param] for param in params})
+            if name in ROUTE_QUERIES:
+                url = f'{url}?{ROUTE_QUERIES[name]}'
+            yield name, url
+
+    def query_aliases(self):
+        # the read views query the replica once it is synced, connecting to a replica
+        # that was never synced would only create an empty file
+        return [alias for alias in connections if alias != REPLICA_ALIAS or replica_state() is not None]
+
+    def request(self, client, url):
+        # Every request is rolled back so the write routes can be replayed
+        with transaction.atomic():
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.query_aliases()]
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed, sum(len(queries) for queries in captured), response.status_code
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(role_type='super_admin')
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError('No super_admin user to run the benchmark as')
+
+        setup_test_environment()
+        try:
+            client = Client()
+            client.force_login(user)
+            results = {}
+            for name, url in self.routes():
+                for _ in range(options['warmup']):
+                    self.request(client, url)
+                timings, query_counts = [], []
+                for _ in range(options['iterations']):
+                    elapsed, queries, status = self.request(client, url)
+                    timings.append(elapsed * 1000)
+                    query_counts.append(queries)
+                results[name] = self.summarize(url, status, timings, query_counts)
+                self.report(name, results[name])
+        finally:
+            teardown_test_environment()
+
+        Path(options['output']).write_text(json.dumps(results, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Saved results to {options["output"]}'))
+
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), results)
+
+    def summarize(self, url, status, timings, query_counts):
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method='inclusive')
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = timings[0]
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'queries': max(query_counts),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<24} {result["status"]}  p50 {result["p50_ms"]:>9.2f}ms  p95 {result["p95_ms"]:>9.2f}ms  '
+            f'p99 {result["p99_ms"]:>9.2f}ms  {result["queries"]:>3} queries'
+        )
+
+    def compare(self, baseline, results):
+        self.stdout.write('Change against baseline (p95, queries):')
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            self.stdout.write(
+                f'{name:<24} {before["p95_ms"]:>9.2f}ms -> {result["p95_ms"]:>9.2f}ms ({change:+.1f}%)  '
+                f'{before["queries"]} -> {result["queries"]} queries'
+            )
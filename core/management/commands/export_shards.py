@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.exports import EXPORT_FORMATS
+from core.shards import SHARD_TABLES, concatenate_shards, export_shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports artists or songs as id-range shards serialized in parallel by a process pool, '
+        'with a manifest.json, under MEDIA_ROOT/exports'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(SHARD_TABLES), help='What to export')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', help='Output format')
+        parser.add_argument('--gzip', action='store_true', help='Compress every shard')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Worker processes, each with its own read-only connection')
+        parser.add_argument('--shards', type=int, help='Number of id ranges, 4 per worker by default')
+        parser.add_argument(
+            '--output-dir', help='Directory for the shards, a new one under MEDIA_ROOT/exports by default')
+        parser.add_argument(
+            '--concatenate', action='store_true',
+            help='Also join the shards into a single file with one header')
+        parser.add_argument('--database', default='default', help='Database alias to read, e.g. replica')
+
+    def handle(self, *args, **options):
+        table = options['table']
+        if settings.DATABASES[options['database']]['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('export_shards only runs against SQLite')
+        if options['workers'] < 1 or (options['shards'] is not None and options['shards'] < 1):
+            raise CommandError('--workers and --shards must be at least 1')
+
+        output_dir = Path(options['output_dir'] or Path(settings.MEDIA_ROOT) / 'exports' / (
+            f'{table}-{timezone.now():%Y%m%d-%H%M%S}'))
+        manifest = export_shards(
+            table, output_dir, options['format'], options['gzip'], options['workers'], options['shards'],
+            using=options['database'])
+        self.stdout.write(
+            f'Exported {manifest["rows"]} row(s) in {len(manifest["shards"])} shard(s) with '
+            f'{manifest["workers"]} worker(s) in {manifest["seconds"]:.2f}s')
+
+        if options['concatenate']:
+            path = output_dir / f'{table}.{manifest["extension"]}'
+            concatenate_shards(manifest, output_dir, path)
+            self.stdout.write(f'Concatenated into {path}')
+
+        self.stdout.write(self.style.SUCCESS(f'Manifest written to {output_dir / "manifest.json"}'))
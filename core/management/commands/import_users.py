@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import import_users
+from core.validation import ERROR_REPORT_PATH, CsvHeaderError
+
+
+class Command(BaseCommand):
+    help = 'Bulk imports users from a CSV file, hashing their passwords on every core'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_file',
+            help='CSV with a header line naming its columns: first name, last name, email, phone, dob, gender, '
+                 'address, role type, password')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes, one per core by default')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows inserted per transaction')
+
+    def handle(self, *args, **options):
+        def progress(imported, rejected):
+            self.stdout.write(f'{imported} imported, {rejected} rejected')
+
+        try:
+            with open(options['csv_file'], 'rb') as csv_file:
+                result = import_users(csv_file, options['batch_size'], progress, options['workers'])
+        except OSError as error:
+            raise CommandError(f'Cannot read {options["csv_file"]}: {error}')
+        except CsvHeaderError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} users, rejected {result.rejected} rows in {result.elapsed:.1f}s '
+            f'({result.throughput:.1f} users/s)'
+        ))
+        if result.error_report:
+            self.stdout.write(f'Rejected rows: {ERROR_REPORT_PATH.format(token=result.error_report)} in the media storage')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.purge import get_purge_chunk_size, get_purge_rows_per_second, purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Removes deleted artists and their songs in small transactions, at a limited rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=get_purge_chunk_size(),
+            help='Rows deleted per transaction')
+        parser.add_argument(
+            '--rows-per-second', type=int, default=get_purge_rows_per_second(),
+            help='Most rows deleted per second on average, 0 for no limit')
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds to wait between checks for new tombstones')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once every tombstone is purged instead of waiting for new ones')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            purged = purge_tombstones(options['chunk_size'], options['rows_per_second'])
+            if purged:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'Purged {purged} row(s) in {elapsed:.1f}s ({purged / elapsed:.0f} rows/s)')
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('No deleted artists left to purge'))
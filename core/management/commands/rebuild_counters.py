@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.counters import check_counts, rebuild_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the maintained row counters, or checks them against COUNT(*) with --check'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report counters that drifted, exit with an error when any did')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options['check']:
+                mismatches = check_counts(cursor)
+                for name, stored, actual in mismatches:
+                    self.stderr.write(f'{name}: stored {stored}, actual {actual}')
+                if mismatches:
+                    raise CommandError(f'{len(mismatches)} counter(s) out of date, run rebuild_counters')
+                self.stdout.write(self.style.SUCCESS('All counters are exact'))
+                return
+
+            counts = rebuild_counts(cursor)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(counts)} counter(s)'))
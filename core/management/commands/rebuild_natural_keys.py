@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.naturalkeys import get_artist_natural_key, rebuild_artist_keys
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the natural key of every artist from ARTIST_NATURAL_KEY'
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            keyed, duplicates = rebuild_artist_keys(cursor)
+
+        self.stdout.write(f'Keyed {keyed} artist(s) on {", ".join(get_artist_natural_key())}')
+        if duplicates:
+            self.stdout.write(self.style.WARNING(
+                f'{duplicates} artist(s) repeat the key of an older one and were left without a key'))
+        self.stdout.write(self.style.SUCCESS('Natural keys rebuilt'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.search import optimize_index, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the FTS5 search index over artists and songs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize', action='store_true',
+            help='Also merge the index b-trees once rebuilt')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            rebuild_index(cursor)
+            if options['optimize']:
+                optimize_index(cursor)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
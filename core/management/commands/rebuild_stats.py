@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.stats import check_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the dashboard rollups, or checks them against GROUP BY queries with --check'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report rollups that drifted, exit with an error when any did')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options['check']:
+                mismatches = check_stats(cursor)
+                for dimension, key, stored, actual in mismatches:
+                    self.stderr.write(f'{dimension}:{key}: stored {stored}, actual {actual}')
+                if mismatches:
+                    raise CommandError(f'{len(mismatches)} rollup(s) out of date, run rebuild_stats')
+                self.stdout.write(self.style.SUCCESS('All rollups are exact'))
+                return
+
+            stats = rebuild_stats(cursor)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(stats)} rollup(s)'))
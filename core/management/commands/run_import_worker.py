@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import beat, claim_next_job, fail_abandoned_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Processes queued CSV import jobs with a local thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Number of jobs processed at the same time')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait between checks for new jobs')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+
+        self.stdout.write(f'Processing import jobs with {workers} worker(s)')
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # jobs whose worker stopped reporting in, other live workers keep theirs
+                abandoned = fail_abandoned_jobs()
+                if abandoned:
+                    self.stderr.write(f'Marked {abandoned} abandoned job(s) as failed')
+
+                running = {future: job_id for future, job_id in running.items() if not future.done()}
+                # a batch can take longer than the timeout, the loop reports in for it
+                beat(running.values())
+                while len(running) < workers:
+                    job = claim_next_job()
+                    if job is None:
+                        break
+                    self.stdout.write(f'Started {job}')
+                    running[pool.submit(run_job, job)] = job.pk
+
+                if options['once'] and not running:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('Import queue drained'))
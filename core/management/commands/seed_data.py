@@ -0,0 +1,125 @@
+import random
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.constants import GENDER_CHOICES, GENRE_CHOICES
+from core.imports import (
+    ARTIST_INSERT_SQL,
+    MUSIC_INSERT_SQL,
+    count_users,
+    count_artists,
+    count_music,
+    insert_batches
+    )
+from core.naturalkeys import make_artist_key
+from core.repositories import USER_INSERT_SQL
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'sen', 'ta', 'vi', 'no', 'del', 'ar', 'jo', 'lin', 'mar', 'su', 'bel', 'ton']
+WORDS = ['love', 'night', 'river', 'fire', 'blue', 'road', 'heart', 'rain', 'gold', 'dream', 'city', 'home', 'light', 'wild']
+CITIES = ['Kathmandu', 'Pokhara', 'London', 'Austin', 'Lagos', 'Seoul', 'Berlin', 'Lima', 'Oslo', 'Nashville']
+ROLE_WEIGHTS = [('super_admin', 1), ('artist_manager', 9), ('artist', 90)]
+GENRE_WEIGHTS = [8, 3, 2, 6, 2]
+
+
+def make_name(rng):
+    return ' '.join(
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        for _ in range(2)
+    )
+
+
+def random_date(rng, start_year, end_year):
+    start = date(start_year, 1, 1)
+    return start + timedelta(days=rng.randrange((date(end_year, 12, 31) - start).days))
+
+
+class Command(BaseCommand):
+    help = 'Generates users, artists and songs in bulk, with a few artists owning most of the songs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--artists', type=int, default=10000, help='Number of artists to create')
+        parser.add_argument('--songs', type=int, default=100000, help='Number of songs to create')
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Zipf exponent of songs per artist, higher gives the top artists more songs')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per transaction')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for repeatable data')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM user")
+            first_user = cursor.fetchone()[0] + 1
+
+        # hashing is slow on purpose, every seeded user shares the password "password"
+        password = make_password('password')
+        genders = [choice for choice, _ in GENDER_CHOICES]
+        roles, role_weights = zip(*ROLE_WEIGHTS)
+
+        def users():
+            for n in range(first_user, first_user + options['users']):
+                yield (
+                    make_name(rng).split()[0], make_name(rng).split()[1], f'seed{n}@example.com',
+                    f'98{rng.randrange(10 ** 8):08d}', random_date(rng, 1960, 2005), rng.choice(genders),
+                    rng.choice(CITIES), rng.choices(roles, role_weights)[0], password, False, False,
+                )
+
+        started = time.monotonic()
+        created, _ = insert_batches(USER_INSERT_SQL, users(), batch_size, count_users)
+        self.stdout.write(f'Created {created} users in {time.monotonic() - started:.1f}s')
+
+        artist_key = make_artist_key()
+
+        def artists():
+            for _ in range(options['artists']):
+                debut = random_date(rng, 1960, 2023)
+                row = (
+                    make_name(rng), random_date(rng, 1940, 2005), rng.choice(genders),
+                    f'{rng.randint(1, 999)} {rng.choice(WORDS).capitalize()} Street, {rng.choice(CITIES)}',
+                    debut.replace(month=1, day=1), rng.randint(0, 30),
+                )
+                yield row + (artist_key(row),)
+
+        started = time.monotonic()
+        created, _ = insert_batches(ARTIST_INSERT_SQL, artists(), batch_size, count_artists)
+        self.stdout.write(f'Created {created} artists in {time.monotonic() - started:.1f}s')
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM core_artist ORDER BY id DESC LIMIT %s", [options['artists']])
+            artist_ids = [row[0] for row in cursor.fetchall()]
+        if not artist_ids or not options['songs']:
+            return
+
+        # Zipf weights: artist k gets a share proportional to 1 / k**skew
+        rng.shuffle(artist_ids)
+        cum_weights = list(accumulate(1 / rank ** options['skew'] for rank in range(1, len(artist_ids) + 1)))
+        genres = [choice for choice, _ in GENRE_CHOICES]
+
+        def songs():
+            for _ in range(options['songs']):
+                yield (
+                    rng.choices(artist_ids, cum_weights=cum_weights)[0],
+                    ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title(),
+                    ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title(),
+                    rng.choices(genres, GENRE_WEIGHTS)[0],
+                )
+
+        started = time.monotonic()
+        created, _ = insert_batches(MUSIC_INSERT_SQL, songs(), batch_size, count_music)
+        self.stdout.write(f'Created {created} songs in {time.monotonic() - started:.1f}s')
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT artist_relation_id, COUNT(*) AS songs FROM core_music "
+                "GROUP BY artist_relation_id ORDER BY songs DESC LIMIT 3"
+            )
+            top = ', '.join(f'#{artist_id}: {songs}' for artist_id, songs in cursor.fetchall())
+        self.stdout.write(self.style.SUCCESS(f'Done, artists with the most songs: {top}'))
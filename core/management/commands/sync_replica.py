@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.replica import sync_replica
+
+DEFAULT_REPLICA_SYNC_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = 'Keeps the read replica in step with the primary database using the SQLite backup API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            default=getattr(settings, 'REPLICA_SYNC_INTERVAL', DEFAULT_REPLICA_SYNC_INTERVAL),
+            help='Seconds to wait between two copies')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Copy the primary once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            took = sync_replica()
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Replica synced in {took * 1000:.1f}ms'))
+                break
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Replica synced in {took * 1000:.1f}ms')
+            time.sleep(options['interval'])
@@ -0,0 +1,213 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+from .pagecache import PAGE_CACHE
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+# Stats of the request being handled, None outside of MetricsMiddleware
+current_stats = ContextVar('current_stats', default=None)
+
+
+class Histogram:
+    """
+    Cumulative Prometheus histogram with one series per view.
+    """
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self.lock:
+            series = self.series.get(view)
+            if series is None:
+                # one counter per bucket, then +Inf, then the sum
+                series = self.series[view] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            snapshot = {view: list(series) for view, series in self.series.items()}
+        for view, series in sorted(snapshot.items()):
+            label = escape_label(view)
+            total = 0
+            for bound, hits in zip(self.buckets, series):
+                total += hits
+                lines.append(f'{self.name}_bucket{{view="{label}",le="{bound}"}} {total}')
+            total += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{view="{label}",le="+Inf"}} {total}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {series[-1]}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {total}')
+        return lines
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'view_request_duration_seconds', 'Time spent handling the request.', DURATION_BUCKETS)
+SQL_QUERIES = Histogram(
+    'view_sql_queries', 'SQL queries executed per request.', QUERY_BUCKETS)
+SQL_DURATION = Histogram(
+    'view_sql_duration_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+RENDER_DURATION = Histogram(
+    'view_render_duration_seconds', 'Time spent rendering templates per request.', DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'view_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS)
+
+HISTOGRAMS = [REQUEST_DURATION, SQL_QUERIES, SQL_DURATION, RENDER_DURATION, RESPONSE_SIZE]
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_time', 'render_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook, times every query of the request
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection, so queries run from sync_to_async threads
+    # and the async DB pool are counted too: the context variable follows them there
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.render_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend whose templates add their render time to the request stats.
+    """
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+def count_streamed_bytes(view, content):
+    # Record the size of a streamed body once it has been sent
+    size = 0
+    for chunk in content:
+        size += len(chunk)
+        yield chunk
+    RESPONSE_SIZE.observe(view, size)
+
+
+async def acount_streamed_bytes(view, content):
+    size = 0
+    async for chunk in content:
+        size += len(chunk)
+        yield chunk
+    RESPONSE_SIZE.observe(view, size)
+
+
+class MetricsMiddleware:
+    """
+    Records per-view query count, SQL time, render time and response size.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    def record(self, request, response, stats, duration):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        REQUEST_DURATION.observe(view, duration)
+        SQL_QUERIES.observe(view, stats.queries)
+        SQL_DURATION.observe(view, stats.sql_time)
+        RENDER_DURATION.observe(view, stats.render_time)
+        if response.streaming and response.is_async:
+            response.streaming_content = acount_streamed_bytes(view, response.streaming_content)
+        elif response.streaming:
+            response.streaming_content = count_streamed_bytes(view, response.streaming_content)
+        else:
+            RESPONSE_SIZE.observe(view, len(response.content))
+
+        if getattr(settings, 'METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = (
+                f'sql;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries", '
+                f'render;dur={stats.render_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(PAGE_CACHE.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    # Seed the counters from the rows that already exist
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("INSERT INTO core_rowcounter (name, value) SELECT 'user', COUNT(*) FROM user")
+        cursor.execute("INSERT INTO core_rowcounter (name, value) SELECT 'core_artist', COUNT(*) FROM core_artist")
+        cursor.execute("INSERT INTO core_rowcounter (name, value) SELECT 'core_music', COUNT(*) FROM core_music")
+        cursor.execute(
+            "INSERT INTO core_rowcounter (name, value) "
+            "SELECT 'core_music:artist:' || artist_relation_id, COUNT(*) FROM core_music GROUP BY artist_relation_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_music'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Counted table, or table and scope e.g. core_music:artist:1', max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0, help_text='Number of rows')),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_rowcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('artist', 'Artist')], default='artist', help_text='What the uploaded CSV contains', max_length=10)),
+                ('file', models.FileField(help_text='Uploaded CSV file', upload_to='imports/%Y/%m/%d/')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', help_text='Processing status', max_length=10)),
+                ('batch_size', models.PositiveIntegerField(blank=True, help_text='Rows inserted per transaction', null=True)),
+                ('rows_done', models.PositiveIntegerField(default=0, help_text='Rows imported so far')),
+                ('rows_failed', models.PositiveIntegerField(default=0, help_text='Rows rejected so far')),
+                ('error', models.TextField(blank=True, help_text='Why the job failed', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who uploaded the file', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
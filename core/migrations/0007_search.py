@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_importjob_music'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE core_artist_fts USING fts5("
+                "name, address, content='core_artist', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+                "CREATE TRIGGER core_artist_fts_ai AFTER INSERT ON core_artist BEGIN "
+                "INSERT INTO core_artist_fts (rowid, name, address) VALUES (new.id, new.name, new.address); "
+                "END",
+                "CREATE TRIGGER core_artist_fts_ad AFTER DELETE ON core_artist BEGIN "
+                "INSERT INTO core_artist_fts (core_artist_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address); "
+                "END",
+                "CREATE TRIGGER core_artist_fts_au AFTER UPDATE OF name, address ON core_artist BEGIN "
+                "INSERT INTO core_artist_fts (core_artist_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address); "
+                "INSERT INTO core_artist_fts (rowid, name, address) VALUES (new.id, new.name, new.address); "
+                "END",
+                "CREATE VIRTUAL TABLE core_music_fts USING fts5("
+                "title, album_name, content='core_music', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+                "CREATE TRIGGER core_music_fts_ai AFTER INSERT ON core_music BEGIN "
+                "INSERT INTO core_music_fts (rowid, title, album_name) VALUES (new.id, new.title, new.album_name); "
+                "END",
+                "CREATE TRIGGER core_music_fts_ad AFTER DELETE ON core_music BEGIN "
+                "INSERT INTO core_music_fts (core_music_fts, rowid, title, album_name) VALUES ('delete', old.id, old.title, old.album_name); "
+                "END",
+                "CREATE TRIGGER core_music_fts_au AFTER UPDATE OF title, album_name ON core_music BEGIN "
+                "INSERT INTO core_music_fts (core_music_fts, rowid, title, album_name) VALUES ('delete', old.id, old.title, old.album_name); "
+                "INSERT INTO core_music_fts (rowid, title, album_name) VALUES (new.id, new.title, new.album_name); "
+                "END",
+                # index the rows that already exist
+                "INSERT INTO core_artist_fts (core_artist_fts) VALUES ('rebuild')",
+                "INSERT INTO core_music_fts (core_music_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS core_music_fts_au",
+                "DROP TRIGGER IF EXISTS core_music_fts_ad",
+                "DROP TRIGGER IF EXISTS core_music_fts_ai",
+                "DROP TABLE IF EXISTS core_music_fts",
+                "DROP TRIGGER IF EXISTS core_artist_fts_au",
+                "DROP TRIGGER IF EXISTS core_artist_fts_ad",
+                "DROP TRIGGER IF EXISTS core_artist_fts_ai",
+                "DROP TABLE IF EXISTS core_artist_fts",
+            ],
+        ),
+    ]
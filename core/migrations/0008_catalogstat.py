@@ -0,0 +1,55 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:30
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def release_decade(first_release_year):
+    year = str(first_release_year or '')[:4]
+    return f'{int(year) // 10 * 10}s' if year.isdigit() else 'unknown'
+
+
+def populate_stats(apps, schema_editor):
+    # Seed the rollups from the rows that already exist
+    with schema_editor.connection.cursor() as cursor:
+        stats = Counter()
+        cursor.execute("SELECT genre, artist_relation_id FROM core_music")
+        for genre, artist_id in cursor.fetchall():
+            stats[('genre', genre)] += 1
+            stats[('artist_songs', str(artist_id))] += 1
+        cursor.execute("SELECT gender, first_release_year FROM core_artist")
+        for gender, first_release_year in cursor.fetchall():
+            stats[('artist_gender', gender)] += 1
+            stats[('artist_decade', release_decade(first_release_year))] += 1
+        cursor.executemany(
+            "INSERT INTO core_catalogstat (dimension, key, value) VALUES (%s, %s, %s)",
+            [(dimension, key, value) for (dimension, key), value in stats.items()]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(help_text='What is counted e.g. genre, artist_gender, artist_decade', max_length=20)),
+                ('key', models.CharField(help_text='Value of the dimension e.g. rock, or an artist id', max_length=64)),
+                ('value', models.BigIntegerField(default=0, help_text='Number of rows')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'value'], name='core_catalogstat_dim_value')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='catalogstat',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key'), name='core_catalogstat_dimension_key'),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_catalogstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Cached table, or table and scope e.g. core_music:artist:1', max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0, help_text='Bumped by every write, cached pages of older versions are never served')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=[('artist', 'Artist'), ('music', 'Music'), ('user', 'User')], default='artist', help_text='What the uploaded CSV contains', max_length=10),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_importjob_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['updated_at'], name='core_artist_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='music',
+            index=models.Index(fields=['artist_relation', 'updated_at'], name='core_music_artist_updated_at'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='Deletion timestamp, the row and its songs are purged later', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['deleted_at'], name='core_artist_deleted_at'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_artist_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MusicDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('music_id', models.BigIntegerField(help_text='Id of the deleted song')),
+                ('artist_id', models.BigIntegerField(help_text='Artist the song belonged to')),
+                ('deleted_at', models.DateTimeField(help_text='Deletion timestamp, pruned after DELTA_RETENTION_DAYS')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='music',
+            index=models.Index(fields=['updated_at'], name='core_music_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='musicdeletion',
+            index=models.Index(fields=['deleted_at'], name='core_musicdeletion_deleted_at'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                # songs of a tombstoned artist are purged later, the artist's tombstone reports them
+                "CREATE TRIGGER core_music_deletion_ad AFTER DELETE ON core_music "
+                "WHEN NOT EXISTS (SELECT 1 FROM core_artist WHERE id = old.artist_relation_id AND deleted_at IS NOT NULL) "
+                "BEGIN "
+                "INSERT INTO core_musicdeletion (music_id, artist_id, deleted_at) "
+                "VALUES (old.id, old.artist_relation_id, strftime('%Y-%m-%d %H:%M:%f', 'now')); "
+                "END",
+                # rows without timestamps would never show up in a delta
+                "UPDATE core_artist SET created_at = COALESCE(created_at, strftime('%Y-%m-%d %H:%M:%f', 'now')), "
+                "updated_at = COALESCE(updated_at, created_at, strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+                "WHERE created_at IS NULL OR updated_at IS NULL",
+                "UPDATE core_music SET created_at = COALESCE(created_at, strftime('%Y-%m-%d %H:%M:%f', 'now')), "
+                "updated_at = COALESCE(updated_at, created_at, strftime('%Y-%m-%d %H:%M:%f', 'now')) "
+                "WHERE created_at IS NULL OR updated_at IS NULL",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS core_music_deletion_ad",
+            ],
+        ),
+    ]
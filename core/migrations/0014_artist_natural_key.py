@@ -0,0 +1,68 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:14
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+# A copy of core.naturalkeys as of this migration, so later changes there cannot change what it does
+ARTIST_KEY_FIELDS = ['name', 'dob', 'gender', 'address', 'first_release_year', 'no_of_albums_released']
+
+
+def normalize(value):
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).casefold()
+
+
+def key_artists(apps, schema_editor):
+    # the oldest of each set of duplicates gets the key, the copies keep NULL
+    fields = list(getattr(settings, 'ARTIST_NATURAL_KEY', ['name', 'dob']))
+    if not fields or not set(fields) <= set(ARTIST_KEY_FIELDS):
+        raise ValueError(f'ARTIST_NATURAL_KEY must be a list of {", ".join(ARTIST_KEY_FIELDS)}')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, {', '.join(fields)} FROM core_artist WHERE deleted_at IS NULL ORDER BY id")
+        seen, updates = set(), []
+        for row in cursor.fetchall():
+            text = '\x1f'.join(normalize(value) for value in row[1:])
+            key = hashlib.sha1(text.encode('utf-8'), usedforsecurity=False).hexdigest()
+            if key not in seen:
+                seen.add(key)
+                updates.append((key, row[0]))
+        cursor.executemany("UPDATE core_artist SET natural_key = %s WHERE id = %s", updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_delta_export'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='natural_key',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the normalized ARTIST_NATURAL_KEY fields, unique among live artists', max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('insert', 'Insert, reject rows matching an existing artist'), ('upsert', 'Upsert, update artists matching the natural key')], default='insert', help_text='What happens to rows matching an existing artist', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_skipped',
+            field=models.PositiveIntegerField(default=0, help_text='Rows left alone so far, unchanged or repeated in the file, upsert mode only'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_updated',
+            field=models.PositiveIntegerField(default=0, help_text='Existing rows updated so far, upsert mode only'),
+        ),
+        migrations.RunPython(key_artists, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='artist',
+            constraint=models.UniqueConstraint(condition=models.Q(('natural_key__isnull', False)), fields=('natural_key',), name='core_artist_natural_key'),
+        ),
+    ]
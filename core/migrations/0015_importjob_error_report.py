@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_artist_natural_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='error_report',
+            field=models.CharField(blank=True, editable=False, help_text='Token of the CSV listing the rejected rows', max_length=32, null=True),
+        ),
+    ]
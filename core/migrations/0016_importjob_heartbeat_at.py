@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_importjob_error_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Last time the worker running the job reported in', null=True),
+        ),
+    ]
@@ -1,14 +1,20 @@
 from django.contrib.auth.models import (
     AbstractBaseUser, 
     PermissionsMixin)
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from .constants import (
     GENDER_CHOICES, 
     GENRE_CHOICES, 
+    IMPORT_JOB_KIND_CHOICES,
+    IMPORT_JOB_STATUS_CHOICES,
+    IMPORT_MODE_CHOICES,
     ROLE_TYPE_CHOICES)
 from .managers import UserManager
+from .naturalkeys import artist_natural_key, duplicate_artist_message
 
 # Create your models here.
 
@@ -52,6 +58,14 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Users restored from the session snapshot defer most fields,
+        # load them all the first time one is read instead of one query per field
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields)
     
 
 class Artist(models.Model):
@@ -79,10 +93,37 @@ class Artist(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, null=True, 
         help_text=_('Last update timestamp'))
+    deleted_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text=_('Deletion timestamp, the row and its songs are purged later'))
+    natural_key = models.CharField(
+        max_length=40, null=True, blank=True, editable=False,
+        help_text=_('Hash of the normalized ARTIST_NATURAL_KEY fields, unique among live artists'))
+
+    class Meta:
+        indexes = [
+            # MAX(updated_at) for the API ETags without a table scan
+            models.Index(fields=['updated_at'], name='core_artist_updated_at'),
+            # tombstones for the purge worker
+            models.Index(fields=['deleted_at'], name='core_artist_deleted_at'),
+        ]
+        constraints = [
+            # partial, so SQLite adds it with CREATE UNIQUE INDEX instead of rebuilding the
+            # table, and the upsert import can target it with ON CONFLICT
+            models.UniqueConstraint(
+                fields=['natural_key'], condition=models.Q(natural_key__isnull=False),
+                name='core_artist_natural_key'),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def clean(self):
+        # the admin form leaves natural_key out, so its unique constraint is not validated there
+        key = artist_natural_key(self)
+        if key and Artist.objects.filter(natural_key=key).exclude(pk=self.pk).exists():
+            raise ValidationError(duplicate_artist_message())
+
 
 class Music(models.Model):
     artist_relation = models.ForeignKey(
@@ -96,5 +137,131 @@ class Music(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, auto_now=False, null=True)
     updated_at = models.DateTimeField(auto_now_add=False, auto_now=True, null=True)
 
+    class Meta:
+        indexes = [
+            # MAX(updated_at) of one artist's songs for the API ETags
+            models.Index(fields=['artist_relation', 'updated_at'], name='core_music_artist_updated_at'),
+            # rows changed since a sync token, for the delta export
+            models.Index(fields=['updated_at'], name='core_music_updated_at'),
+        ]
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class MusicDeletion(models.Model):
+    # Filled by a trigger on core_music, songs are deleted outright and the delta export
+    # has no other way to report them
+    music_id = models.BigIntegerField(
+        help_text=_('Id of the deleted song'))
+    artist_id = models.BigIntegerField(
+        help_text=_('Artist the song belonged to'))
+    deleted_at = models.DateTimeField(
+        help_text=_('Deletion timestamp, pruned after DELTA_RETENTION_DAYS'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='core_musicdeletion_deleted_at'),
+        ]
+
     def __str__(self) -> str:
-        return self.title
\ No newline at end of file
+        return f'song {self.music_id} of artist {self.artist_id}'
+
+
+class RowCounter(models.Model):
+    name = models.CharField(
+        max_length=64, unique=True,
+        help_text=_('Counted table, or table and scope e.g. core_music:artist:1'))
+    value = models.BigIntegerField(
+        default=0, help_text=_('Number of rows'))
+
+    def __str__(self) -> str:
+        return f'{self.name}={self.value}'
+
+
+class CacheVersion(models.Model):
+    name = models.CharField(
+        max_length=64, unique=True,
+        help_text=_('Cached table, or table and scope e.g. core_music:artist:1'))
+    value = models.BigIntegerField(
+        default=0, help_text=_('Bumped by every write, cached pages of older versions are never served'))
+
+    def __str__(self) -> str:
+        return f'{self.name}@{self.value}'
+
+
+class CatalogStat(models.Model):
+    dimension = models.CharField(
+        max_length=20, help_text=_('What is counted e.g. genre, artist_gender, artist_decade'))
+    key = models.CharField(
+        max_length=64, help_text=_('Value of the dimension e.g. rock, or an artist id'))
+    value = models.BigIntegerField(
+        default=0, help_text=_('Number of rows'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='core_catalogstat_dimension_key'),
+        ]
+        indexes = [
+            # top-N reads, e.g. artists by number of songs
+            models.Index(fields=['dimension', 'value'], name='core_catalogstat_dim_value'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.dimension}:{self.key}={self.value}'
+
+
+class ImportJob(models.Model):
+    kind = models.CharField(
+        max_length=10, choices=IMPORT_JOB_KIND_CHOICES, default='artist',
+        help_text=_('What the uploaded CSV contains'))
+    mode = models.CharField(
+        max_length=10, choices=IMPORT_MODE_CHOICES, default='insert',
+        help_text=_('What happens to rows matching an existing artist'))
+    file = models.FileField(
+        upload_to='imports/%Y/%m/%d/', help_text=_('Uploaded CSV file'))
+    status = models.CharField(
+        max_length=10, choices=IMPORT_JOB_STATUS_CHOICES, default='pending', db_index=True,
+        help_text=_('Processing status'))
+    batch_size = models.PositiveIntegerField(
+        null=True, blank=True, help_text=_('Rows inserted per transaction'))
+    rows_done = models.PositiveIntegerField(
+        default=0, help_text=_('Rows imported so far'))
+    rows_failed = models.PositiveIntegerField(
+        default=0, help_text=_('Rows rejected so far'))
+    rows_updated = models.PositiveIntegerField(
+        default=0, help_text=_('Existing rows updated so far, upsert mode only'))
+    rows_skipped = models.PositiveIntegerField(
+        default=0, help_text=_('Rows left alone so far, unchanged or repeated in the file, upsert mode only'))
+    error = models.TextField(
+        null=True, blank=True, help_text=_('Why the job failed'))
+    error_report = models.CharField(
+        max_length=32, null=True, blank=True, editable=False,
+        help_text=_('Token of the CSV listing the rejected rows'))
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        help_text=_('User who uploaded the file'))
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text=_('Last time the worker running the job reported in'))
+
+    def __str__(self) -> str:
+        return f'{self.kind} import #{self.pk} ({self.status})'
+
+    @property
+    def elapsed(self):
+        # Seconds spent processing, up to now while the job still runs
+        if not self.started_at:
+            return 0.0
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+    @property
+    def throughput(self):
+        # Rows handled per second
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return (self.rows_done + self.rows_failed) / elapsed
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Fields of an artist row, in the order the imports and ArtistRepo pass them
+ARTIST_KEY_FIELDS = ['name', 'dob', 'gender', 'address', 'first_release_year', 'no_of_albums_released']
+DEFAULT_ARTIST_NATURAL_KEY = ['name', 'dob']
+
+NATURAL_KEY_BATCH_SIZE = 1000
+
+
+def get_artist_natural_key():
+    fields = list(getattr(settings, 'ARTIST_NATURAL_KEY', DEFAULT_ARTIST_NATURAL_KEY))
+    unknown = [field for field in fields if field not in ARTIST_KEY_FIELDS]
+    if not fields or unknown:
+        raise ImproperlyConfigured(f'ARTIST_NATURAL_KEY must be a list of {", ".join(ARTIST_KEY_FIELDS)}')
+    return fields
+
+
+def duplicate_artist_message():
+    return f'An artist with the same {" and ".join(get_artist_natural_key())} already exists.'
+
+
+def normalize(value):
+    # case, surrounding and repeated whitespace do not make a different artist
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).casefold()
+
+
+def make_artist_key():
+    """
+    Returns a function mapping an artist row (ARTIST_KEY_FIELDS order) to its natural key,
+    a hash of the normalized ARTIST_NATURAL_KEY fields that fits a fixed size index.
+    """
+    positions = [ARTIST_KEY_FIELDS.index(field) for field in get_artist_natural_key()]
+
+    def artist_key(row):
+        text = '\x1f'.join(normalize(row[position]) for position in positions)
+        return hashlib.sha1(text.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+    return artist_key
+
+
+def artist_natural_key(artist):
+    """
+    Natural key of an Artist instance, None for a tombstone like the raw SQL delete leaves.
+    """
+    if artist.deleted_at is not None:
+        return None
+    return make_artist_key()([getattr(artist, field) for field in ARTIST_KEY_FIELDS])
+
+
+def rebuild_artist_keys(cursor):
+    """
+    Recomputes natural_key of every live artist, after ARTIST_NATURAL_KEY changed.
+    When several artists share a key the oldest keeps it, the others are left without
+    one and are never matched by an upsert import. Returns (keyed, duplicates).
+    """
+    artist_key = make_artist_key()
+    cursor.execute("UPDATE core_artist SET natural_key = NULL WHERE natural_key IS NOT NULL")
+    cursor.execute(
+        f"SELECT id, {', '.join(ARTIST_KEY_FIELDS)} FROM core_artist WHERE deleted_at IS NULL ORDER BY id")
+
+    seen, updates, duplicates = set(), [], 0
+    for row in cursor:
+        key = artist_key(row[1:])
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        updates.append((key, row[0]))
+    for start in range(0, len(updates), NATURAL_KEY_BATCH_SIZE):
+        cursor.executemany(
+            "UPDATE core_artist SET natural_key = %s WHERE id = %s", updates[start:start + NATURAL_KEY_BATCH_SIZE])
+    return len(updates), duplicates
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+ARTIST_VERSION = 'core_artist'
+MUSIC_VERSION_PREFIX = 'core_music:artist:'
+
+DEFAULT_PAGE_CACHE_SIZE = 512
+DEFAULT_PAGE_CACHE_MAX_PAGE_SIZE = 256 * 1024
+
+
+def music_version(artist_id):
+    # Version of the song pages of a single artist
+    return f'{MUSIC_VERSION_PREFIX}{artist_id}'
+
+
+def get_version(cursor, name):
+    """
+    Reads the current version of a cached table.
+
+    Read it before the rows being cached: a write committing in between then stores
+    newer rows under an older version, never older rows under a newer one.
+    """
+    cursor.execute("SELECT value FROM core_cacheversion WHERE name = %s", [name])
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def bump_versions(cursor, names):
+    """
+    Moves each version forward, creating it when missing.
+
+    Call it in the same transaction as the write, versions are never reset or dropped.
+    """
+    params = [(name, 1) for name in sorted(set(names))]
+    if not params:
+        return
+    cursor.executemany(
+        "INSERT INTO core_cacheversion (name, value) VALUES (%s, %s) "
+        "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+        params
+    )
+
+
+class PageCache:
+    """
+    Bounded LRU of rendered page fragments, shared by the threads of one process.
+    """
+    def __init__(self, max_entries, max_page_size):
+        self.max_entries = max_entries
+        self.max_page_size = max_page_size
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            html = self.entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html):
+        # oversized pages (huge ?limit=) would push out everything else
+        if len(html) > self.max_page_size:
+            return
+        with self.lock:
+            self.entries[key] = html
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def render(self):
+        stats = self.stats()
+        return [
+            '# HELP page_cache_hits_total Cached list pages served',
+            '# TYPE page_cache_hits_total counter',
+            f'page_cache_hits_total {stats["hits"]}',
+            '# HELP page_cache_misses_total List pages rendered because no current version was cached',
+            '# TYPE page_cache_misses_total counter',
+            f'page_cache_misses_total {stats["misses"]}',
+            '# HELP page_cache_evictions_total Least recently used pages dropped to stay in bounds',
+            '# TYPE page_cache_evictions_total counter',
+            f'page_cache_evictions_total {stats["evictions"]}',
+            '# HELP page_cache_entries Pages held in the cache',
+            '# TYPE page_cache_entries gauge',
+            f'page_cache_entries {stats["entries"]}',
+        ]
+
+
+PAGE_CACHE = PageCache(
+    getattr(settings, 'PAGE_CACHE_SIZE', DEFAULT_PAGE_CACHE_SIZE),
+    getattr(settings, 'PAGE_CACHE_MAX_PAGE_SIZE', DEFAULT_PAGE_CACHE_MAX_PAGE_SIZE),
+)
+
+
+def page_key(request, view, version, scope=None):
+    """
+    Everything a cached list page depends on: the role picks the buttons shown, the
+    query string picks the rows, the version rules out pages rendered before a write.
+    """
+    return (
+        view, request.user.role_type, scope,
+        request.GET.get('page'), request.GET.get('cursor'), request.GET.get('limit'),
+        version,
+    )
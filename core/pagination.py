@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+from django.core import signing
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+Page = namedtuple('Page', ['rows', 'page', 'limit', 'next_page', 'prev_page', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(last_id, key=None, direction='next'):
+    """
+    Builds an opaque, signed token from the last seen id and its sort key. The signature
+    has no timestamp, the same page always links the same cursors and keeps its ETag.
+    """
+    if key is not None and not isinstance(key, (int, float)):
+        # dates and the like compare as their ISO text in SQLite
+        key = str(key)
+    return signing.Signer(salt=CURSOR_SALT).sign_object({'id': last_id, 'key': key, 'dir': direction}, compress=True)
+
+
+def decode_cursor(token):
+    """
+    Returns the payload of a cursor token, or None when it is missing or has been tampered with.
+    """
+    if not token:
+        return None
+    try:
+        data = signing.Signer(salt=CURSOR_SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get('dir') not in ('next', 'prev'):
+        return None
+    return data
+
+
+def fetch_keyset_page(cursor, columns, table, limit, token=None, where='', params=(), order_by='id'):
+    """
+    Fetches one page with an indexed seek (`WHERE id > %s`) instead of an OFFSET scan.
+
+    Returns (rows, next_cursor, prev_cursor); rows are always in ascending order.
+    """
+    data = decode_cursor(token)
+    id_index = columns.index('id')
+    key_index = columns.index(order_by)
+
+    conditions = [where] if where else []
+    params = list(params)
+    backwards = data is not None and data['dir'] == 'prev'
+    if data is not None:
+        operator = '<' if backwards else '>'
+        if order_by == 'id':
+            conditions.append(f"id {operator} %s")
+            params.append(data['id'])
+        else:
+            conditions.append(f"({order_by}, id) {operator} (%s, %s)")
+            params.extend([data['key'], data['id']])
+
+    direction = 'DESC' if backwards else 'ASC'
+    order = f"id {direction}" if order_by == 'id' else f"{order_by} {direction}, id {direction}"
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    # fetch one extra row to know whether there is another page beyond this one
+    sql += f" ORDER BY {order} LIMIT %s"
+    cursor.execute(sql, params + [limit + 1])
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first, last = rows[0], rows[-1]
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else data is not None
+    next_cursor = encode_cursor(last[id_index], last[key_index], 'next') if has_next else None
+    prev_cursor = encode_cursor(first[id_index], first[key_index], 'prev') if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def paginate(request, cursor, columns, table, where='', params=(), total=0):
+    """
+    Paginates a list view.
+
+    `?page=` keeps the legacy LIMIT/OFFSET behaviour, anything else seeks by `?cursor=`.
+    """
+    limit = int(request.GET.get('limit', 1))
+
+    if 'page' in request.GET:
+        page = int(request.GET['page'])
+        offset = (page - 1) * limit
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        cursor.execute(sql + " ORDER BY id LIMIT %s OFFSET %s", list(params) + [limit, offset])
+        rows = cursor.fetchall()
+        total_pages = total / limit
+        next_page = page + 1 if page < total_pages else None
+        prev_page = page - 1 if page > 1 else None
+        return Page(rows, page, limit, next_page, prev_page, None, None)
+
+    rows, next_cursor, prev_cursor = fetch_keyset_page(
+        cursor, columns, table, limit, request.GET.get('cursor'), where, params)
+    return Page(rows, None, limit, None, None, next_cursor, prev_cursor)
@@ -0,0 +1,80 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .delta import retention_cutoff
+
+# Rows deleted per transaction, small enough that other writers barely wait for the lock
+DEFAULT_PURGE_CHUNK_SIZE = 500
+DEFAULT_PURGE_ROWS_PER_SECOND = 5000
+
+# Oldest tombstone first, through the deleted_at index. Tombstones stay for DELTA_RETENTION_DAYS
+# so the delta export can report them
+TOMBSTONE_SQL = "SELECT id FROM core_artist WHERE deleted_at < %s ORDER BY deleted_at, id LIMIT 1"
+PURGE_MUSIC_SQL = (
+    "DELETE FROM core_music WHERE id IN (SELECT id FROM core_music WHERE artist_relation_id = %s LIMIT %s)"
+)
+PURGE_ARTIST_SQL = "DELETE FROM core_artist WHERE id = %s AND deleted_at IS NOT NULL"
+PURGE_MUSIC_DELETION_SQL = (
+    "DELETE FROM core_musicdeletion WHERE id IN "
+    "(SELECT id FROM core_musicdeletion WHERE deleted_at < %s ORDER BY deleted_at LIMIT %s)"
+)
+
+
+def get_purge_chunk_size():
+    return getattr(settings, 'PURGE_CHUNK_SIZE', DEFAULT_PURGE_CHUNK_SIZE)
+
+
+def get_purge_rows_per_second():
+    return getattr(settings, 'PURGE_ROWS_PER_SECOND', DEFAULT_PURGE_ROWS_PER_SECOND)
+
+
+def purge_chunk(chunk_size, cutoff):
+    """
+    Deletes up to `chunk_size` songs of the oldest artist tombstoned before `cutoff` in one
+    transaction, then the artist once it has none left. With no such artist, deletes up to
+    `chunk_size` song deletions recorded before `cutoff`. Returns the rows deleted, 0 when
+    there is nothing to purge.
+
+    Counters and rollups are untouched, the tombstone already took the rows out of them.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(TOMBSTONE_SQL, [cutoff])
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(PURGE_MUSIC_DELETION_SQL, [cutoff, chunk_size])
+            return cursor.rowcount
+        artist_id = row[0]
+        cursor.execute(PURGE_MUSIC_SQL, [artist_id, chunk_size])
+        deleted = cursor.rowcount
+        if deleted < chunk_size:
+            cursor.execute(PURGE_ARTIST_SQL, [artist_id])
+            deleted += cursor.rowcount
+    return deleted
+
+
+def purge_tombstones(chunk_size=None, rows_per_second=None, progress=None):
+    """
+    Purges every tombstone past the delta retention chunk by chunk, sleeping between chunks so the
+    average rate stays under `rows_per_second` (0 for no limit). Returns the rows deleted.
+
+    `progress(rows deleted so far)` is called after each chunk.
+    """
+    chunk_size = chunk_size or get_purge_chunk_size()
+    rows_per_second = get_purge_rows_per_second() if rows_per_second is None else rows_per_second
+
+    cutoff = retention_cutoff()
+    started = time.monotonic()
+    total = 0
+    while True:
+        deleted = purge_chunk(chunk_size, cutoff)
+        if not deleted:
+            return total
+        total += deleted
+        if progress:
+            progress(total)
+        if rows_per_second:
+            delay = total / rows_per_second - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
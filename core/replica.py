@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+from .delta import NOW_SQL
+
+REPLICA_ALIAS = 'replica'
+# Only these models are read from the replica, users and sessions always come from the primary
+REPLICA_MODELS = {'core.artist', 'core.music'}
+
+STICKY_COOKIE = 'primary_until'
+DEFAULT_REPLICA_STICKY_SECONDS = 15
+# Reads go back to the primary when the last complete sync is older than this
+DEFAULT_REPLICA_MAX_LAG_SECONDS = 30
+
+# Statements that change the primary, whatever the HTTP method (the delete links are GETs)
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Database the current view reads from, set by `replica_reads`
+current_read_alias = ContextVar('current_read_alias', default=DEFAULT_DB_ALIAS)
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', DEFAULT_REPLICA_STICKY_SECONDS)
+
+
+def get_max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG_SECONDS', DEFAULT_REPLICA_MAX_LAG_SECONDS)
+
+
+def replica_path():
+    if REPLICA_ALIAS not in settings.DATABASES:
+        return None
+    return str(settings.DATABASES[REPLICA_ALIAS]['NAME'])
+
+
+def marker_path(path):
+    # written next to the replica once a copy is complete
+    return f'{path}.synced'
+
+
+# (marker path, mtime) and the state read from it, the marker is only re-read when it changes
+_last_marker = (None, None)
+
+
+def replica_state():
+    """
+    Returns (synced_at, until) of the last complete sync: when it finished, as a unix time,
+    and the primary's clock (the NOW_SQL format) when its snapshot was taken, so the
+    replica holds every row committed before `until`. None when it was never synced.
+    """
+    global _last_marker
+    path = replica_path()
+    if path is None:
+        return None
+    marker = marker_path(path)
+    try:
+        version = (marker, os.stat(marker).st_mtime_ns)
+    except OSError:
+        return None
+    if _last_marker[0] == version:
+        return _last_marker[1]
+    try:
+        with open(marker) as data:
+            synced = json.load(data)
+        state = (float(synced['synced_at']), str(synced['until']))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    _last_marker = (version, state)
+    return state
+
+
+def replica_until():
+    """
+    Primary time the rows of the current read database stop at, None on the primary itself.
+    """
+    if current_read_alias.get() != REPLICA_ALIAS:
+        return None
+    state = replica_state()
+    return state[1] if state else None
+
+
+def read_alias(request):
+    """
+    Database a read-only view of this request should use: the replica while its last
+    complete sync is within REPLICA_MAX_LAG_SECONDS, unless the client wrote within the
+    sticky window and must see its own writes. A stalled `sync_replica` sends reads back
+    to the primary instead of serving ever older rows.
+    """
+    state = replica_state()
+    if state is None or time.time() - state[0] > get_max_lag():
+        return DEFAULT_DB_ALIAS
+    try:
+        sticky_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+    except ValueError:
+        sticky_until = 0
+    return DEFAULT_DB_ALIAS if sticky_until > time.time() else REPLICA_ALIAS
+
+
+def read_connection():
+    return connections[current_read_alias.get()]
+
+
+def replica_reads(view_func):
+    """
+    Runs the view with `read_connection()` (and ORM reads of REPLICA_MODELS) on the database
+    picked by `read_alias`.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            token = current_read_alias.set(read_alias(request))
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                current_read_alias.reset(token)
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            token = current_read_alias.set(read_alias(request))
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                current_read_alias.reset(token)
+    return wrapper
+
+
+def is_write(sql):
+    words = sql.split(None, 1)
+    return bool(words) and words[0].upper() in WRITE_STATEMENTS
+
+
+class StickyPrimaryMiddleware(MiddlewareMixin):
+    """
+    Sends the reads of a client that just wrote to the primary for REPLICA_STICKY_SECONDS,
+    long enough for `sync_replica` to copy the write over.
+
+    Writes are noticed on the primary connection itself, raw SQL of the repositories and
+    ORM saves alike, and flagged on the request as `wrote_primary`.
+    """
+    def process_request(self, request):
+        request.wrote_primary = False
+
+        def watch_writes(execute, sql, params, many, context):
+            if not request.wrote_primary and is_write(sql):
+                request.wrote_primary = True
+            return execute(sql, params, many, context)
+
+        request._watch_writes = watch_writes
+        connections[DEFAULT_DB_ALIAS].execute_wrappers.append(watch_writes)
+
+    def process_response(self, request, response):
+        watch_writes = getattr(request, '_watch_writes', None)
+        if watch_writes in connections[DEFAULT_DB_ALIAS].execute_wrappers:
+            connections[DEFAULT_DB_ALIAS].execute_wrappers.remove(watch_writes)
+        if getattr(request, 'wrote_primary', False):
+            seconds = get_sticky_seconds()
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in REPLICA_MODELS:
+            return current_read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema from the primary with every sync
+        return False if db == REPLICA_ALIAS else None
+
+
+@receiver(connection_created)
+def make_replica_read_only(sender, connection, **kwargs):
+    if connection.alias == REPLICA_ALIAS:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA query_only = ON')
+
+
+def sync_replica():
+    """
+    Copies the primary into the replica with the SQLite backup API, returns the seconds it took.
+
+    The copy runs in a single step, it reads one consistent snapshot of the primary and the
+    replica's readers switch from the old copy to the new one at once. The first copy goes
+    to a temporary file so no reader ever opens a half-written replica.
+    """
+    path = replica_path()
+    if path is None:
+        raise RuntimeError(f'No {REPLICA_ALIAS!r} database configured')
+    target_path = path if os.path.exists(path) else f'{path}.tmp'
+
+    started = time.perf_counter()
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    # read before the copy starts, every row committed before it is in the copy
+    until = source.connection.execute(NOW_SQL).fetchone()[0]
+    target = sqlite3.connect(target_path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+    if target_path != path:
+        os.replace(target_path, path)
+
+    marker = marker_path(path)
+    with open(f'{marker}.tmp', 'w') as output:
+        json.dump({'synced_at': time.time(), 'until': until}, output)
+    os.replace(f'{marker}.tmp', marker)
+    return time.perf_counter() - started
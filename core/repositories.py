@@ -0,0 +1,354 @@
+from collections import Counter, namedtuple
+
+from .auth import revoke_snapshot
+from .counters import (
+    USER_COUNTER,
+    ARTIST_COUNTER,
+    MUSIC_COUNTER,
+    artist_music_counter,
+    get_count,
+    adjust_count,
+    drop_count,
+    drop_counts
+    )
+from .naturalkeys import make_artist_key
+from .pagecache import ARTIST_VERSION, bump_versions, music_version
+from .pagination import paginate
+from .stats import (
+    GENRE_STAT,
+    ARTIST_SONGS_STAT,
+    adjust_stats,
+    forget_artist,
+    forget_artists,
+    record_artists,
+    record_songs
+    )
+
+# Column lists and statements are built once at import time, so every request sends
+# the exact same SQL text and sqlite3 reuses its prepared statements.
+
+# created_at/updated_at for the raw SQL writes, the ORM's text format to the millisecond
+NOW_SQL = "strftime('%%Y-%%m-%%d %%H:%%M:%%f', 'now')"
+
+USER_LIST_COLUMNS = ['id', 'first_name', 'last_name', 'phone', 'address', 'gender', 'email', 'role_type']
+USER_DETAIL_COLUMNS = ['id', 'first_name', 'last_name', 'email', 'phone', 'dob', 'gender', 'address', 'role_type']
+USER_SELECT_SQL = f"SELECT {', '.join(USER_DETAIL_COLUMNS)} FROM user WHERE id = %s"
+USER_INSERT_SQL = (
+    "INSERT INTO user (first_name, last_name, email, phone, dob, gender, address, role_type, "
+    "password, is_staff, is_superuser, created_at, updated_at) "
+    f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, {NOW_SQL}, {NOW_SQL})"
+)
+USER_UPDATE_SQL = (
+    "UPDATE user SET first_name = %s, last_name = %s, email = %s, phone = %s, dob = %s, gender = %s, "
+    f"address = %s, role_type = %s, updated_at = {NOW_SQL} WHERE id = %s"
+)
+USER_DELETE_SQL = "DELETE FROM user WHERE id = %s"
+
+ARTIST_LIST_COLUMNS = ['name', 'dob', 'gender', 'address', 'first_release_year', 'no_of_albums_released', 'id']
+ARTIST_DETAIL_COLUMNS = ['id', 'name', 'dob', 'gender', 'address', 'first_release_year', 'no_of_albums_released']
+# Deleted artists keep a tombstone (`deleted_at`) until `purge_artists` removes them,
+# every read of core_artist skips tombstones
+LIVE_ARTIST_SQL = "deleted_at IS NULL"
+ARTIST_SELECT_SQL = (
+    f"SELECT {', '.join(ARTIST_DETAIL_COLUMNS)} FROM core_artist WHERE id = %s AND {LIVE_ARTIST_SQL}"
+)
+ARTIST_INSERT_SQL = (
+    "INSERT INTO core_artist (user_id, name, dob, gender, address, first_release_year, no_of_albums_released, "
+    "natural_key, created_at, updated_at) "
+    f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s, {NOW_SQL}, {NOW_SQL})"
+)
+ARTIST_UPDATE_SQL = (
+    "UPDATE core_artist SET name = %s, dob = %s, gender = %s, address = %s, first_release_year = %s, "
+    f"no_of_albums_released = %s, natural_key = %s, updated_at = {NOW_SQL} WHERE id = %s AND {LIVE_ARTIST_SQL}"
+)
+# The user and the natural key are released right away so they can go to a new artist
+ARTIST_TOMBSTONE_SET_SQL = (
+    f"UPDATE core_artist SET deleted_at = {NOW_SQL}, updated_at = {NOW_SQL}, user_id = NULL, natural_key = NULL"
+)
+ARTIST_TOMBSTONE_SQL = f"{ARTIST_TOMBSTONE_SET_SQL} WHERE id = %s AND {LIVE_ARTIST_SQL}"
+ARTIST_GENRES_SQL = "SELECT genre, COUNT(*) FROM core_music WHERE artist_relation_id = %s GROUP BY genre"
+
+MUSIC_LIST_COLUMNS = ['id', 'title', 'album_name']
+MUSIC_DETAIL_COLUMNS = ['id', 'title', 'album_name', 'genre']
+# Songs of a tombstoned artist are hidden until the purge removes them
+LIVE_MUSIC_SQL = f"EXISTS (SELECT 1 FROM core_artist WHERE id = %s AND {LIVE_ARTIST_SQL})"
+MUSIC_SELECT_SQL = (
+    f"SELECT {', '.join(MUSIC_DETAIL_COLUMNS)} FROM core_music "
+    f"WHERE artist_relation_id = %s AND id = %s AND {LIVE_MUSIC_SQL}"
+)
+MUSIC_INSERT_SQL = (
+    "INSERT INTO core_music (artist_relation_id, title, album_name, genre, created_at, updated_at) "
+    f"VALUES (%s, %s, %s, %s, {NOW_SQL}, {NOW_SQL})"
+)
+MUSIC_UPDATE_SQL = (
+    f"UPDATE core_music SET title = %s, album_name = %s, genre = %s, updated_at = {NOW_SQL} "
+    "WHERE artist_relation_id = %s AND id = %s"
+)
+MUSIC_DELETE_SQL = "DELETE FROM core_music WHERE artist_relation_id = %s AND id = %s"
+
+# Ids bound per set-based bulk statement, well below SQLite's limit on parameters
+BULK_BATCH_SIZE = 500
+
+
+def id_batches(ids, batch_size=BULK_BATCH_SIZE):
+    """
+    Yields (ids, placeholders) for `IN (...)` clauses, `batch_size` ids at a time.
+    """
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        yield batch, ', '.join(['%s'] * len(batch))
+
+
+# Rows as tuples with named fields: no per-row dict, templates read them as {{ artist.name }}
+UserRecord = namedtuple('UserRecord', USER_LIST_COLUMNS)
+UserDetail = namedtuple('UserDetail', USER_DETAIL_COLUMNS)
+ArtistRecord = namedtuple('ArtistRecord', ARTIST_LIST_COLUMNS)
+ArtistDetail = namedtuple('ArtistDetail', ARTIST_DETAIL_COLUMNS)
+SongRecord = namedtuple('SongRecord', MUSIC_LIST_COLUMNS)
+SongDetail = namedtuple('SongDetail', MUSIC_DETAIL_COLUMNS)
+
+
+class Repo:
+    """
+    Data access for one table over a cursor the view opens once per request.
+
+    Write methods keep the row counters, rollups and page cache versions in step, call
+    them inside a transaction.
+    """
+    table = None
+    list_columns = None
+    record = None
+    detail = None
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def fetch_one(self, sql, params):
+        self.cursor.execute(sql, params)
+        row = self.cursor.fetchone()
+        return self.detail._make(row) if row else None
+
+    def page(self, request, total, where='', params=()):
+        pagination = paginate(request, self.cursor, self.list_columns, self.table, where, params, total)
+        return pagination._replace(rows=list(map(self.record._make, pagination.rows)))
+
+
+class UserRepo(Repo):
+    table = 'user'
+    list_columns = USER_LIST_COLUMNS
+    record = UserRecord
+    detail = UserDetail
+
+    def count(self):
+        return get_count(self.cursor, USER_COUNTER)
+
+    def get(self, user_id):
+        return self.fetch_one(USER_SELECT_SQL, [user_id])
+
+    def insert(self, first_name, last_name, email, phone, dob, gender, address, role_type,
+               password, is_staff=False, is_superuser=False):
+        self.cursor.execute(USER_INSERT_SQL, [
+            first_name, last_name, email, phone, dob, gender, address, role_type,
+            password, is_staff, is_superuser
+        ])
+        adjust_count(self.cursor, USER_COUNTER, 1)
+
+    def update(self, user_id, first_name, last_name, email, phone, dob, gender, address, role_type):
+        self.cursor.execute(USER_UPDATE_SQL, [
+            first_name, last_name, email, phone, dob, gender, address, role_type, user_id
+        ])
+        revoke_snapshot(user_id)
+
+    def delete(self, user_id):
+        self.cursor.execute(USER_DELETE_SQL, [user_id])
+        adjust_count(self.cursor, USER_COUNTER, -self.cursor.rowcount)
+        revoke_snapshot(user_id)
+
+
+class ArtistRepo(Repo):
+    table = 'core_artist'
+    list_columns = ARTIST_LIST_COLUMNS
+    record = ArtistRecord
+    detail = ArtistDetail
+
+    def count(self):
+        return get_count(self.cursor, ARTIST_COUNTER)
+
+    def page(self, request, total):
+        return super().page(request, total, LIVE_ARTIST_SQL)
+
+    def get(self, artist_id):
+        return self.fetch_one(ARTIST_SELECT_SQL, [artist_id])
+
+    def insert(self, user_id, name, dob, gender, address, first_release_year, no_of_albums_released):
+        # raises IntegrityError when a live artist has the same natural key
+        values = [name, dob, gender, address, first_release_year, no_of_albums_released]
+        self.cursor.execute(ARTIST_INSERT_SQL, [user_id] + values + [make_artist_key()(values)])
+        adjust_count(self.cursor, ARTIST_COUNTER, 1)
+        record_artists(self.cursor, [(gender, first_release_year)])
+        bump_versions(self.cursor, [ARTIST_VERSION])
+
+    def update(self, artist, name, dob, gender, address, first_release_year, no_of_albums_released):
+        # `artist` is the ArtistDetail read before the update
+        values = [name, dob, gender, address, first_release_year, no_of_albums_released]
+        self.cursor.execute(ARTIST_UPDATE_SQL, values + [make_artist_key()(values), artist.id])
+        # move the artist between the gender/decade rollups
+        record_artists(self.cursor, [(artist.gender, artist.first_release_year)], sign=-1)
+        record_artists(self.cursor, [(gender, first_release_year)])
+        bump_versions(self.cursor, [ARTIST_VERSION])
+
+    def delete(self, artist):
+        # `artist` is the ArtistDetail read before the delete.
+        # Only a tombstone is written, `purge_artists` removes the rows in small chunks
+        # later. The artist and its songs leave every counter and rollup right away.
+        self.cursor.execute(ARTIST_TOMBSTONE_SQL, [artist.id])
+        if not self.cursor.rowcount:
+            return
+        self.cursor.execute(ARTIST_GENRES_SQL, [artist.id])
+        genres = self.cursor.fetchall()
+        adjust_count(self.cursor, MUSIC_COUNTER, -sum(songs for _, songs in genres))
+        drop_count(self.cursor, artist_music_counter(artist.id))
+        adjust_stats(self.cursor, GENRE_STAT, {genre: -songs for genre, songs in genres})
+        forget_artist(self.cursor, artist.id)
+        adjust_count(self.cursor, ARTIST_COUNTER, -1)
+        record_artists(self.cursor, [(artist.gender, artist.first_release_year)], sign=-1)
+        bump_versions(self.cursor, [ARTIST_VERSION, music_version(artist.id)])
+
+    def bulk_delete(self, artist_ids):
+        """
+        Tombstones the artists like `delete`, one statement per table for each batch of ids.
+        Returns (artists deleted, songs deleted).
+        """
+        artists, genres = [], Counter()
+        for batch, marks in id_batches(artist_ids):
+            self.cursor.execute(
+                f"{ARTIST_TOMBSTONE_SET_SQL} WHERE {LIVE_ARTIST_SQL} AND id IN ({marks}) "
+                "RETURNING id, gender, first_release_year",
+                batch
+            )
+            rows = self.cursor.fetchall()
+            if not rows:
+                continue
+            artists += rows
+            ids = [artist_id for artist_id, _, _ in rows]
+            id_marks = ', '.join(['%s'] * len(ids))
+            self.cursor.execute(
+                f"SELECT genre, COUNT(*) FROM core_music WHERE artist_relation_id IN ({id_marks}) GROUP BY genre", ids)
+            for genre, total in self.cursor.fetchall():
+                genres[genre] -= total
+            drop_counts(self.cursor, [artist_music_counter(artist_id) for artist_id in ids])
+            forget_artists(self.cursor, ids)
+
+        songs = -sum(genres.values())
+        if artists:
+            adjust_count(self.cursor, MUSIC_COUNTER, -songs)
+            adjust_stats(self.cursor, GENRE_STAT, genres)
+            adjust_count(self.cursor, ARTIST_COUNTER, -len(artists))
+            record_artists(
+                self.cursor, [(gender, first_release_year) for _, gender, first_release_year in artists], sign=-1)
+            bump_versions(self.cursor, [ARTIST_VERSION] + [music_version(artist_id) for artist_id, _, _ in artists])
+        return len(artists), songs
+
+
+class MusicRepo(Repo):
+    table = 'core_music'
+    list_columns = MUSIC_LIST_COLUMNS
+    record = SongRecord
+    detail = SongDetail
+
+    def count(self, artist_id):
+        return get_count(self.cursor, artist_music_counter(artist_id))
+
+    def page(self, request, total, artist_id):
+        return super().page(request, total, f'artist_relation_id = %s AND {LIVE_MUSIC_SQL}', [artist_id, artist_id])
+
+    def get(self, artist_id, song_id):
+        return self.fetch_one(MUSIC_SELECT_SQL, [artist_id, song_id, artist_id])
+
+    def insert(self, artist_id, title, album_name, genre):
+        self.cursor.execute(MUSIC_INSERT_SQL, [artist_id, title, album_name, genre])
+        adjust_count(self.cursor, MUSIC_COUNTER, 1)
+        adjust_count(self.cursor, artist_music_counter(artist_id), 1)
+        record_songs(self.cursor, [(artist_id, genre)])
+        bump_versions(self.cursor, [music_version(artist_id)])
+
+    def update(self, artist_id, song, title, album_name, genre):
+        # `song` is the SongDetail read before the update
+        self.cursor.execute(MUSIC_UPDATE_SQL, [title, album_name, genre, artist_id, song.id])
+        # move the song between the genre rollups
+        adjust_stats(self.cursor, GENRE_STAT, {song.genre: -1})
+        adjust_stats(self.cursor, GENRE_STAT, {genre: 1})
+        bump_versions(self.cursor, [music_version(artist_id)])
+
+    def delete(self, artist_id, song):
+        # `song` is the SongDetail read before the delete
+        self.cursor.execute(MUSIC_DELETE_SQL, [artist_id, song.id])
+        deleted = self.cursor.rowcount
+        adjust_count(self.cursor, MUSIC_COUNTER, -deleted)
+        adjust_count(self.cursor, artist_music_counter(artist_id), -deleted)
+        if deleted:
+            record_songs(self.cursor, [(artist_id, song.genre)], sign=-1)
+            bump_versions(self.cursor, [music_version(artist_id)])
+
+    def bulk_delete(self, artist_id, song_ids):
+        """
+        Deletes songs of the artist, one statement per batch of ids. Returns the songs deleted.
+        """
+        genres = Counter()
+        for batch, marks in id_batches(song_ids):
+            self.cursor.execute(
+                f"DELETE FROM core_music WHERE artist_relation_id = %s AND id IN ({marks}) RETURNING genre",
+                [artist_id] + batch
+            )
+            genres.update(genre for genre, in self.cursor.fetchall())
+
+        deleted = sum(genres.values())
+        if deleted:
+            adjust_count(self.cursor, MUSIC_COUNTER, -deleted)
+            adjust_count(self.cursor, artist_music_counter(artist_id), -deleted)
+            adjust_stats(self.cursor, GENRE_STAT, {genre: -songs for genre, songs in genres.items()})
+            adjust_stats(self.cursor, ARTIST_SONGS_STAT, {artist_id: -deleted})
+            bump_versions(self.cursor, [music_version(artist_id)])
+        return deleted
+
+    def bulk_set_genre(self, artist_id, song_ids, genre):
+        """
+        Moves songs of the artist to `genre`, one statement per batch of ids. Returns the songs changed.
+        """
+        genres = Counter()
+        for batch, marks in id_batches(song_ids):
+            where = f"artist_relation_id = %s AND genre <> %s AND id IN ({marks})"
+            params = [artist_id, genre] + batch
+            self.cursor.execute(f"SELECT genre, COUNT(*) FROM core_music WHERE {where} GROUP BY genre", params)
+            for old_genre, songs in self.cursor.fetchall():
+                genres[old_genre] -= songs
+            self.cursor.execute(
+                f"UPDATE core_music SET genre = %s, updated_at = {NOW_SQL} WHERE {where}", [genre] + params)
+
+        changed = -sum(genres.values())
+        if changed:
+            genres[genre] += changed
+            adjust_stats(self.cursor, GENRE_STAT, genres)
+            bump_versions(self.cursor, [music_version(artist_id)])
+        return changed
+
+    def bulk_move(self, artist_id, song_ids, target_artist_id):
+        """
+        Moves songs of the artist to another one, one statement per batch of ids. Returns the songs moved.
+        """
+        moved = 0
+        for batch, marks in id_batches(song_ids):
+            self.cursor.execute(
+                f"UPDATE core_music SET artist_relation_id = %s, updated_at = {NOW_SQL} "
+                f"WHERE artist_relation_id = %s AND id IN ({marks})",
+                [target_artist_id, artist_id] + batch
+            )
+            moved += self.cursor.rowcount
+
+        if moved:
+            adjust_count(self.cursor, artist_music_counter(artist_id), -moved)
+            adjust_count(self.cursor, artist_music_counter(target_artist_id), moved)
+            adjust_stats(self.cursor, ARTIST_SONGS_STAT, {artist_id: -moved, target_artist_id: moved})
+            bump_versions(self.cursor, [music_version(artist_id), music_version(target_artist_id)])
+        return moved
@@ -0,0 +1,113 @@
+import re
+
+# FTS5 external-content tables over core_artist and core_music, kept in sync by
+# triggers so raw SQL and ORM writes are both indexed. Migration 0007 creates the
+# same objects; the statements are repeated here so rebuild_search_index can
+# restore them after a migration remakes either table.
+SEARCH_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_artist_fts USING fts5("
+    "name, address, content='core_artist', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS core_artist_fts_ai AFTER INSERT ON core_artist BEGIN "
+    "INSERT INTO core_artist_fts (rowid, name, address) VALUES (new.id, new.name, new.address); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS core_artist_fts_ad AFTER DELETE ON core_artist BEGIN "
+    "INSERT INTO core_artist_fts (core_artist_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS core_artist_fts_au AFTER UPDATE OF name, address ON core_artist BEGIN "
+    "INSERT INTO core_artist_fts (core_artist_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address); "
+    "INSERT INTO core_artist_fts (rowid, name, address) VALUES (new.id, new.name, new.address); "
+    "END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_music_fts USING fts5("
+    "title, album_name, content='core_music', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS core_music_fts_ai AFTER INSERT ON core_music BEGIN "
+    "INSERT INTO core_music_fts (rowid, title, album_name) VALUES (new.id, new.title, new.album_name); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS core_music_fts_ad AFTER DELETE ON core_music BEGIN "
+    "INSERT INTO core_music_fts (core_music_fts, rowid, title, album_name) VALUES ('delete', old.id, old.title, old.album_name); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS core_music_fts_au AFTER UPDATE OF title, album_name ON core_music BEGIN "
+    "INSERT INTO core_music_fts (core_music_fts, rowid, title, album_name) VALUES ('delete', old.id, old.title, old.album_name); "
+    "INSERT INTO core_music_fts (rowid, title, album_name) VALUES (new.id, new.title, new.album_name); "
+    "END",
+]
+
+SEARCH_TABLES = ['core_artist_fts', 'core_music_fts']
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+ARTIST_SEARCH_SQL = (
+    "SELECT core_artist.id, core_artist.name, core_artist.address "
+    "FROM core_artist_fts INNER JOIN core_artist ON core_artist.id = core_artist_fts.rowid "
+    "WHERE core_artist_fts MATCH %s AND core_artist.deleted_at IS NULL "
+    "ORDER BY core_artist_fts.rank LIMIT %s OFFSET %s"
+)
+MUSIC_SEARCH_SQL = (
+    "SELECT core_music.id, core_music.title, core_music.album_name, core_music.artist_relation_id, core_artist.name "
+    "FROM core_music_fts INNER JOIN core_music ON core_music.id = core_music_fts.rowid "
+    "INNER JOIN core_artist ON core_artist.id = core_music.artist_relation_id "
+    "WHERE core_music_fts MATCH %s AND core_artist.deleted_at IS NULL "
+    "ORDER BY core_music_fts.rank LIMIT %s OFFSET %s"
+)
+
+
+def build_match_query(text):
+    """
+    Turns free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    Words are quoted so FTS5 operators typed by the user are searched literally.
+    Returns None when there is nothing to search for.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def parse_page(request):
+    """
+    Returns (page, limit) from the query string, the defaults for anything that is not a
+    number and the limit held to MAX_SEARCH_LIMIT.
+    """
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = DEFAULT_SEARCH_LIMIT
+    return page, limit
+
+
+def search(cursor, sql, text, limit, offset=0):
+    """
+    Runs a ranked search, returns (rows, has_more).
+    """
+    query = build_match_query(text)
+    if query is None:
+        return [], False
+    # fetch one extra row to know whether there is another page
+    cursor.execute(sql, [query, limit + 1, offset])
+    rows = cursor.fetchall()
+    return rows[:limit], len(rows) > limit
+
+
+def rebuild_index(cursor):
+    """
+    Recreates any missing search table or trigger and reindexes every row.
+    """
+    for statement in SEARCH_SCHEMA:
+        cursor.execute(statement)
+    for table in SEARCH_TABLES:
+        cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+
+
+def optimize_index(cursor):
+    # Merge the FTS5 b-trees, worth running after large imports
+    for table in SEARCH_TABLES:
+        cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from .exports import ARTIST_EXPORT_FIELDS, EXPORT_FORMATS, MUSIC_EXPORT_FIELDS, ExportEncoder, get_export_batch_size
+
+# Same rows as the export engine, by id range and with sqlite3 placeholders
+ARTIST_SHARD_SQL = (
+    f"SELECT {', '.join(ARTIST_EXPORT_FIELDS)} FROM core_artist "
+    "WHERE id BETWEEN ? AND ? AND deleted_at IS NULL ORDER BY id"
+)
+MUSIC_SHARD_SQL = (
+    "SELECT core_music.id, core_music.artist_relation_id, core_artist.name, "
+    "core_music.title, core_music.album_name, core_music.genre "
+    "FROM core_music INNER JOIN core_artist ON core_artist.id = core_music.artist_relation_id "
+    "WHERE core_music.id BETWEEN ? AND ? AND core_artist.deleted_at IS NULL ORDER BY core_music.id"
+)
+# Id ranges holding about the same number of rows, in one pass over the primary key
+ARTIST_RANGES_SQL = (
+    "SELECT MIN(id), MAX(id), COUNT(*) FROM (SELECT id, NTILE(%s) OVER (ORDER BY id) AS shard "
+    "FROM core_artist WHERE deleted_at IS NULL) GROUP BY shard ORDER BY shard"
+)
+MUSIC_RANGES_SQL = (
+    "SELECT MIN(id), MAX(id), COUNT(*) FROM (SELECT id, NTILE(%s) OVER (ORDER BY id) AS shard "
+    "FROM core_music) GROUP BY shard ORDER BY shard"
+)
+
+# name: (fields, rows of one id range, ranges)
+SHARD_TABLES = {
+    'artists': (ARTIST_EXPORT_FIELDS, ARTIST_SHARD_SQL, ARTIST_RANGES_SQL),
+    'songs': (MUSIC_EXPORT_FIELDS, MUSIC_SHARD_SQL, MUSIC_RANGES_SQL),
+}
+
+
+def id_ranges(table, shards, using='default'):
+    """
+    Splits the rows of `table` into up to `shards` contiguous id ranges, returns (first, last) pairs.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(SHARD_TABLES[table][2], [shards])
+        return [(first, last) for first, last, _ in cursor.fetchall()]
+
+
+def export_shard(database, table, export_format, compress, first, last, path, batch_size):
+    """
+    Writes the rows of `table` with an id in [first, last] to `path`, without a header or trailer.
+    Runs in a worker process on its own read-only connection. Returns the shard's manifest entry.
+    """
+    fields, sql, _ = SHARD_TABLES[table]
+    encoder = ExportEncoder(export_format, fields, trailer=False)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    size = 0
+
+    source = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    try:
+        cursor = source.execute(sql, [first, last])
+        with open(path, 'wb') as output:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                data = encoder.batch(rows)
+                if compressor:
+                    data = compressor.compress(data)
+                output.write(data)
+                size += len(data)
+            if compressor:
+                data = compressor.flush()
+                output.write(data)
+                size += len(data)
+    finally:
+        source.close()
+
+    return {
+        'file': Path(path).name, 'first_id': first, 'last_id': last,
+        'rows': encoder.count, 'bytes': size, 'sha256': encoder.checksum.hexdigest(),
+    }
+
+
+def export_shards(table, output_dir, export_format='csv', compress=False, workers=None, shards=None,
+                  batch_size=None, using='default'):
+    """
+    Exports `table` as shard files in `output_dir`, serialized in parallel by `workers` processes,
+    and writes manifest.json next to them. Returns the manifest.
+
+    Shards hold the rows the export engine streams, in the same format: read in order they
+    give the body of `/artists/export/` or `/artists/songs/export/` without header and trailer.
+    """
+    database = str(settings.DATABASES[using]['NAME'])
+    workers = workers or os.cpu_count() or 1
+    ranges = id_ranges(table, shards or workers * 4, using)
+    extension = EXPORT_FORMATS[export_format].extension + ('.gz' if compress else '')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # forked workers must not share the parent's connections
+    connections.close_all()
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                export_shard, database, table, export_format, compress, first, last,
+                output_dir / f'{table}-{number:05d}.{extension}', batch_size or get_export_batch_size())
+            for number, (first, last) in enumerate(ranges, 1)
+        ]
+        entries = [future.result() for future in futures]
+
+    manifest = {
+        'table': table, 'format': export_format, 'gzip': compress, 'extension': extension,
+        'fields': SHARD_TABLES[table][0],
+        'rows': sum(entry['rows'] for entry in entries), 'workers': workers,
+        'seconds': round(time.perf_counter() - started, 3), 'shards': entries,
+    }
+    with open(output_dir / 'manifest.json', 'w') as output:
+        json.dump(manifest, output, indent=2)
+    return manifest
+
+
+def concatenate_shards(manifest, output_dir, path):
+    """
+    Joins the shards of `manifest` into `path` behind one header. Gzip members concatenate
+    into a valid gzip file, so compressed shards are copied as they are.
+    """
+    output_dir = Path(output_dir)
+    header = EXPORT_FORMATS[manifest['format']](manifest['fields']).header().encode('utf-8')
+    with open(path, 'wb') as output:
+        if header:
+            output.write(zlib.compress(header, wbits=31) if manifest['gzip'] else header)
+        for entry in manifest['shards']:
+            with open(output_dir / entry['file'], 'rb') as shard:
+                while chunk := shard.read(1024 * 1024):
+                    output.write(chunk)
@@ -0,0 +1,109 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .auth import revoke_snapshot
+from .counters import (
+    USER_COUNTER,
+    ARTIST_COUNTER,
+    MUSIC_COUNTER,
+    artist_music_counter,
+    adjust_count,
+    drop_count
+    )
+from .models import User, Artist, Music
+from .naturalkeys import artist_natural_key
+from .pagecache import ARTIST_VERSION, bump_versions, music_version
+from .stats import forget_artist, record_artists, record_songs
+
+
+# The views write with raw SQL and keep the counters and rollups themselves,
+# these receivers cover the ORM paths (admin site, createsuperuser, shell).
+# Every artist/song write also moves the page cache versions forward.
+@receiver(post_save, sender=User)
+def count_user_created(sender, instance, created, **kwargs):
+    if created:
+        with connection.cursor() as cursor:
+            adjust_count(cursor, USER_COUNTER, 1)
+    else:
+        # role, email or password may have changed
+        revoke_snapshot(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def count_user_deleted(sender, instance, **kwargs):
+    with connection.cursor() as cursor:
+        adjust_count(cursor, USER_COUNTER, -1)
+    revoke_snapshot(instance.pk)
+
+
+@receiver(pre_save, sender=Artist)
+def remember_artist(sender, instance, **kwargs):
+    # the raw SQL paths set the key themselves, the admin site and shell save through here
+    instance.natural_key = artist_natural_key(instance)
+    # the stored values tell post_save which rollups the artist leaves
+    instance._stored_stats = None
+    if instance.pk:
+        instance._stored_stats = Artist.objects.filter(pk=instance.pk).values_list(
+            'gender', 'first_release_year').first()
+
+
+@receiver(post_save, sender=Artist)
+def count_artist_saved(sender, instance, created, **kwargs):
+    current = (instance.gender, instance.first_release_year)
+    stored = getattr(instance, '_stored_stats', None)
+    with connection.cursor() as cursor:
+        if created:
+            adjust_count(cursor, ARTIST_COUNTER, 1)
+            record_artists(cursor, [current])
+        elif stored and stored != current:
+            record_artists(cursor, [stored], sign=-1)
+            record_artists(cursor, [current])
+        bump_versions(cursor, [ARTIST_VERSION])
+
+
+@receiver(post_delete, sender=Artist)
+def count_artist_deleted(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        # a tombstone left the counters and rollups when it was written
+        return
+    with connection.cursor() as cursor:
+        adjust_count(cursor, ARTIST_COUNTER, -1)
+        drop_count(cursor, artist_music_counter(instance.pk))
+        record_artists(cursor, [(instance.gender, instance.first_release_year)], sign=-1)
+        forget_artist(cursor, instance.pk)
+        bump_versions(cursor, [ARTIST_VERSION, music_version(instance.pk)])
+
+
+@receiver(pre_save, sender=Music)
+def remember_music(sender, instance, **kwargs):
+    instance._stored_stats = None
+    if instance.pk:
+        instance._stored_stats = Music.objects.filter(pk=instance.pk).values_list(
+            'artist_relation_id', 'genre').first()
+
+
+@receiver(post_save, sender=Music)
+def count_music_saved(sender, instance, created, **kwargs):
+    current = (instance.artist_relation_id, instance.genre)
+    stored = getattr(instance, '_stored_stats', None)
+    with connection.cursor() as cursor:
+        if created:
+            adjust_count(cursor, MUSIC_COUNTER, 1)
+            adjust_count(cursor, artist_music_counter(instance.artist_relation_id), 1)
+            record_songs(cursor, [current])
+        elif stored and stored != current:
+            adjust_count(cursor, artist_music_counter(stored[0]), -1)
+            adjust_count(cursor, artist_music_counter(current[0]), 1)
+            record_songs(cursor, [stored], sign=-1)
+            record_songs(cursor, [current])
+        bump_versions(cursor, [music_version(current[0])] + ([music_version(stored[0])] if stored else []))
+
+
+@receiver(post_delete, sender=Music)
+def count_music_deleted(sender, instance, **kwargs):
+    with connection.cursor() as cursor:
+        adjust_count(cursor, MUSIC_COUNTER, -1)
+        adjust_count(cursor, artist_music_counter(instance.artist_relation_id), -1)
+        record_songs(cursor, [(instance.artist_relation_id, instance.genre)], sign=-1)
+        bump_versions(cursor, [music_version(instance.artist_relation_id)])
@@ -0,0 +1,45 @@
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# busy_timeout first, so switching the journal mode waits for a lock held elsewhere
+DEFAULT_SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+valid_pragma = re.compile(r'^[a-z_]+$').match
+valid_value = re.compile(r'^(-?\d+|[A-Za-z]+)$').match
+
+
+def get_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+
+def pragma_statements(pragmas):
+    """
+    PRAGMA statements for a profile, names and values are checked since they cannot be
+    passed as query parameters.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if not valid_pragma(name) or not valid_value(str(value)):
+            raise ValueError(f'Invalid SQLite pragma {name}={value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    # Applied once per connection, CONN_MAX_AGE keeps connections (and their pragmas) across requests
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(get_pragmas()):
+            cursor.execute(statement)
@@ -0,0 +1,145 @@
+from collections import Counter
+
+from .counters import LIVE_SONGS_SQL
+
+GENRE_STAT = 'genre'
+GENDER_STAT = 'artist_gender'
+DECADE_STAT = 'artist_decade'
+ARTIST_SONGS_STAT = 'artist_songs'
+
+TOP_ARTISTS = 10
+
+# Every dashboard figure in one round trip: totals from the row counters, the
+# small rollups, then the top artists through the (dimension, value) index.
+DASHBOARD_SQL = (
+    "SELECT 'total', name, value, NULL FROM core_rowcounter WHERE name IN ('user', 'core_artist', 'core_music') "
+    "UNION ALL "
+    "SELECT dimension, key, value, NULL FROM core_catalogstat WHERE dimension IN (%s, %s, %s) "
+    "UNION ALL "
+    "SELECT * FROM ("
+    "SELECT core_catalogstat.dimension, core_catalogstat.key, core_catalogstat.value, core_artist.name "
+    "FROM core_catalogstat INNER JOIN core_artist ON core_artist.id = CAST(core_catalogstat.key AS INTEGER) "
+    "WHERE core_catalogstat.dimension = %s AND core_catalogstat.value > 0 "
+    "ORDER BY core_catalogstat.value DESC LIMIT %s)"
+)
+
+
+def release_decade(first_release_year):
+    # first_release_year is a date, or its text when it comes straight from a CSV
+    year = str(first_release_year or '')[:4]
+    return f'{int(year) // 10 * 10}s' if year.isdigit() else 'unknown'
+
+
+def adjust_stats(cursor, dimension, deltas):
+    """
+    Applies {key: delta} to one dimension, creating missing rows.
+    """
+    params = [(dimension, str(key), delta) for key, delta in deltas.items() if delta]
+    if not params:
+        return
+    cursor.executemany(
+        "INSERT INTO core_catalogstat (dimension, key, value) VALUES (%s, %s, %s) "
+        "ON CONFLICT (dimension, key) DO UPDATE SET value = value + excluded.value",
+        params
+    )
+
+
+def record_artists(cursor, artists, sign=1):
+    """
+    Accounts for artists given as (gender, first_release_year), `sign=-1` when they are removed.
+    """
+    genders, decades = Counter(), Counter()
+    for gender, first_release_year in artists:
+        genders[gender] += sign
+        decades[release_decade(first_release_year)] += sign
+    adjust_stats(cursor, GENDER_STAT, genders)
+    adjust_stats(cursor, DECADE_STAT, decades)
+
+
+def record_songs(cursor, songs, sign=1):
+    """
+    Accounts for songs given as (artist_id, genre), `sign=-1` when they are removed.
+    """
+    genres, artists = Counter(), Counter()
+    for artist_id, genre in songs:
+        genres[genre] += sign
+        artists[artist_id] += sign
+    adjust_stats(cursor, GENRE_STAT, genres)
+    adjust_stats(cursor, ARTIST_SONGS_STAT, artists)
+
+
+def forget_artist(cursor, artist_id):
+    cursor.execute(
+        "DELETE FROM core_catalogstat WHERE dimension = %s AND key = %s",
+        [ARTIST_SONGS_STAT, str(artist_id)]
+    )
+
+
+def forget_artists(cursor, artist_ids):
+    if artist_ids:
+        cursor.execute(
+            f"DELETE FROM core_catalogstat WHERE dimension = %s AND key IN ({', '.join(['%s'] * len(artist_ids))})",
+            [ARTIST_SONGS_STAT] + [str(artist_id) for artist_id in artist_ids]
+        )
+
+
+def compute_stats(cursor):
+    """
+    Recomputes every rollup with GROUP BYs, returns {(dimension, key): value}.
+    """
+    stats = {}
+    cursor.execute(f"SELECT genre, COUNT(*) FROM core_music WHERE {LIVE_SONGS_SQL} GROUP BY genre")
+    for genre, total in cursor.fetchall():
+        stats[(GENRE_STAT, genre)] = total
+    cursor.execute(
+        f"SELECT artist_relation_id, COUNT(*) FROM core_music WHERE {LIVE_SONGS_SQL} GROUP BY artist_relation_id")
+    for artist_id, total in cursor.fetchall():
+        stats[(ARTIST_SONGS_STAT, str(artist_id))] = total
+    cursor.execute("SELECT gender, first_release_year FROM core_artist WHERE deleted_at IS NULL")
+    artists = Counter()
+    for gender, first_release_year in cursor:
+        artists[(GENDER_STAT, gender)] += 1
+        artists[(DECADE_STAT, release_decade(first_release_year))] += 1
+    stats.update(artists)
+    return stats
+
+
+def check_stats(cursor):
+    """
+    Returns [(dimension, key, stored, actual)] for every rollup that drifted.
+    """
+    actual = compute_stats(cursor)
+    cursor.execute("SELECT dimension, key, value FROM core_catalogstat")
+    stored = {(dimension, key): value for dimension, key, value in cursor.fetchall()}
+    return [
+        (dimension, key, stored.get((dimension, key), 0), actual.get((dimension, key), 0))
+        for dimension, key in sorted(set(actual) | set(stored))
+        if stored.get((dimension, key), 0) != actual.get((dimension, key), 0)
+    ]
+
+
+def rebuild_stats(cursor):
+    """
+    Replaces every rollup with a fresh computation. Run it inside a transaction.
+    """
+    stats = compute_stats(cursor)
+    cursor.execute("DELETE FROM core_catalogstat")
+    cursor.executemany(
+        "INSERT INTO core_catalogstat (dimension, key, value) VALUES (%s, %s, %s)",
+        [(dimension, key, value) for (dimension, key), value in stats.items()]
+    )
+    return stats
+
+
+def load_dashboard(cursor):
+    """
+    Reads every dashboard figure with a single query.
+    """
+    cursor.execute(DASHBOARD_SQL, [GENRE_STAT, GENDER_STAT, DECADE_STAT, ARTIST_SONGS_STAT, TOP_ARTISTS])
+    dashboard = {'total': {}, GENRE_STAT: {}, GENDER_STAT: {}, DECADE_STAT: {}, 'top_artists': []}
+    for dimension, key, value, artist_name in cursor.fetchall():
+        if dimension == ARTIST_SONGS_STAT:
+            dashboard['top_artists'].append({'id': int(key), 'name': artist_name, 'songs': value})
+        elif value:
+            dashboard[dimension][key] = value
+    return dashboard
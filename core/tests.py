@@ -1,3 +1,755 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import HASH_SESSION_KEY
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .auth import get_user, revoke_snapshot, revoked_key
+from .counters import ARTIST_COUNTER, MUSIC_COUNTER, artist_music_counter, check_counts, get_count, stored_counts
+from .delta import make_sync_token
+from .imports import ARTIST_COLUMNS, import_artists, import_music, upsert_artists
+from .jobs import fail_abandoned_jobs
+from .models import Artist, ImportJob, Music, MusicDeletion, User
+from .naturalkeys import make_artist_key
+from .pagecache import PAGE_CACHE
+from .pagination import decode_cursor, encode_cursor, fetch_keyset_page
+from .purge import purge_tombstones
+from .replica import (
+    REPLICA_ALIAS,
+    STICKY_COOKIE,
+    current_read_alias,
+    marker_path,
+    read_alias,
+    replica_state,
+    replica_until,
+    sync_replica
+    )
+from .stats import check_stats, load_dashboard
+from .validation import (
+    ERROR_REPORT_PATH,
+    CsvHeaderError,
+    map_header,
+    validate_batch
+    )
+
+
+def csv_upload(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+class HeaderMappingTests(SimpleTestCase):
+    def test_columns_are_found_by_name_in_any_order(self):
+        header = ['Number of Albums Released', 'Gender', 'Name', 'First Release Year', 'Date of Birth', 'Extra']
+        self.assertEqual(map_header(header, ARTIST_COLUMNS), [2, 4, 1, None, 3, 0])
+
+    def test_aliases_and_spelling_of_field_names(self):
+        header = [' NAME ', 'dob', 'gender', 'address', 'first_release_year', 'albums']
+        self.assertEqual(map_header(header, ARTIST_COLUMNS), [0, 1, 2, 3, 4, 5])
+
+    def test_missing_required_column_is_an_error(self):
+        with self.assertRaisesMessage(CsvHeaderError, 'Missing column(s): first_release_year, no_of_albums_released'):
+            map_header(['name', 'gender', 'dob'], ARTIST_COLUMNS)
+
+
+class ValidateBatchTests(SimpleTestCase):
+    header = ['name', 'dob', 'gender', 'address', 'first_release_year', 'albums']
+
+    def validate(self, *rows):
+        positions = map_header(self.header, ARTIST_COLUMNS)
+        return validate_batch(list(enumerate(rows, 2)), ARTIST_COLUMNS, positions)
+
+    def test_valid_rows_are_cleaned(self):
+        valid, invalid = self.validate(['Alpha', '', 'Female', '', '2001-01-01', '3'])
+        self.assertEqual(invalid, [])
+        self.assertEqual(valid, [('Alpha', None, 'f', None, date(2001, 1, 1), 3)])
+        self.assertEqual(valid[0].line, 2)
+
+    def test_each_column_reports_its_own_error(self):
+        valid, invalid = self.validate(
+            ['', '1990-02-30', 'q', '', '2001-01-01', '-1'],
+            ['Beta', '', 'm', '', 'soon', 'many'],
+            ['Gamma', '', 'o', '', '2001-01-01', '2'],
+        )
+        self.assertEqual([row.line for row in valid], [4])
+        self.assertEqual([(line, message) for line, _, message in invalid], [
+            (2, "name is required; dob '1990-02-30' is not a date (YYYY-MM-DD); gender 'q' is not one of m, f, o; "
+                "no_of_albums_released -1 is not between 0 and 2147483647"),
+            (3, "first_release_year 'soon' is not a date (YYYY-MM-DD); no_of_albums_released 'many' is not a whole number"),
+        ])
+
+
+class CursorTests(SimpleTestCase):
+    def test_cursor_round_trip_is_stable(self):
+        token = encode_cursor(42, date(2001, 1, 1))
+        self.assertEqual(token, encode_cursor(42, date(2001, 1, 1)))
+        self.assertEqual(decode_cursor(token), {'id': 42, 'key': '2001-01-01', 'dir': 'next'})
+
+    def test_tampered_cursor_is_ignored(self):
+        token = encode_cursor(42, 42)
+        self.assertIsNone(decode_cursor(token[:-1] + ('A' if token[-1] != 'A' else 'B')))
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+
+
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        # release years tie in pairs, the id breaks the tie
+        self.ids = [Artist.objects.create(
+            name=f'Artist {index}', gender='m', first_release_year=date(2000 + index // 2, 1, 1),
+            no_of_albums_released=1).pk for index in range(5)]
+
+    def page(self, token=None, order_by='id'):
+        with connection.cursor() as cursor:
+            rows, next_cursor, prev_cursor = fetch_keyset_page(
+                cursor, ['id', 'first_release_year'], 'core_artist', 2, token, order_by=order_by)
+        return [row[0] for row in rows], next_cursor, prev_cursor
+
+    def test_next_and_prev_walk_the_pages(self):
+        rows, next_cursor, prev_cursor = self.page()
+        self.assertEqual((rows, prev_cursor), (self.ids[:2], None))
+        rows, next_cursor, prev_cursor = self.page(next_cursor)
+        self.assertEqual(rows, self.ids[2:4])
+        rows, last_cursor, _ = self.page(next_cursor)
+        self.assertEqual((rows, last_cursor), (self.ids[4:], None))
+
+        rows, _, first_prev = self.page(prev_cursor)
+        self.assertEqual((rows, first_prev), (self.ids[:2], None))
+
+    def test_seek_by_another_key_keeps_ties_in_id_order(self):
+        Artist.objects.filter(pk=self.ids[0]).update(first_release_year=date(2010, 1, 1))
+        order = self.ids[1:] + self.ids[:1]
+        seen, token = [], None
+        while True:
+            rows, token, prev_cursor = self.page(token, 'first_release_year')
+            seen.extend(rows)
+            if token is None:
+                break
+        self.assertEqual(seen, order)
+
+        # and back from the last page
+        self.assertEqual(self.page(prev_cursor, 'first_release_year')[0], order[2:4])
+
+
+class ImportTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def read_report(self, token):
+        with default_storage.open(ERROR_REPORT_PATH.format(token=token), 'r') as report:
+            return list(csv.reader(report))
+
+
+class ArtistImportTests(ImportTestCase):
+    def test_error_report_numbers_rows_by_their_first_line(self):
+        result = import_artists(csv_upload(
+            'name,gender,first_release_year,albums\n'
+            'Alpha,m,2001-01-01,1\n'
+            '\n'
+            '"Multi\nline",x,2001-01-01,1\n'
+            'Omega,f,2001-01-01,-5\n'
+        ), batch_size=2)
+        self.assertEqual((result.imported, result.rejected), (1, 2))
+        report = self.read_report(result.error_report)
+        self.assertEqual(report[0], ['Line', 'Error', 'name', 'gender', 'first_release_year', 'albums'])
+        self.assertEqual([(row[0], row[2]) for row in report[1:]], [('4', 'Multi\nline'), ('6', 'Omega')])
+
+    def test_rows_refused_by_the_database_are_reported_in_line_order(self):
+        import_artists(csv_upload('name,dob,gender,first_release_year,albums\nTaken,1990-01-01,m,2001-01-01,1\n'))
+        result = import_artists(csv_upload(
+            'name,dob,gender,first_release_year,albums\n'
+            'Taken,1990-01-01,m,2001-01-01,1\n'
+            'Fresh,1990-01-01,m,2001-01-01,1\n'
+            'Broken,1990-01-01,m,2001-01-01,x\n'
+        ), batch_size=2)
+        self.assertEqual((result.imported, result.rejected), (1, 2))
+        self.assertEqual([row[0] for row in self.read_report(result.error_report)[1:]], ['2', '4'])
+
+    def test_no_report_when_every_row_is_imported(self):
+        result = import_artists(csv_upload('name,gender,first_release_year,albums\nAlpha,m,2001-01-01,1\n'))
+        self.assertIsNone(result.error_report)
+
+    def test_upsert_counts_across_two_runs_of_the_same_file(self):
+        text = (
+            'name,dob,gender,address,first_release_year,albums\n'
+            'Alpha,1990-01-01,m,Kathmandu,2001-01-01,1\n'
+            'Beta,1991-01-01,f,,2002-01-01,2\n'
+            ' alpha ,1990-01-01,m,Pokhara,2001-01-01,3\n'
+        )
+        first = upsert_artists(csv_upload(text))
+        self.assertEqual((first.imported, first.updated, first.skipped, first.rejected), (2, 0, 1, 0))
+
+        again = upsert_artists(csv_upload(text))
+        self.assertEqual((again.imported, again.updated, again.skipped, again.rejected), (0, 0, 3, 0))
+
+        changed = upsert_artists(csv_upload(text.replace('Kathmandu', 'Lalitpur')))
+        self.assertEqual((changed.imported, changed.updated, changed.skipped), (0, 1, 2))
+        self.assertEqual(Artist.objects.count(), 2)
+        self.assertEqual(Artist.objects.get(name='Alpha').address, 'Lalitpur')
+
+
+class CatalogTestCase(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        # versions start over with every test, pages cached by another one would match them
+        PAGE_CACHE.clear()
+        self.addCleanup(PAGE_CACHE.clear)
+        self.admin = User.objects.create_superuser(
+            'admin@example.com', 'pw', first_name='A', gender='m', role_type='super_admin')
+        self.client.force_login(self.admin)
+
+    def fill_catalog(self):
+        """
+        Writes through every path that adds or removes rows: the ORM, the views and the imports.
+        """
+        alpha = Artist.objects.create(
+            name='Alpha', gender='m', first_release_year=date(1995, 1, 1), no_of_albums_released=1)
+        for title in ['One', 'Two', 'Three']:
+            self.client.post(
+                f'/artists/songs/create/{alpha.pk}/', {'title': title, 'album_name': 'First', 'genre': 'rock'})
+        import_artists(csv_upload(
+            'name,gender,first_release_year,albums\nBeta,f,2001-01-01,1\nGamma,o,2012-01-01,2\n'))
+        import_music(csv_upload('artist,title,album,genre\nBeta,Four,Second,jazz\nGamma,Five,Third,jazz\n'))
+
+        song = Music.objects.get(title='One')
+        self.client.post(f'/artists/songs/delete/{alpha.pk}/{song.pk}/')
+        gamma = Artist.objects.get(name='Gamma')
+        self.client.post(f'/artists/delete/{gamma.pk}/')
+        return alpha, Artist.objects.get(name='Beta'), gamma
+
+
+class CounterTests(CatalogTestCase):
+    def test_counters_follow_every_write_path(self):
+        alpha, beta, gamma = self.fill_catalog()
+        with connection.cursor() as cursor:
+            self.assertEqual(check_counts(cursor), [])
+            self.assertEqual(get_count(cursor, ARTIST_COUNTER), 2)
+            self.assertEqual(get_count(cursor, MUSIC_COUNTER), 3)
+            self.assertEqual(
+                [get_count(cursor, artist_music_counter(artist.pk)) for artist in (alpha, beta, gamma)], [2, 1, 0])
+
+    def test_list_pages_show_the_counted_total(self):
+        self.fill_catalog()
+        # the tombstoned artist is left out
+        response = self.client.get('/artists/?page=1&limit=1')
+        self.assertEqual(response.context['total_pages'], 2)
+
+
+class CatalogStatTests(CatalogTestCase):
+    def test_rollups_follow_every_write_path(self):
+        alpha, beta, _ = self.fill_catalog()
+        with connection.cursor() as cursor:
+            self.assertEqual(check_stats(cursor), [])
+            dashboard = load_dashboard(cursor)
+        self.assertEqual(dashboard['genre'], {'rock': 2, 'jazz': 1})
+        self.assertEqual(dashboard['artist_gender'], {'m': 1, 'f': 1})
+        self.assertEqual(dashboard['artist_decade'], {'1990s': 1, '2000s': 1})
+        self.assertEqual(dashboard['top_artists'], [
+            {'id': alpha.pk, 'name': 'Alpha', 'songs': 2},
+            {'id': beta.pk, 'name': 'Beta', 'songs': 1},
+        ])
+
+    def test_dashboard_reads_everything_in_one_query(self):
+        self.fill_catalog()
+        self.client.get('/dashboard/')
+        # the session row, then every figure at once, the user comes from the snapshot
+        with self.assertNumQueries(2):
+            response = self.client.get('/dashboard/')
+        self.assertEqual((response.context['total_artists'], response.context['total_songs']), (2, 3))
+
+
+class PageCacheTests(CatalogTestCase):
+    def test_artist_page_is_cached_until_an_artist_changes(self):
+        alpha, _, _ = self.fill_catalog()
+        self.assertContains(self.client.get('/artists/'), 'Alpha')
+        hits = PAGE_CACHE.stats()['hits']
+        # the session row and the version, no artist query
+        with self.assertNumQueries(2):
+            self.client.get('/artists/')
+        self.assertEqual(PAGE_CACHE.stats()['hits'], hits + 1)
+
+        self.client.post(f'/artists/update/{alpha.pk}/', {
+            'name': 'Renamed', 'gender': 'm', 'first_release_year': '1995-01-01', 'no_of_albums_released': 1})
+        response = self.client.get('/artists/')
+        self.assertContains(response, 'Renamed')
+        self.assertNotContains(response, 'Alpha')
+
+    def test_song_write_only_drops_the_pages_of_its_artist(self):
+        alpha, beta, _ = self.fill_catalog()
+        self.client.get(f'/artists/songs/{alpha.pk}/?limit=10')
+        self.client.get(f'/artists/songs/{beta.pk}/?limit=10')
+        hits = PAGE_CACHE.stats()['hits']
+
+        self.client.post(
+            f'/artists/songs/create/{alpha.pk}/', {'title': 'Encore', 'album_name': 'Live', 'genre': 'jazz'})
+        self.assertContains(self.client.get(f'/artists/songs/{alpha.pk}/?limit=10'), 'Encore')
+        self.assertEqual(PAGE_CACHE.stats()['hits'], hits)
+        self.client.get(f'/artists/songs/{beta.pk}/?limit=10')
+        self.assertEqual(PAGE_CACHE.stats()['hits'], hits + 1)
+
+
+class ApiTests(CatalogTestCase):
+    def test_sparse_fields_and_bad_parameters(self):
+        alpha, beta, _ = self.fill_catalog()
+        response = self.client.get('/api/artists?fields=name,gender')
+        self.assertEqual(response.json()['results'], [
+            {'id': alpha.pk, 'name': 'Alpha', 'gender': 'm'},
+            {'id': beta.pk, 'name': 'Beta', 'gender': 'f'},
+        ])
+        self.assertEqual(self.client.get('/api/artists?fields=name,password').status_code, 400)
+        self.assertEqual(self.client.get('/api/artists?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/artists?limit=x').status_code, 400)
+
+    def test_etag_revalidates_until_a_write(self):
+        alpha, _, gamma = self.fill_catalog()
+        response = self.client.get('/api/artists')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/artists', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(f'/artists/update/{alpha.pk}/', {
+            'name': 'Renamed', 'gender': 'm', 'first_release_year': '1995-01-01', 'no_of_albums_released': 1})
+        response = self.client.get('/api/artists?fields=name', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['name'], 'Renamed')
+
+        # songs of a tombstoned artist are gone
+        self.assertEqual(self.client.get(f'/api/artists/{gamma.pk}/songs').status_code, 404)
+
+    @override_settings(API_GZIP_MIN_SIZE=0)
+    def test_gzipped_body_has_its_own_etag(self):
+        alpha, _, _ = self.fill_catalog()
+        url = f'/api/artists/{alpha.pk}/songs?fields=title'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].endswith('-gzip"'))
+        self.assertEqual(
+            [song['title'] for song in json.loads(gzip.decompress(response.content))['results']], ['Two', 'Three'])
+
+        revalidated = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((revalidated.status_code, revalidated['ETag']), (304, response['ETag']))
+
+
+class ReplicaMixin:
+    def use_replica_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'replica.sqlite3')
+        patcher = mock.patch('core.replica.replica_path', return_value=self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ReplicaSyncTests(ReplicaMixin, TransactionTestCase):
+    # the backup waits for the open transaction of a TestCase to end
+    def test_sync_copies_the_primary_and_marks_its_time(self):
+        self.use_replica_file()
+        Artist.objects.create(name='Alpha', gender='m', first_release_year=date(1995, 1, 1), no_of_albums_released=1)
+        sync_replica()
+        with sqlite3.connect(self.path) as replica:
+            self.assertEqual(replica.execute("SELECT name FROM core_artist").fetchall(), [('Alpha',)])
+        synced_at, _ = replica_state()
+        self.assertAlmostEqual(synced_at, time.time(), delta=5)
+        self.assertEqual(read_alias(RequestFactory().get('/')), REPLICA_ALIAS)
+
+
+class ReplicaTests(ReplicaMixin, CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_replica_file()
+
+    def mark_synced(self, seconds_ago, until='2026-01-01 00:00:00.000'):
+        with open(marker_path(self.path), 'w') as marker:
+            json.dump({'synced_at': time.time() - seconds_ago, 'until': until}, marker)
+
+    def alias(self, **cookies):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        return read_alias(request)
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=30)
+    def test_reads_fall_back_to_the_primary(self):
+        # never synced, stalled, then fresh
+        self.assertEqual(self.alias(), DEFAULT_DB_ALIAS)
+        self.mark_synced(60)
+        self.assertEqual(self.alias(), DEFAULT_DB_ALIAS)
+        self.mark_synced(1)
+        self.assertEqual(self.alias(), REPLICA_ALIAS)
+        # a client that just wrote reads its own writes
+        self.assertEqual(self.alias(**{STICKY_COOKIE: str(time.time() + 10)}), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.alias(**{STICKY_COOKIE: str(time.time() - 10)}), REPLICA_ALIAS)
+
+    def test_delta_stops_where_the_replica_does(self):
+        self.mark_synced(1, until='2026-01-01 00:00:00.000')
+        self.assertIsNone(replica_until())
+        token = current_read_alias.set(REPLICA_ALIAS)
+        try:
+            self.assertEqual(replica_until(), '2026-01-01 00:00:00.000')
+        finally:
+            current_read_alias.reset(token)
+
+    def test_writes_make_the_client_sticky(self):
+        alpha, _, _ = self.fill_catalog()
+        self.assertNotIn(STICKY_COOKIE, self.client.get('/artists/').cookies)
+        response = self.client.post(
+            f'/artists/songs/create/{alpha.pk}/', {'title': 'Encore', 'album_name': 'Live', 'genre': 'jazz'})
+        self.assertGreater(float(response.cookies[STICKY_COOKIE].value), time.time())
+
+
+class BulkActionTests(CatalogTestCase):
+    def bulk(self, url, **data):
+        return self.client.post(url, data, HTTP_ACCEPT='application/json').json()
+
+    def assert_exact(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(check_counts(cursor), [])
+            self.assertEqual(check_stats(cursor), [])
+
+    def test_song_actions_keep_counters_and_rollups_exact(self):
+        alpha, beta, _ = self.fill_catalog()
+        two, three = Music.objects.filter(artist_relation=alpha).order_by('id')
+        four = Music.objects.get(title='Four')
+        url = f'/artists/songs/bulk/{alpha.pk}/'
+
+        # songs of another artist are not touched
+        result = self.bulk(url, action='set_genre', genre='classic', ids=[two.pk, three.pk, four.pk])
+        self.assertEqual((result['selected'], result['songs']), (3, 2))
+        self.assertEqual(Music.objects.get(pk=four.pk).genre, 'jazz')
+        self.assert_exact()
+
+        result = self.bulk(url, action='move', target_artist=beta.pk, ids=[two.pk])
+        self.assertEqual(result['songs'], 1)
+        self.assertEqual(Music.objects.get(pk=two.pk).artist_relation_id, beta.pk)
+        self.assert_exact()
+
+        result = self.bulk(url, action='delete', ids=[three.pk])
+        self.assertEqual(result['songs'], 1)
+        self.assertFalse(Music.objects.filter(artist_relation=alpha).exists())
+        self.assert_exact()
+
+    def test_bad_selections_are_refused(self):
+        alpha, _, _ = self.fill_catalog()
+        url = f'/artists/songs/bulk/{alpha.pk}/'
+        self.assertIn('genre', self.bulk(url, action='set_genre', ids=[1])['errors'])
+        self.assertIn('target_artist', self.bulk(url, action='move', target_artist=alpha.pk, ids=[1])['errors'])
+        self.assertIn('ids', self.bulk(url, action='delete')['errors'])
+
+    def test_artist_delete_takes_the_songs_along(self):
+        alpha, beta, _ = self.fill_catalog()
+        result = self.bulk('/artists/bulk/', action='delete', ids=[alpha.pk, beta.pk])
+        self.assertEqual((result['artists'], result['songs']), (2, 3))
+        self.assert_exact()
+        with connection.cursor() as cursor:
+            self.assertEqual((get_count(cursor, ARTIST_COUNTER), get_count(cursor, MUSIC_COUNTER)), (0, 0))
+
+
+class SoftDeleteTests(CatalogTestCase):
+    def test_deleted_artist_is_a_hidden_tombstone(self):
+        _, _, gamma = self.fill_catalog()
+        gamma.refresh_from_db()
+        self.assertIsNotNone(gamma.deleted_at)
+        self.assertIsNone(gamma.natural_key)
+        self.assertEqual(Music.objects.filter(artist_relation=gamma).count(), 1)
+        self.assertNotContains(self.client.get('/artists/?limit=10'), 'Gamma')
+        self.assertEqual([artist['name'] for artist in self.client.get('/api/artists').json()['results']], [
+            'Alpha', 'Beta'])
+
+        # the name is free again
+        result = import_artists(csv_upload('name,gender,first_release_year,albums\nGamma,o,2012-01-01,2\n'))
+        self.assertEqual(result.imported, 1)
+
+    @override_settings(DELTA_RETENTION_DAYS=-1)
+    def test_purge_removes_tombstones_chunk_by_chunk(self):
+        # with a negative retention every tombstone is past it
+        alpha, _, gamma = self.fill_catalog()
+        Music.objects.bulk_create([
+            Music(artist_relation=gamma, title=f'Extra {index}', album_name='Third', genre='rock')
+            for index in range(3)
+        ])
+        with connection.cursor() as cursor:
+            counts = stored_counts(cursor)
+        progress = []
+
+        # four songs and the artist, then the deletion recorded for song One
+        self.assertEqual(purge_tombstones(chunk_size=2, rows_per_second=0, progress=progress.append), 6)
+        self.assertEqual(progress, [2, 4, 5, 6])
+        self.assertFalse(MusicDeletion.objects.exists())
+        self.assertFalse(Artist.objects.filter(pk=gamma.pk).exists())
+        self.assertFalse(Music.objects.filter(artist_relation_id=gamma.pk).exists())
+        self.assertTrue(Music.objects.filter(artist_relation=alpha).exists())
+        with connection.cursor() as cursor:
+            # the tombstone already took the rows out of the counters
+            self.assertEqual(stored_counts(cursor), counts)
+            self.assertEqual(check_stats(cursor), [])
+
+
+class DeltaExportTests(CatalogTestCase):
+    def pull(self, url, token=None):
+        response = self.client.get(url, {'token': token} if token else {})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        return rows[1:], response['X-Sync-Token']
+
+    @override_settings(DELTA_OVERLAP_SECONDS=0)
+    def test_token_pulls_only_what_changed_since(self):
+        alpha, beta, gamma = self.fill_catalog()
+        rows, token = self.pull('/artists/export_delta/')
+        self.assertEqual([(row[0], row[1], bool(row[9])) for row in rows], [
+            (str(alpha.pk), 'Alpha', False), (str(beta.pk), 'Beta', False), (str(gamma.pk), 'Gamma', True)])
+
+        rows, token = self.pull('/artists/export_delta/', token)
+        self.assertEqual(rows, [])
+        time.sleep(0.01)
+        self.client.post(f'/artists/update/{beta.pk}/', {
+            'name': 'Beta', 'gender': 'f', 'first_release_year': '2002-01-01', 'no_of_albums_released': 1})
+        self.client.post(f'/artists/delete/{alpha.pk}/')
+        rows, _ = self.pull('/artists/export_delta/', token)
+        self.assertEqual(sorted((row[0], bool(row[9])) for row in rows), [(str(alpha.pk), True), (str(beta.pk), False)])
+
+    @override_settings(DELTA_OVERLAP_SECONDS=0)
+    def test_song_deletions_are_reported(self):
+        alpha, _, _ = self.fill_catalog()
+        _, token = self.pull('/artists/songs/export_delta/')
+        time.sleep(0.01)
+        song = Music.objects.get(title='Two')
+        self.client.post(f'/artists/songs/delete/{alpha.pk}/{song.pk}/')
+        rows, _ = self.pull('/artists/songs/export_delta/', token)
+        self.assertEqual([(row[0], row[1], row[2], bool(row[7])) for row in rows], [
+            (str(song.pk), str(alpha.pk), '', True)])
+
+    def test_bad_and_expired_tokens_are_refused(self):
+        _, song_token = self.pull('/artists/songs/export_delta/')
+        self.assertEqual(self.client.get('/artists/export_delta/', {'token': 'junk'}).status_code, 400)
+        # a token of the song delta is no good for the artists
+        self.assertEqual(self.client.get('/artists/export_delta/', {'token': song_token}).status_code, 400)
+        expired = make_sync_token('core_artist', '2000-01-01 00:00:00.000')
+        self.assertEqual(self.client.get('/artists/export_delta/', {'token': expired}).status_code, 410)
+
+
+class ExportTests(CatalogTestCase):
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        return response, b''.join(response.streaming_content)
+
+    def test_trailer_checks_the_rows_and_resume_continues_after_the_last_id(self):
+        alpha, beta, _ = self.fill_catalog()
+        _, body = self.download('/artists/export/', format='ndjson')
+        *lines, trailer = body.decode('utf-8').splitlines(keepends=True)
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Alpha', 'Beta'])
+        self.assertEqual(json.loads(trailer)['trailer'], {
+            'rows': 2, 'last_id': beta.pk, 'sha256': hashlib.sha256(''.join(lines).encode('utf-8')).hexdigest()})
+
+        # a broken download resumes without a second header, the CSV trailer is a comment line
+        _, body = self.download('/artists/export/', after_id=alpha.pk, trailer=1)
+        rows, trailer = body.decode('utf-8').split('# ')
+        self.assertEqual([row[:2] for row in csv.reader(io.StringIO(rows))], [[str(beta.pk), 'Beta']])
+        self.assertEqual(trailer, f'rows=1 last_id={beta.pk} sha256={hashlib.sha256(rows.encode()).hexdigest()}\r\n')
+
+        self.assertEqual(self.client.get('/artists/export/', {'after_id': -1}).status_code, 400)
+        self.assertEqual(self.client.get('/artists/export/', {'format': 'xml'}).status_code, 400)
+
+    def test_every_export_is_gzipped_on_request(self):
+        self.fill_catalog()
+        for url, filename, header in [
+                ('/artists/export_csv/', 'artists.csv.gz', 'Name,Date of Birth'),
+                ('/artists/songs/export_csv/', 'songs.csv.gz', 'Artist,Title'),
+                ('/artists/songs/export/', 'songs.csv.gz', 'ID,Artist ID'),
+                ('/artists/export_delta/', 'artists-delta.csv.gz', 'ID,Name')]:
+            response, body = self.download(url, gzip=1)
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            self.assertIn(f'filename="{filename}"', response['Content-Disposition'])
+            self.assertTrue(gzip.decompress(body).decode('utf-8').startswith(header))
+
+
+class SearchTests(CatalogTestCase):
+    def test_ranked_matches_by_word_prefix(self):
+        alpha, _, _ = self.fill_catalog()
+        response = self.client.get('/search/', {'q': 'alp'})
+        self.assertEqual(response.context['results'], [{'id': alpha.pk, 'name': 'Alpha', 'address': None}])
+        # the tombstoned artist's songs are left out
+        response = self.client.get('/search/', {'q': 'five', 'type': 'music'})
+        self.assertEqual(response.context['results'], [])
+
+    def test_bad_paging_falls_back_to_the_defaults(self):
+        self.fill_catalog()
+        for params, expected in [
+                ({'page': 'x', 'limit': 'y'}, (1, 20)), ({'page': '-3', 'limit': '0'}, (1, 1)),
+                ({'page': '2', 'limit': '100000'}, (2, 100))]:
+            response = self.client.get('/search/', {'q': 'alpha', **params})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response.context['page'], response.context['limit']), expected)
+
+
+class MusicImportTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = Artist.objects.create(
+            name='Alpha', gender='m', first_release_year=date(2001, 1, 1), no_of_albums_released=1)
+
+    def test_rows_are_validated_and_rejected_with_their_line(self):
+        result = import_music(csv_upload(
+            'Genre,Title,Artist,Album Name\n'
+            'rock,One,Alpha,First\n'
+            'polka,Two,Alpha,First\n'
+            'Jazz,Three,Nobody,First\n'
+            f'rnb,{"x" * 256},Alpha,First\n'
+            'country,Five,Alpha,\n'
+        ))
+        self.assertEqual((result.imported, result.rejected), (1, 4))
+        self.assertEqual(list(Music.objects.values_list('artist_relation', 'title', 'genre')), [
+            (self.artist.pk, 'One', 'rock')])
+        self.assertEqual([row[:2] for row in self.read_report(result.error_report)[1:]], [
+            ['3', "genre 'polka' is not one of rnb, country, classic, rock, jazz"],
+            ['4', "artist 'Nobody' does not exist"],
+            ['5', 'title is longer than 255 characters'],
+            ['6', 'album_name is required'],
+        ])
+
+    def test_missing_column_is_an_error(self):
+        with self.assertRaisesMessage(CsvHeaderError, 'Missing column(s): genre'):
+            import_music(csv_upload('artist,title,album\nAlpha,One,First\n'))
+
+    def test_song_export_imports_back(self):
+        Music.objects.create(artist_relation=self.artist, title='One', album_name='First', genre='jazz')
+        admin = User.objects.create_superuser(
+            'admin@example.com', 'pw', first_name='A', gender='m', role_type='super_admin')
+        self.client.force_login(admin)
+        response = self.client.get('/artists/songs/export/')
+        export = b''.join(response.streaming_content)
+        self.assertTrue(export.startswith(b'ID,Artist ID,Artist,Title,Album Name,Genre\r\n'))
+
+        result = import_music(io.BytesIO(export))
+        self.assertEqual((result.imported, result.rejected), (1, 0))
+        self.assertEqual(Music.objects.filter(title='One', genre='jazz').count(), 2)
+
+
+class ArtistNaturalKeyTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin@example.com', 'pw', first_name='A', gender='m')
+        self.client.force_login(self.admin)
+
+    def admin_form(self, **values):
+        form = {
+            'user': self.admin.pk, 'name': 'Alpha', 'dob': '1990-01-01', 'gender': 'm', 'address': '',
+            'first_release_year': '2001-01-01', 'no_of_albums_released': 1,
+        }
+        form.update(values)
+        return form
+
+    def test_admin_create_keys_the_artist(self):
+        response = self.client.post('/admin/core/artist/add/', self.admin_form(name=' ALPHA '))
+        self.assertEqual(response.status_code, 302)
+        artist = Artist.objects.get()
+        self.assertEqual(artist.natural_key, make_artist_key()(['alpha', '1990-01-01']))
+
+        # the partial unique index now dedupes, and the upsert import matches it
+        other = User.objects.create_user('other@example.com', 'pw', first_name='O', gender='f')
+        response = self.client.post('/admin/core/artist/add/', self.admin_form(user=other.pk, name='alpha'))
+        self.assertContains(response, 'An artist with the same name and dob already exists.')
+        result = upsert_artists(csv_upload(
+            'name,dob,gender,first_release_year,albums\nAlpha,1990-01-01,f,2001-01-01,4\n'))
+        self.assertEqual((result.imported, result.updated), (0, 1))
+        self.assertEqual(Artist.objects.get().gender, 'f')
+
+    def test_admin_edit_moves_the_key(self):
+        self.client.post('/admin/core/artist/add/', self.admin_form())
+        artist = Artist.objects.get()
+        response = self.client.post(
+            f'/admin/core/artist/{artist.pk}/change/', self.admin_form(name='Beta', dob='1991-02-02'))
+        self.assertEqual(response.status_code, 302)
+        artist.refresh_from_db()
+        self.assertEqual(artist.natural_key, make_artist_key()(['Beta', '1991-02-02']))
+
+        # the old name and dob no longer point at the edited artist
+        result = upsert_artists(csv_upload(
+            'name,dob,gender,first_release_year,albums\nAlpha,1990-01-01,m,2001-01-01,1\n'))
+        self.assertEqual((result.imported, result.updated), (1, 0))
+        self.assertEqual(Artist.objects.get(pk=artist.pk).name, 'Beta')
+
+
+class AuthSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            'admin@example.com', 'pw', first_name='A', gender='m', role_type='super_admin')
+        self.addCleanup(cache.delete, revoked_key(self.user.pk))
+        self.client.force_login(self.user)
+        self.session = self.client.session
+        # loaded up front, only the user row is counted below
+        self.session.keys()
+
+    def get_user(self):
+        request = RequestFactory().get('/')
+        request.session = self.session
+        return get_user(request)
+
+    def test_snapshot_replaces_the_user_query(self):
+        with self.assertNumQueries(1):
+            self.get_user()
+        with self.assertNumQueries(0):
+            user = self.get_user()
+        self.assertEqual((user.pk, user.role_type, user.is_superuser), (self.user.pk, 'super_admin', True))
+
+    def test_revocation_reloads_the_row(self):
+        self.get_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(role_type='artist_manager')
+            revoke_snapshot(self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_user().role_type, 'artist_manager')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_user().role_type, 'artist_manager')
+
+    def test_snapshot_of_another_password_is_not_used(self):
+        self.get_user()
+        # the session now carries the hash of a password the snapshot was not taken with
+        self.user.set_password('changed')
+        User.objects.filter(pk=self.user.pk).update(password=self.user.password)
+        self.session[HASH_SESSION_KEY] = self.user.get_session_auth_hash()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_user().pk, self.user.pk)
+
+
+    def test_edits_through_the_views_revoke_the_snapshot(self):
+        manager = User.objects.create_user(
+            'manager@example.com', 'pw', first_name='M', gender='f', role_type='artist_manager')
+        self.addCleanup(cache.delete, revoked_key(manager.pk))
+        manager_client = Client()
+        manager_client.force_login(manager)
+        self.assertEqual(manager_client.get('/artists/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/users/update/{manager.pk}/', {
+                'first_name': 'M', 'email': 'manager@example.com', 'gender': 'f', 'role_type': 'artist'})
+        self.assertRedirects(manager_client.get('/artists/'), '/dashboard/', fetch_redirect_response=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/users/delete/{manager.pk}/')
+        self.assertEqual(manager_client.get('/dashboard/').status_code, 302)
+
+class AbandonedJobTests(TestCase):
+    def test_only_jobs_without_a_recent_heartbeat_are_failed(self):
+        now = timezone.now()
+        live = ImportJob.objects.create(status='running', heartbeat_at=now - timedelta(seconds=5))
+        dead = ImportJob.objects.create(status='running', heartbeat_at=now - timedelta(minutes=10))
+        pending = ImportJob.objects.create(status='pending')
+
+        with override_settings(IMPORT_JOB_TIMEOUT=60):
+            self.assertEqual(fail_abandoned_jobs(), 1)
+        statuses = dict(ImportJob.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[live.pk], statuses[dead.pk], statuses[pending.pk]], ['running', 'failed', 'pending'])
@@ -1,33 +1,59 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = "core"
 
+
+def read_view(sync_view, async_view):
+    # Native async read views when served over ASGI (uvicorn), see ASYNC_READ_VIEWS
+    return async_view if settings.ASYNC_READ_VIEWS else sync_view
+
+
 urlpatterns = [
     path('', views.login_view, name='login'),
     path('login/', views.login_view, name='user_login'),
-    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/', read_view(views.dashboard, views.async_dashboard), name='dashboard'),
     path('logout/', views.logout_user, name='logout'),
     path('register/', views.register_user, name='register'),
+    path('search/', views.search, name='search'),
+    path('metrics/', views.metrics, name='metrics'),
+
+    # JSON API
+    path('api/artists', api.artist_list, name='api_artist_list'),
+    path('api/artists/<int:artist_id>/songs', api.song_list, name='api_song_list'),
 
     # `User`
     path('users/', views.user_list, name='user_list'),
     path('users/create/', views.create_user, name='create_user'),
     path('users/update/<int:user_id>/', views.update_user, name='update_user'),
     path('users/delete/<int:user_id>/', views.delete_user, name='delete_user'),
+    path('users/import_csv/', views.import_user_csv, name='import_user_csv'),
 
     # `Artist`
-    path('artists/', views.artist_list, name='artist_list'),
+    path('artists/', read_view(views.artist_list, views.async_artist_list), name='artist_list'),
     path('artists/create/', views.create_artist, name='create_artist'),
     path('artists/update/<int:artist_id>/', views.update_artist, name='update_artist'),
     path('artists/delete/<int:artist_id>/', views.delete_artist, name='delete_artist'),
+    path('artists/bulk/', views.bulk_artists, name='bulk_artists'),
 
     path('artists/import_csv/', views.import_artist_csv, name='import_artist_csv'),
-    path('artists/export_csv/', views.export_artist_csv, name='export_artist_csv'),
+    path('artists/export_csv/', read_view(views.export_artist_csv, views.async_export_artist_csv), name='export_artist_csv'),
+    path('artists/export/', read_view(views.export_artists, views.async_export_artists), name='export_artists'),
+    path('artists/export_delta/', views.export_artist_delta, name='export_artist_delta'),
+    path('artists/import_jobs/<int:job_id>/', views.import_job, name='import_job'),
+    path('artists/import_jobs/<int:job_id>/progress/', views.import_job_progress, name='import_job_progress'),
+    path('artists/import_errors/<str:token>/', views.import_error_report, name='import_error_report'),
     
     # `Music`
-    path('artists/songs/<int:artist_id>/', views.song_list, name='song_list'),
+    path('artists/songs/<int:artist_id>/', read_view(views.song_list, views.async_song_list), name='song_list'),
     path('artists/songs/create/<int:artist_id>/', views.create_song, name='create_song'),
     path('artists/songs/update/<int:artist_id>/<int:song_id>/', views.update_song, name='update_song'),
     path('artists/songs/delete/<int:artist_id>/<int:song_id>/', views.delete_song, name='delete_song'),
+    path('artists/songs/bulk/<int:artist_id>/', views.bulk_songs, name='bulk_songs'),
+
+    path('artists/songs/import_csv/', views.import_music_csv, name='import_music_csv'),
+    path('artists/songs/export_csv/', views.export_music_csv, name='export_music_csv'),
+    path('artists/songs/export/', views.export_music, name='export_music'),
+    path('artists/songs/export_delta/', views.export_music_delta, name='export_music_delta'),
 ]
\ No newline at end of file
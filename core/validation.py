@@ -0,0 +1,234 @@
+import csv
+import re
+import tempfile
+import uuid
+from collections import namedtuple
+from datetime import date
+
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import validate_email
+
+# Where error reports are stored, named by a random token
+ERROR_REPORT_PATH = 'imports/errors/{token}.csv'
+ERROR_REPORT_TOKEN = re.compile(r'[0-9a-f]{32}')
+
+# A column of an import file: the field it fills, the header names it is found under
+# (compared after normalize_header) and `check(values)`, which validates a whole column
+# of a batch at once and returns (cleaned values, {row index: message})
+Column = namedtuple('Column', ['field', 'headers', 'check', 'required'])
+
+
+class CsvHeaderError(ValueError):
+    """
+    The header row lacks a required column, the file is not imported at all.
+    """
+
+
+class NumberedRow(tuple):
+    """
+    Insert parameters that remember the CSV line and row they came from, for the error report.
+    """
+    def __new__(cls, values, line, source):
+        row = super().__new__(cls, values)
+        row.line = line
+        row.source = source
+        return row
+
+
+def normalize_header(name):
+    return re.sub(r'[^a-z0-9]+', '_', name.strip().lower()).strip('_')
+
+
+def text_check(max_length=None, required=True):
+    def check(values):
+        cleaned, errors = [], {}
+        for index, value in enumerate(values):
+            value = value.strip()
+            if not value:
+                if required:
+                    errors[index] = 'is required'
+                cleaned.append(None)
+            elif max_length and len(value) > max_length:
+                errors[index] = f'is longer than {max_length} characters'
+                cleaned.append(None)
+            else:
+                cleaned.append(value)
+        return cleaned, errors
+    return check
+
+
+def date_check(required=True):
+    def check(values):
+        cleaned, errors = [], {}
+        for index, value in enumerate(values):
+            value = value.strip()
+            if not value:
+                if required:
+                    errors[index] = 'is required'
+                cleaned.append(None)
+                continue
+            try:
+                cleaned.append(date.fromisoformat(value))
+            except ValueError:
+                errors[index] = f'{value!r} is not a date (YYYY-MM-DD)'
+                cleaned.append(None)
+        return cleaned, errors
+    return check
+
+
+def choice_check(choices):
+    # stored values and their labels are both accepted, "Male" becomes "m"
+    lookup = {}
+    for choice, label in choices:
+        lookup[choice.lower()] = lookup[str(label).lower()] = choice
+    allowed = ', '.join(choice for choice, _ in choices)
+
+    def check(values):
+        cleaned, errors = [], {}
+        for index, value in enumerate(values):
+            choice = lookup.get(value.strip().lower())
+            if choice is None:
+                errors[index] = f'{value!r} is not one of {allowed}'
+            cleaned.append(choice)
+        return cleaned, errors
+    return check
+
+
+def email_check():
+    def check(values):
+        cleaned, errors = [], {}
+        for index, value in enumerate(values):
+            value = BaseUserManager.normalize_email(value.strip())
+            try:
+                validate_email(value)
+            except ValidationError:
+                errors[index] = f'{value!r} is not an email address' if value else 'is required'
+                value = None
+            cleaned.append(value)
+        return cleaned, errors
+    return check
+
+
+def integer_check(minimum=None, maximum=None):
+    def check(values):
+        cleaned, errors = [], {}
+        for index, value in enumerate(values):
+            try:
+                number = int(value.strip())
+            except ValueError:
+                errors[index] = f'{value!r} is not a whole number'
+                cleaned.append(None)
+                continue
+            if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+                errors[index] = f'{number} is not between {minimum} and {maximum}'
+            cleaned.append(number)
+        return cleaned, errors
+    return check
+
+
+def map_header(header, columns):
+    """
+    Returns the position of every column in the header row, None for optional columns the
+    file leaves out. Raises CsvHeaderError when a required one is missing.
+    """
+    positions = {}
+    for position, name in enumerate(header):
+        positions.setdefault(normalize_header(name), position)
+
+    mapped, missing = [], []
+    for column in columns:
+        position = next((positions[name] for name in column.headers if name in positions), None)
+        if position is None and column.required:
+            missing.append(column.headers[0])
+        mapped.append(position)
+    if missing:
+        raise CsvHeaderError(f'Missing column(s): {", ".join(missing)}')
+    return mapped
+
+
+def validate_batch(batch, columns, positions):
+    """
+    Validates a batch of (line, row) pairs column by column. Returns the valid rows as
+    NumberedRow of cleaned values, and the invalid ones as (line, row, message).
+    """
+    errors = [[] for _ in batch]
+    cleaned_columns = []
+    for column, position in zip(columns, positions):
+        if position is None:
+            values = [''] * len(batch)
+        else:
+            values = [row[position] if position < len(row) else '' for _, row in batch]
+        cleaned, column_errors = column.check(values)
+        for index, message in column_errors.items():
+            errors[index].append(f'{column.headers[0]} {message}')
+        cleaned_columns.append(cleaned)
+
+    valid, invalid = [], []
+    for index, ((line, row), values) in enumerate(zip(batch, zip(*cleaned_columns))):
+        if errors[index]:
+            invalid.append((line, row, '; '.join(errors[index])))
+        else:
+            valid.append(NumberedRow(values, line, row))
+    return valid, invalid
+
+
+class ErrorReport:
+    """
+    Collects rejected rows with their line number and reason into a CSV, written to a
+    temporary file as they come and stored with `save` once the import is over, in line
+    order: rows refused by the database arrive after the validation errors of later lines.
+    """
+    def __init__(self, header):
+        self.header = header
+        self.count = 0
+        self.last_line = 0
+        self.in_order = True
+        self.file = None
+        self.writer = None
+
+    def add(self, line, row, message):
+        if self.writer is None:
+            self.file = tempfile.TemporaryFile('w+', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['Line', 'Error'] + list(self.header))
+        self.writer.writerow([line, message] + list(row))
+        self.count += 1
+        if line < self.last_line:
+            self.in_order = False
+        self.last_line = max(line, self.last_line)
+
+    def sorted_file(self):
+        # rejections are few next to the rows imported, they are sorted in memory
+        self.file.seek(0)
+        reader = csv.reader(self.file)
+        header = next(reader)
+        rows = sorted(reader, key=lambda row: int(row[0]))
+        self.file.close()
+        self.file = tempfile.TemporaryFile('w+', newline='', encoding='utf-8')
+        writer = csv.writer(self.file)
+        writer.writerow(header)
+        writer.writerows(rows)
+        return self.file
+
+    def save(self):
+        """
+        Stores the report and returns its token, None when no row was rejected.
+        """
+        if self.file is None:
+            return None
+        token = uuid.uuid4().hex
+        if not self.in_order:
+            self.sorted_file()
+        self.file.seek(0)
+        with self.file:
+            default_storage.save(ERROR_REPORT_PATH.format(token=token), File(self.file))
+        return token
+
+
+def error_report_path(token):
+    if not ERROR_REPORT_TOKEN.fullmatch(token):
+        return None
+    return ERROR_REPORT_PATH.format(token=token)
@@ -1,11 +1,24 @@
-import csv
-
+from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.hashers import make_password
-from django.db import connection
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.db import IntegrityError, connection, transaction
+from django.shortcuts import get_object_or_404, render, redirect
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse
+    )
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from asgiref.sync import iscoroutinefunction
 from functools import wraps
 
 from .forms import (
@@ -14,47 +27,101 @@ from .forms import (
     ArtistForm,
     ArtistUpdateForm,
     ArtistImportForm,
-    MusicForm
+    MusicForm,
+    MusicImportForm,
+    UserImportForm,
+    BulkArtistForm,
+    BulkSongForm
+    )
+from .asyncdb import run_db
+from .auth import aget_user
+from .constants import BULK_SONG_ACTION_CHOICES, GENDER_CHOICES, GENRE_CHOICES
+from .counters import USER_COUNTER, ARTIST_COUNTER, MUSIC_COUNTER
+from .delta import (
+    ARTIST_DELTA_HEADERS,
+    MUSIC_DELTA_HEADERS,
+    DELTA_QUERIES,
+    delta_window,
+    make_sync_token,
+    read_sync_token,
+    stream_delta_csv
+    )
+from .exports import (
+    ARTIST_EXPORT_HEADERS,
+    ARTIST_EXPORT_COLUMNS,
+    MUSIC_EXPORT_HEADERS,
+    MUSIC_EXPORT_COLUMNS,
+    ARTIST_EXPORT_FIELDS,
+    ARTIST_EXPORT_ENGINE_SQL,
+    ARTIST_EXPORT_ENGINE_AFTER_SQL,
+    MUSIC_EXPORT_FIELDS,
+    MUSIC_EXPORT_ENGINE_SQL,
+    EXPORT_FORMATS,
+    ExportEncoder,
+    gzip_stream,
+    agzip_stream,
+    stream_export,
+    astream_export
     )
+from .imports import import_artists, import_music, import_users, upsert_artists
+from .metrics import render_metrics
+from .models import ImportJob
+from .naturalkeys import duplicate_artist_message
+from .pagecache import ARTIST_VERSION, PAGE_CACHE, get_version, music_version, page_key
+from .replica import current_read_alias, read_connection, replica_reads, replica_until
+from .repositories import UserRepo, ArtistRepo, MusicRepo
+from .search import ARTIST_SEARCH_SQL, MUSIC_SEARCH_SQL, parse_page, search as run_search
+from .stats import GENRE_STAT, GENDER_STAT, DECADE_STAT, load_dashboard
+from .validation import CsvHeaderError, error_report_path
 
 
 # Create your views here.
 
 
 # Decorator Mixin
-def super_admin_required(view_func):
+def role_required(view_func, roles):
+    # Sends users outside `roles` to the dashboard, async views get an async wrapper
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            user = await aget_user(request)
+            if user.role_type not in roles:
+                return redirect('core:dashboard')
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.role_type != 'super_admin':
+        if request.user.role_type not in roles:
             return redirect('core:dashboard')
         return view_func(request, *args, **kwargs)
     return wrapper
 
 
+def super_admin_required(view_func):
+    return role_required(view_func, ['super_admin'])
+
+
 def super_admin_and_artist_manager_required(view_func):
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        if request.user.role_type not in ['super_admin', 'artist_manager']:
-            return redirect('core:dashboard')
-        return view_func(request, *args, **kwargs)
-    return wrapper
+    return role_required(view_func, ['super_admin', 'artist_manager'])
 
 
 def super_admin_and_artist_manager_and_artist_required(view_func):
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        if request.user.role_type not in ['super_admin', 'artist_manager', 'artist']:
-            return redirect('core:dashboard')
-        return view_func(request, *args, **kwargs)
-    return wrapper
+    return role_required(view_func, ['super_admin', 'artist_manager', 'artist'])
 
 
 def super_admin_and_artist_required(view_func):
+    return role_required(view_func, ['super_admin', 'artist'])
+
+
+def async_login_required(view_func):
+    # login_required for async views, the user is loaded on the DB pool
     @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        if request.user.role_type not in ['super_admin', 'artist']:
-            return redirect('core:dashboard')
-        return view_func(request, *args, **kwargs)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
     return wrapper
 
 
@@ -76,9 +143,47 @@ def login_view(request):
     return render(request, 'user/login.html', {'error_message': error_message})
 
 
+def metrics(request):
+    # Prometheus scrape endpoint [Access: METRICS_ALLOWED_IPS, super_admin]
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed and getattr(request.user, 'role_type', None) != 'super_admin':
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def dashboard_context():
+    # Catalogue statistics, read from the maintained rollups
+    with connection.cursor() as cursor:
+        stats = load_dashboard(cursor)
+
+    genre_labels = dict(GENRE_CHOICES)
+    gender_labels = dict(GENDER_CHOICES)
+    context = {
+        'total_users': stats['total'].get(USER_COUNTER, 0),
+        'total_artists': stats['total'].get(ARTIST_COUNTER, 0),
+        'total_songs': stats['total'].get(MUSIC_COUNTER, 0),
+        'songs_by_genre': [
+            (genre_labels.get(genre, genre), songs) for genre, songs in sorted(stats[GENRE_STAT].items())
+        ],
+        'artists_by_gender': [
+            (gender_labels.get(gender, gender), artists) for gender, artists in sorted(stats[GENDER_STAT].items())
+        ],
+        'artists_by_decade': sorted(stats[DECADE_STAT].items()),
+        'top_artists': stats['top_artists'],
+    }
+
+    return context
+
+
 @login_required
 def dashboard(request):
-    return render(request, 'dashboard.html')
+    return render(request, 'dashboard.html', dashboard_context())
+
+
+@async_login_required
+async def async_dashboard(request):
+    # dashboard for ASGI servers, the statistics are read on the DB pool
+    return render(request, 'dashboard.html', await run_db(dashboard_context))
 
 
 def logout_user(request):
@@ -102,13 +207,10 @@ def register_user(request):
             is_staff = False  # Set the desired value
             is_superuser = False  # Set the desired value
 
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO user (first_name, last_name, email, phone, dob, gender, address, role_type, "
-                    "password, is_staff, is_superuser) "
-                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                    [first_name, last_name, email, phone, dob, gender, address, role_type, password, is_staff, is_superuser]
-                )
+            with transaction.atomic(), connection.cursor() as cursor:
+                UserRepo(cursor).insert(
+                    first_name, last_name, email, phone, dob, gender, address, role_type,
+                    password, is_staff, is_superuser)
 
             return redirect('core:login')
     else:
@@ -121,48 +223,27 @@ def register_user(request):
 @super_admin_required
 def user_list(request):
     # List the user records with pagination [Role Access: super_admin]
-    page = int(request.GET.get('page', 1))
-    limit = int(request.GET.get('limit', 1))
-
     with connection.cursor() as cursor:
-        offset = (page - 1) * limit
-        cursor.execute("SELECT id, first_name, last_name, phone, address, gender, email, role_type FROM user LIMIT %s OFFSET %s", (limit, offset))
-        # fetch all
-        users = cursor.fetchall()
+        users = UserRepo(cursor)
         # count total users
-        cursor.execute("SELECT COUNT(*) FROM user")
-        total_users = cursor.fetchone()[0]
-        # calculate total pages
-        total_pages = total_users / limit
-        # calculate next page
-        next_page = page + 1 if page < total_pages else None
-        # calculate prev page
-        prev_page = page - 1 if page > 1 else None
-        # calculate page range
-        page_range = range(1, int(total_pages) + 1)
+        total_users = users.count()
+        pagination = users.page(request, total_users)
+
+    # calculate total pages
+    total_pages = total_users / pagination.limit
+    # calculate page range
+    page_range = range(1, int(total_pages) + 1)
 
-    # paginate user with limit of 2 per page using cursor execute command
-    users_list = []
-    for user in users:
-        user_dict = {
-            'id': user[0],
-            'first_name': user[1],
-            'last_name': user[2],
-            'phone': user[3],
-            'address': user[4],
-            'gender': user[5],
-            'email': user[6],
-            'role_type': user[7]
-        }
-        users_list.append(user_dict)
     # return the list of users with pagination details like page, limit, total_pages, next_page, prev_page
     context = {
-        'users': users_list,
+        'users': pagination.rows,
         'total_pages': int(total_pages),
-        'page': page,
-        'limit': limit,
-        'next_page': int(next_page) if next_page else None,
-        'prev_page': int(prev_page) if prev_page else None,
+        'page': pagination.page,
+        'limit': pagination.limit,
+        'next_page': pagination.next_page,
+        'prev_page': pagination.prev_page,
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
         'page_range': page_range,
     }
 
@@ -191,13 +272,10 @@ def create_user(request):
             if role_type == 'super_admin':
                 is_staff, is_superuser = True, True
 
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO user (first_name, last_name, email, phone, dob, gender, address, role_type, "
-                    "password, is_staff, is_superuser) "
-                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                    [first_name, last_name, email, phone, dob, gender, address, role_type, password, is_staff, is_superuser]
-                )
+            with transaction.atomic(), connection.cursor() as cursor:
+                UserRepo(cursor).insert(
+                    first_name, last_name, email, phone, dob, gender, address, role_type,
+                    password, is_staff, is_superuser)
 
             return redirect('core:user_list')
     else:
@@ -212,39 +290,29 @@ def update_user(request, user_id):
     # Update an existing user record [Role Access: super_admin]
 
     with connection.cursor() as cursor:
-        cursor.execute("SELECT id, first_name, last_name, email, phone, dob, gender, address, role_type FROM user WHERE id = %s", [user_id])
-        user = cursor.fetchone()
-
-    if not user:
-        return redirect('core:user_list')
-
-    if request.method == 'POST':
-        form = UserUpdateForm(request.POST)
-        if form.is_valid():
-            first_name = form.cleaned_data['first_name']
-            last_name = form.cleaned_data['last_name']
-            email = form.cleaned_data['email']
-            phone = form.cleaned_data['phone']
-            dob = form.cleaned_data['dob']
-            gender = form.cleaned_data['gender']
-            address = form.cleaned_data['address']
-            role_type = form.cleaned_data['role_type']
-
-            with connection.cursor() as cursor:
-                cursor.execute("UPDATE user SET first_name = %s, last_name = %s, email = %s, phone = %s, dob = %s, gender = %s, address = %s, role_type = %s WHERE id = %s", [first_name, last_name, email, phone, dob, gender, address, role_type, user_id])
+        users = UserRepo(cursor)
+        user = users.get(user_id)
 
+        if not user:
             return redirect('core:user_list')
-    else:
-        form = UserUpdateForm(initial={
-            'first_name': user[1],
-            'last_name': user[2],
-            'email': user[3],
-            'phone': user[4],
-            'dob': user[5],
-            'gender': user[6],
-            'address': user[7],
-            'role_type': user[8]
-        })
+
+        if request.method == 'POST':
+            form = UserUpdateForm(request.POST)
+            if form.is_valid():
+                first_name = form.cleaned_data['first_name']
+                last_name = form.cleaned_data['last_name']
+                email = form.cleaned_data['email']
+                phone = form.cleaned_data['phone']
+                dob = form.cleaned_data['dob']
+                gender = form.cleaned_data['gender']
+                address = form.cleaned_data['address']
+                role_type = form.cleaned_data['role_type']
+
+                users.update(user_id, first_name, last_name, email, phone, dob, gender, address, role_type)
+
+                return redirect('core:user_list')
+        else:
+            form = UserUpdateForm(initial=user._asdict())
 
     return render(request, 'user/update_user.html', {'form': form, 'user': user})
 
@@ -254,69 +322,64 @@ def update_user(request, user_id):
 def delete_user(request, user_id):
     # Delete a user record [Role Access: super_admin]
 
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT id FROM user WHERE id = %s", [user_id])
-        user = cursor.fetchone()
-
-    if not user:
-        return redirect('core:user_list')
-
-    with connection.cursor() as cursor:
-        cursor.execute("DELETE FROM user WHERE id = %s", [user_id])
+    with transaction.atomic(), connection.cursor() as cursor:
+        users = UserRepo(cursor)
+        if users.get(user_id):
+            users.delete(user_id)
 
     return redirect('core:user_list')
 
 
-@login_required
-@super_admin_and_artist_manager_required
-def artist_list(request):
-    # List the user records with pagination [Role Access: super_admin]
-    page = int(request.GET.get('page', 1))
-    limit = int(request.GET.get('limit', 1))
+def render_artist_table(request):
+    # The cached table of artist_list, shared by the sync and async views
+    with read_connection().cursor() as cursor:
+        key = page_key(request, 'artist_list', get_version(cursor, ARTIST_VERSION))
+        table = PAGE_CACHE.get(key)
+        if table is None:
+            artists = ArtistRepo(cursor)
+            # count total artists
+            total_artists = artists.count()
+            pagination = artists.page(request, total_artists)
 
-    with connection.cursor() as cursor:
-        offset = (page - 1) * limit
-        cursor.execute("SELECT name, dob, gender, address, first_release_year, no_of_albums_released, id FROM core_artist LIMIT %s OFFSET %s", (limit, offset))
-
-        # fetch all
-        artists = cursor.fetchall()
-        # count total users
-        cursor.execute("SELECT COUNT(*) FROM core_artist")
-        total_artists = cursor.fetchone()[0]
+    if table is None:
         # calculate total pages
-        total_pages = total_artists / limit
-        # calculate next page
-        next_page = page + 1 if page < total_pages else None
-        # calculate prev page
-        prev_page = page - 1 if page > 1 else None
+        total_pages = total_artists / pagination.limit
         # calculate page range
         page_range = range(1, int(total_pages) + 1)
 
-    # paginate artist with limit of 2 per page using cursor execute command
-    artists_list = []
-    for artist in artists:
-        artist_dict = {
-            'name': artist[0],
-            'dob': artist[1],
-            'gender': artist[2],
-            'address': artist[3],
-            'first_release_year': artist[4],
-            'no_of_albums_released': artist[5],
-            'id': artist[6]
+        # render the list of artists with pagination details like page, limit, total_pages, next_page, prev_page
+        context = {
+            'artists': pagination.rows,
+            'total_pages': int(total_pages),
+            'page': pagination.page,
+            'limit': pagination.limit,
+            'next_page': pagination.next_page,
+            'prev_page': pagination.prev_page,
+            'next_cursor': pagination.next_cursor,
+            'prev_cursor': pagination.prev_cursor,
+            'page_range': page_range,
         }
-        artists_list.append(artist_dict)
-    # return the list of artists with pagination details like page, limit, total_pages, next_page, prev_page
-    context = {
-        'artists': artists_list,
-        'total_pages': int(total_pages),
-        'page': page,
-        'limit': limit,
-        'next_page': int(next_page) if next_page else None,
-        'prev_page': int(prev_page) if prev_page else None,
-        'page_range': page_range,
-    }
+        table = render_to_string('artist/artist_table.html', context, request)
+        PAGE_CACHE.set(key, table)
+
+    return table
+
+
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+def artist_list(request):
+    # List the user records with pagination [Role Access: super_admin]
+    return render(request, 'artist/artist_list.html', {'table': render_artist_table(request)})
 
-    return render(request, 'artist/artist_list.html', context)
+
+@async_login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+async def async_artist_list(request):
+    # artist_list for ASGI servers, the table is built on the DB pool
+    table = await run_db(render_artist_table, request)
+    return render(request, 'artist/artist_list.html', {'table': table})
 
 
 @login_required
@@ -335,14 +398,14 @@ def create_artist(request):
             no_of_albums_released = form.cleaned_data['no_of_albums_released']
             user = form.cleaned_data['user']
 
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO core_artist (user_id, name, dob, gender, address, first_release_year, no_of_albums_released) "
-                    "VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                    [user.id, name, dob, gender, address, first_release_year, no_of_albums_released]
-                )
-
-            return redirect('core:artist_list')
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    ArtistRepo(cursor).insert(
+                        user.id, name, dob, gender, address, first_release_year, no_of_albums_released)
+            except IntegrityError:
+                form.add_error(None, duplicate_artist_message())
+            else:
+                return redirect('core:artist_list')
     else:
         form = ArtistForm()
 
@@ -355,35 +418,31 @@ def update_artist(request, artist_id):
     # Update an existing artist record [Role Access: super_admin]
 
     with connection.cursor() as cursor:
-        cursor.execute("SELECT id, name, dob, gender, address, first_release_year, no_of_albums_released FROM core_artist WHERE id = %s", [artist_id])
-        artist = cursor.fetchone()
-
-    if not artist:
-        return redirect('core:artist_list')
-
-    if request.method == 'POST':
-        form = ArtistUpdateForm(request.POST)
-        if form.is_valid():
-            name = form.cleaned_data['name']
-            dob = form.cleaned_data['dob']
-            gender = form.cleaned_data['gender']
-            address = form.cleaned_data['address']
-            first_release_year = form.cleaned_data['first_release_year']
-            no_of_albums_released = form.cleaned_data['no_of_albums_released']
-
-            with connection.cursor() as cursor:
-                cursor.execute("UPDATE core_artist SET name = %s, dob = %s, gender = %s, address = %s, first_release_year = %s, no_of_albums_released = %s WHERE id = %s", [name, dob, gender, address, first_release_year, no_of_albums_released, artist_id])
+        artists = ArtistRepo(cursor)
+        artist = artists.get(artist_id)
 
+        if not artist:
             return redirect('core:artist_list')
-    else:
-        form = ArtistUpdateForm(initial={
-            'name': artist[1],
-            'dob': artist[2],
-            'gender': artist[3],
-            'address': artist[4],
-            'first_release_year': artist[5],
-            'no_of_albums_released': artist[6]
-        })
+
+        if request.method == 'POST':
+            form = ArtistUpdateForm(request.POST)
+            if form.is_valid():
+                name = form.cleaned_data['name']
+                dob = form.cleaned_data['dob']
+                gender = form.cleaned_data['gender']
+                address = form.cleaned_data['address']
+                first_release_year = form.cleaned_data['first_release_year']
+                no_of_albums_released = form.cleaned_data['no_of_albums_released']
+
+                try:
+                    with transaction.atomic():
+                        artists.update(artist, name, dob, gender, address, first_release_year, no_of_albums_released)
+                except IntegrityError:
+                    form.add_error(None, duplicate_artist_message())
+                else:
+                    return redirect('core:artist_list')
+        else:
+            form = ArtistUpdateForm(initial=artist._asdict())
 
     return render(request, 'artist/update_artist.html', {'form': form, 'artist': artist})
 
@@ -391,137 +450,349 @@ def update_artist(request, artist_id):
 @login_required
 @super_admin_and_artist_manager_required
 def delete_artist(request, artist_id):
-    # Delete an artist record [Role Access: super_admin]
+    # Delete an artist record along with their songs, purged later by `purge_artists` [Role Access: super_admin]
 
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT id FROM core_artist WHERE id = %s", [artist_id])
-        artist = cursor.fetchone()
+    with transaction.atomic(), connection.cursor() as cursor:
+        artists = ArtistRepo(cursor)
+        artist = artists.get(artist_id)
+        if artist:
+            artists.delete(artist)
 
-    if not artist:
-        return redirect('core:artist_list')
+    return redirect('core:artist_list')
 
-    with connection.cursor() as cursor:
-        cursor.execute("DELETE FROM core_artist WHERE id = %s", [artist_id])
 
-    return redirect('core:artist_list')
+def bulk_response(request, result, *redirect_to):
+    # Affected counts as JSON for API clients, as a message on the list page for the browser form
+    if not request.accepts('text/html') and request.accepts('application/json'):
+        return JsonResponse(result, status=400 if 'errors' in result else 200)
+    if 'errors' in result:
+        messages.error(request, ' '.join(
+            error['message'] for errors in result['errors'].values() for error in errors))
+    else:
+        messages.success(request, result['message'])
+    return redirect(*redirect_to)
 
 
 @login_required
 @super_admin_and_artist_manager_required
-def import_artist_csv(request):
+@require_POST
+def bulk_artists(request):
+    # Delete the artists ticked on the list page, along with their songs [Role Access: super_admin, artist_manager]
+    form = BulkArtistForm(request.POST)
+    if not form.is_valid():
+        return bulk_response(request, {'errors': form.errors.get_json_data()}, 'core:artist_list')
+
+    ids = form.cleaned_data['ids']
+    with transaction.atomic(), connection.cursor() as cursor:
+        artists, songs = ArtistRepo(cursor).bulk_delete(ids)
+
+    return bulk_response(request, {
+        'action': 'delete',
+        'selected': len(ids),
+        'artists': artists,
+        'songs': songs,
+        'message': f'Deleted {artists} artist(s) and {songs} song(s).',
+    }, 'core:artist_list')
+
+
+def handle_csv_import(request, form_class, kind, importer, template_name, upsert_importer=None):
+    # Shared flow of the CSV import views, large files become background jobs
+    result = None
 
     if request.method == 'POST':
-        form = ArtistImportForm(request.POST, request.FILES)
+        form = form_class(request.POST, request.FILES)
         if form.is_valid():
             csv_file = request.FILES['csv_file']
             if not csv_file.name.endswith('.csv'):
-                return redirect('core:import_artist_csv')
-
-            # Read and process the CSV file
-            decoded_file = csv_file.read().decode('utf-8').splitlines()
-            reader = csv.reader(decoded_file)
-            headers = next(reader)
-            imported_artists = []
-
-            for row in reader:
-                name = row[0]
-                dob = row[1]
-                gender = row[2]
-                address = row[3]
-                first_release_year = row[4]
-                no_of_albums_released = row[5]
-
-                # Create the artist record
-                with connection.cursor() as cursor:
-                    cursor.execute(
-                        "INSERT INTO core_artist (name, dob, gender, address, first_release_year, no_of_albums_released) "
-                        "VALUES (%s, %s, %s, %s, %s, %s)",
-                        [name, dob, gender, address, first_release_year, no_of_albums_released]
-                    )
-
-                imported_artists.append(row)
-
-            return redirect('core:artist_list')
+                return redirect(request.path)
+            mode = form.cleaned_data.get('mode') or 'insert'
+
+            # Large files are handed to the import worker, the request returns at once
+            if form.cleaned_data['in_background'] or csv_file.size > settings.IMPORT_INLINE_MAX_SIZE:
+                job = ImportJob.objects.create(
+                    kind=kind, mode=mode, file=csv_file, batch_size=form.cleaned_data['batch_size'],
+                    created_by=request.user)
+                return redirect('core:import_job', job_id=job.id)
+
+            # Stream the CSV file into the table in batches
+            if mode == 'upsert':
+                importer = upsert_importer
+            try:
+                result = importer(csv_file, form.cleaned_data['batch_size'])
+            except CsvHeaderError as exc:
+                form.add_error('csv_file', str(exc))
+            else:
+                form = form_class()
     else:
-        form = ArtistImportForm()
+        form = form_class()
+
+    return render(request, template_name, {'form': form, 'result': result})
+
+
+@login_required
+@super_admin_required
+def import_user_csv(request):
+    return handle_csv_import(request, UserImportForm, 'user', import_users, 'user/import_user_csv.html')
+
 
-    return render(request, 'artist/import_artist_csv.html', {'form': form})
+@login_required
+@super_admin_and_artist_manager_required
+def import_artist_csv(request):
+    return handle_csv_import(
+        request, ArtistImportForm, 'artist', import_artists, 'artist/import_artist_csv.html', upsert_artists)
+
+
+@login_required
+@super_admin_and_artist_manager_required
+def import_job(request, job_id):
+    # Show the progress of a background import job, polling import_job_progress
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return render(request, 'artist/import_job.html', {'job': job})
 
 
 @login_required
 @super_admin_and_artist_manager_required
+def import_job_progress(request, job_id):
+    # Report rows done, rows failed and throughput of an import job
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'rows_done': job.rows_done,
+        'rows_failed': job.rows_failed,
+        'rows_updated': job.rows_updated,
+        'rows_skipped': job.rows_skipped,
+        'elapsed': round(job.elapsed, 3),
+        'rows_per_second': round(job.throughput, 1),
+        'error': job.error,
+        'error_report': reverse('core:import_error_report', args=[job.error_report]) if job.error_report else None,
+    })
+
+
+@login_required
+@super_admin_and_artist_manager_required
+def import_error_report(request, token):
+    # Download the rows an import rejected, with their line number and the reason
+    path = error_report_path(token)
+    if path is None or not default_storage.exists(path):
+        raise Http404('No such error report')
+    return FileResponse(
+        default_storage.open(path, 'rb'), as_attachment=True, filename=f'import-errors-{token[:8]}.csv',
+        content_type='text/csv')
+
+
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
 def export_artist_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="artists.csv"'
+    # Stream the artists as CSV, `?gzip=1` compresses it on the fly
+    encoder = ExportEncoder('csv', ARTIST_EXPORT_HEADERS, columns=ARTIST_EXPORT_COLUMNS)
+    rows = stream_export(encoder, ARTIST_EXPORT_ENGINE_SQL, using=current_read_alias.get())
+    return export_response(request, rows, encoder, 'artists', gzip_stream)
 
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Date of Birth', 'Gender', 'Address', 'First Release Year', 'Number of Albums Released'])
 
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT name, dob, gender, address, first_release_year, no_of_albums_released FROM core_artist")
-        artists = cursor.fetchall()
-
-        for artist in artists:
-            writer.writerow([
-                artist[0],
-                artist[1],
-                artist[2],
-                artist[3],
-                artist[4],
-                artist[5]
-            ])
+@async_login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+async def async_export_artist_csv(request):
+    # export_artist_csv for ASGI servers, Django would buffer a sync stream in memory there
+    encoder = ExportEncoder('csv', ARTIST_EXPORT_HEADERS, columns=ARTIST_EXPORT_COLUMNS)
+    rows = astream_export(encoder, ARTIST_EXPORT_ENGINE_AFTER_SQL, using=current_read_alias.get())
+    return export_response(request, rows, encoder, 'artists', agzip_stream)
+
+
+@login_required
+@super_admin_required
+def import_music_csv(request):
+    # Bulk import songs of many artists, resolved by artist name [Role Access: super_admin]
+    return handle_csv_import(request, MusicImportForm, 'music', import_music, 'music/import_song_csv.html')
+
 
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+def export_music_csv(request):
+    # Stream the songs joined with their artist as CSV, `?gzip=1` compresses it on the fly
+    encoder = ExportEncoder('csv', MUSIC_EXPORT_HEADERS, columns=MUSIC_EXPORT_COLUMNS)
+    rows = stream_export(encoder, MUSIC_EXPORT_ENGINE_SQL, using=current_read_alias.get())
+    return export_response(request, rows, encoder, 'songs', gzip_stream)
+
+
+def export_params(request, fields):
+    # (encoder, after_id, error) from `?format=`, `?after_id=` and `?trailer=`
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return None, None, JsonResponse(
+            {'error': f'Unknown format, use one of: {", ".join(EXPORT_FORMATS)}'}, status=400)
+    try:
+        after_id = int(request.GET.get('after_id', 0))
+    except ValueError:
+        after_id = -1
+    if after_id < 0:
+        return None, None, JsonResponse({'error': 'after_id must be a non-negative integer'}, status=400)
+    trailer = request.GET.get('trailer')
+    encoder = ExportEncoder(export_format, fields, after_id, None if trailer is None else trailer not in ('0', 'false'))
+    return encoder, after_id, None
+
+
+def download_response(request, chunks, filename, content_type, gzip=gzip_stream):
+    # Streamed download of every export, gzipped on the fly with `?gzip=1`
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(gzip(chunks), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.gz"'
+    else:
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
+def export_response(request, chunks, encoder, name, gzip):
+    # Streamed export in the encoder's format
+    return download_response(
+        request, chunks, f'{name}.{encoder.format.extension}', encoder.format.content_type, gzip)
+
+
 @login_required
-@super_admin_and_artist_manager_and_artist_required
-def song_list(request, artist_id):
-    # Display the list of songs/music for a specific artist [Role Access: super_admin, admin]
-    if request.user.role_type not in ['super_admin', 'admin']:
-        return redirect('core:dashboard')
-    page = int(request.GET.get('page', 1))
-    limit = int(request.GET.get('limit', 1))
+@super_admin_and_artist_manager_required
+@replica_reads
+def export_artists(request):
+    # Stream the artists as `?format=csv|ndjson`, `?after_id=` resumes a broken download
+    encoder, after_id, error = export_params(request, ARTIST_EXPORT_FIELDS)
+    if error is not None:
+        return error
+    chunks = stream_export(encoder, ARTIST_EXPORT_ENGINE_SQL, after_id, using=current_read_alias.get())
+    return export_response(request, chunks, encoder, 'artists', gzip_stream)
 
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT id, title, album_name FROM core_music WHERE artist_relation_id = %s", [artist_id])
-        songs = cursor.fetchall()
 
-        # count total songs
-        cursor.execute("SELECT COUNT(*) FROM core_music")
-        total_songs = cursor.fetchone()[0]
+@async_login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+async def async_export_artists(request):
+    # export_artists for ASGI servers
+    encoder, after_id, error = export_params(request, ARTIST_EXPORT_FIELDS)
+    if error is not None:
+        return error
+    chunks = astream_export(encoder, ARTIST_EXPORT_ENGINE_AFTER_SQL, after_id, using=current_read_alias.get())
+    return export_response(request, chunks, encoder, 'artists', agzip_stream)
+
+
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+def export_music(request):
+    # Stream the songs with their artist as `?format=csv|ndjson`, `?after_id=` resumes a broken download
+    encoder, after_id, error = export_params(request, MUSIC_EXPORT_FIELDS)
+    if error is not None:
+        return error
+    chunks = stream_export(encoder, MUSIC_EXPORT_ENGINE_SQL, after_id, using=current_read_alias.get())
+    return export_response(request, chunks, encoder, 'songs', gzip_stream)
+
+
+def delta_response(request, table, headers, filename):
+    # Rows of `table` changed since `?token=`, everything without one. The token for the
+    # next pull comes back in the X-Sync-Token header, before the rows are streamed
+    token = request.GET.get('token')
+    until = None
+    if token:
+        until = read_sync_token(token, table)
+        if until is None:
+            return JsonResponse({'error': 'Invalid sync token'}, status=400)
+
+    # on the replica the pull stops where its copy of the primary does, a later `until`
+    # would skip the rows committed since the last sync for good
+    with read_connection().cursor() as cursor:
+        since, until = delta_window(cursor, until, replica_until())
+    if since is None:
+        return JsonResponse({'error': 'Sync token expired, pull again without a token'}, status=410)
+
+    rows = stream_delta_csv(headers, DELTA_QUERIES[table], since, until, using=current_read_alias.get())
+    response = download_response(request, rows, filename, 'text/csv')
+    response['X-Sync-Token'] = make_sync_token(table, until)
+    return response
+
+
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+def export_artist_delta(request):
+    # Stream the artists created, updated or deleted since `?token=` as CSV
+    return delta_response(request, 'core_artist', ARTIST_DELTA_HEADERS, 'artists-delta.csv')
+
+
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+def export_music_delta(request):
+    # Stream the songs created, updated or deleted since `?token=` as CSV
+    return delta_response(request, 'core_music', MUSIC_DELTA_HEADERS, 'songs-delta.csv')
+
+
+def render_song_table(request, artist_id):
+    # The cached table of song_list, shared by the sync and async views
+    with read_connection().cursor() as cursor:
+        key = page_key(request, 'song_list', get_version(cursor, music_version(artist_id)), artist_id)
+        table = PAGE_CACHE.get(key)
+        if table is None:
+            songs = MusicRepo(cursor)
+            # count total songs of the artist
+            total_songs = songs.count(artist_id)
+            pagination = songs.page(request, total_songs, artist_id)
+
+    if table is None:
         # calculate total pages
-        total_pages = total_songs / limit
-        # calculate next page
-        next_page = page + 1 if page < total_pages else None
-        # calculate prev page
-        prev_page = page - 1 if page > 1 else None
+        total_pages = total_songs / pagination.limit
         # calculate page range
         page_range = range(1, int(total_pages) + 1)
 
-    # paginate artist with limit of 2 per page using cursor execute command
-    songs_list = []
-    for song in songs:
-        print(len(song))
-        song_dict = {
-            'id': song[0],
-            'title': song[1],
-            'album_name': song[2],
+        # render the list of songs with pagination details like page, limit, total_pages, next_page, prev_page
+        context = {
+            'songs': pagination.rows,
+            'artist_id': artist_id,
+            'total_pages': int(total_pages),
+            'page': pagination.page,
+            'limit': pagination.limit,
+            'next_page': pagination.next_page,
+            'prev_page': pagination.prev_page,
+            'next_cursor': pagination.next_cursor,
+            'prev_cursor': pagination.prev_cursor,
+            'page_range': page_range,
         }
-        songs_list.append(song_dict)
-    # return the list of songs with pagination details like page, limit, total_pages, next_page, prev_page
-    context = {
-        'songs': songs_list,
+        table = render_to_string('music/song_table.html', context, request)
+        PAGE_CACHE.set(key, table)
+
+    return table
+
+
+def song_list_context(artist_id, table):
+    # The bulk action form sits outside the cached table, it carries the CSRF token
+    return {
+        'table': table,
         'artist_id': artist_id,
-        'total_pages': int(total_pages),
-        'page': page,
-        'limit': limit,
-        'next_page': int(next_page) if next_page else None,
-        'prev_page': int(prev_page) if prev_page else None,
-        'page_range': page_range,
+        'bulk_actions': BULK_SONG_ACTION_CHOICES,
+        'genres': GENRE_CHOICES,
     }
 
-    return render(request, 'music/song_list.html', context)
+
+@login_required
+@super_admin_and_artist_manager_and_artist_required
+@replica_reads
+def song_list(request, artist_id):
+    # Display the list of songs/music for a specific artist [Role Access: super_admin, admin]
+    if request.user.role_type not in ['super_admin', 'admin']:
+        return redirect('core:dashboard')
+    return render(request, 'music/song_list.html', song_list_context(artist_id, render_song_table(request, artist_id)))
+
+
+@async_login_required
+@super_admin_and_artist_manager_and_artist_required
+@replica_reads
+async def async_song_list(request, artist_id):
+    # song_list for ASGI servers, the table is built on the DB pool
+    if request.user.role_type not in ['super_admin', 'admin']:
+        return redirect('core:dashboard')
+    table = await run_db(render_song_table, request, artist_id)
+    return render(request, 'music/song_list.html', song_list_context(artist_id, table))
 
 
 @login_required
@@ -538,9 +809,10 @@ def create_song(request, artist_id):
             album_name = form.cleaned_data['album_name']
             genre = form.cleaned_data['genre']
 
-            with connection.cursor() as cursor:
-                cursor.execute("INSERT INTO core_music (artist_relation_id, title, album_name, genre) VALUES (%s, %s, %s, %s)",
-                               [artist_id, title, album_name, genre])
+            with transaction.atomic(), connection.cursor() as cursor:
+                # a deleted artist's songs are about to be purged
+                if ArtistRepo(cursor).get(artist_id):
+                    MusicRepo(cursor).insert(artist_id, title, album_name, genre)
 
             return redirect('core:song_list', artist_id=artist_id)
 
@@ -558,32 +830,26 @@ def update_song(request, artist_id, song_id):
         return redirect('core:dashboard')
 
     with connection.cursor() as cursor:
-        cursor.execute("SELECT id, title, album_name, genre FROM core_music WHERE artist_relation_id = %s AND id = %s",
-                       [artist_id, song_id])
-        song = cursor.fetchone()
+        songs = MusicRepo(cursor)
+        song = songs.get(artist_id, song_id)
 
-    if not song:
-        return redirect('core:song_list', artist_id=artist_id)
+        if not song:
+            return redirect('core:song_list', artist_id=artist_id)
 
-    if request.method == 'POST':
-        form = MusicForm(request.POST)
-        if form.is_valid():
-            title = form.cleaned_data['title']
-            album_name = form.cleaned_data['album_name']
-            genre = form.cleaned_data['genre']
+        if request.method == 'POST':
+            form = MusicForm(request.POST)
+            if form.is_valid():
+                title = form.cleaned_data['title']
+                album_name = form.cleaned_data['album_name']
+                genre = form.cleaned_data['genre']
 
-            with connection.cursor() as cursor:
-                cursor.execute("UPDATE core_music SET title = %s, album_name = %s, genre = %s WHERE artist_relation_id = %s AND id = %s",
-                               [title, album_name, genre, artist_id, song_id])
+                with transaction.atomic():
+                    songs.update(artist_id, song, title, album_name, genre)
 
-            return redirect('core:song_list', artist_id=artist_id)
+                return redirect('core:song_list', artist_id=artist_id)
 
-    else:
-        form = MusicForm(initial={
-            'title': song[1],
-            'album_name': song[2],
-            'genre': song[3]
-        })
+        else:
+            form = MusicForm(initial=song._asdict())
 
     return render(request, 'music/update_song.html', {'form': form, 'song': song, 'artist_id': artist_id})
 
@@ -595,7 +861,84 @@ def delete_song(request, artist_id, song_id):
     if request.user.role_type != 'super_admin':
         return redirect('core:dashboard')
 
-    with connection.cursor() as cursor:
-        cursor.execute("DELETE FROM core_music WHERE artist_relation_id = %s AND id = %s", [artist_id, song_id])
+    with transaction.atomic(), connection.cursor() as cursor:
+        songs = MusicRepo(cursor)
+        song = songs.get(artist_id, song_id)
+        if song:
+            songs.delete(artist_id, song)
+
+    return redirect('core:song_list', artist_id=artist_id)
+
+
+@login_required
+@super_admin_and_artist_required
+@require_POST
+def bulk_songs(request, artist_id):
+    # Delete, change the genre of or move the songs ticked on the list page [Role Access: super_admin]
+    if request.user.role_type != 'super_admin':
+        return redirect('core:dashboard')
+
+    form = BulkSongForm(request.POST)
+    if form.is_valid() and form.cleaned_data['action'] == 'move':
+        target_artist = form.cleaned_data['target_artist']
+        with connection.cursor() as cursor:
+            if target_artist == artist_id or not ArtistRepo(cursor).get(target_artist):
+                form.add_error('target_artist', 'Pick another existing artist.')
+    if not form.is_valid():
+        return bulk_response(request, {'errors': form.errors.get_json_data()}, 'core:song_list', artist_id)
+
+    action, ids = form.cleaned_data['action'], form.cleaned_data['ids']
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not ArtistRepo(cursor).get(artist_id):
+            return redirect('core:artist_list')
+        songs = MusicRepo(cursor)
+        if action == 'delete':
+            affected = songs.bulk_delete(artist_id, ids)
+            message = f'Deleted {affected} song(s).'
+        elif action == 'set_genre':
+            affected = songs.bulk_set_genre(artist_id, ids, form.cleaned_data['genre'])
+            message = f'Changed the genre of {affected} song(s).'
+        else:
+            affected = songs.bulk_move(artist_id, ids, form.cleaned_data['target_artist'])
+            message = f'Moved {affected} song(s).'
+
+    return bulk_response(request, {
+        'action': action,
+        'selected': len(ids),
+        'songs': affected,
+        'message': message,
+    }, 'core:song_list', artist_id)
+
+
+@login_required
+@super_admin_and_artist_manager_required
+@replica_reads
+def search(request):
+    # Ranked full-text search over artists (name, address) or songs (title, album) [Role Access: super_admin, artist_manager]
+    query = request.GET.get('q', '').strip()
+    kind = 'music' if request.GET.get('type') == 'music' else 'artist'
+    page, limit = parse_page(request)
+
+    with read_connection().cursor() as cursor:
+        sql = MUSIC_SEARCH_SQL if kind == 'music' else ARTIST_SEARCH_SQL
+        rows, has_more = run_search(cursor, sql, query, limit, (page - 1) * limit)
+
+    if kind == 'music':
+        results = [
+            {'id': row[0], 'title': row[1], 'album_name': row[2], 'artist_id': row[3], 'artist_name': row[4]}
+            for row in rows
+        ]
+    else:
+        results = [{'id': row[0], 'name': row[1], 'address': row[2]} for row in rows]
+
+    context = {
+        'q': query,
+        'type': kind,
+        'results': results,
+        'page': page,
+        'limit': limit,
+        'next_page': page + 1 if has_more else None,
+        'prev_page': page - 1 if page > 1 else None,
+    }
 
-    return redirect('core:song_list', artist_id=artist_id)
\ No newline at end of file
+    return render(request, 'search.html', context)
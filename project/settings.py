@@ -43,11 +43,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.SnapshotAuthenticationMiddleware',
+    # reads of a client that just wrote go to the primary for a while
+    'core.replica.StickyPrimaryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +59,8 @@ ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to core.metrics
+        'BACKEND': 'core.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR/ "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,7 +84,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Reuse connections across requests, so the pragmas below run once per connection
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Read-only copy of the primary kept in step by `python manage.py sync_replica`,
+    # serves the artist/song lists, exports and search (core.replica)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['core.replica.PrimaryReplicaRouter']
+
+# Pragmas core.sqlite applies to every new SQLite connection. WAL lets the list views read
+# while an import writes, busy_timeout (ms) makes a writer wait for the lock instead of
+# failing with "database is locked". cache_size is in KiB when negative, mmap_size in bytes.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -132,4 +162,112 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+
+# Authentication
+
+# Seconds a signed user snapshot in the session stands in for the `user` row, 0 turns
+# snapshots off. Edits revoke it through the default cache, which must be shared by every
+# server process: the middleware refuses to start on a local-memory one.
+AUTH_SNAPSHOT_TTL = 300
+
+
+# Cache
+
+# Shared by the server processes of this host, point it at memcached or redis to spread over several
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+
+# Async
+
+# Route dashboard, artist/song lists and the artist export to their async views.
+# Turn on when serving project.asgi with uvicorn, under WSGI they only add overhead.
+ASYNC_READ_VIEWS = False
+# Threads async views run their queries on, and so their most open connections
+ASYNC_DB_THREADS = 8
+
+
+# Read replica
+
+# Seconds between two copies of the primary into the replica by `sync_replica`
+REPLICA_SYNC_INTERVAL = 5
+# After a write the client reads from the primary for this long, keep it above the
+# sync interval plus the time one copy takes
+REPLICA_STICKY_SECONDS = 15
+# Reads fall back to the primary when the last complete copy is older than this,
+# e.g. `sync_replica` stopped
+REPLICA_MAX_LAG_SECONDS = 30
+
+
+# Bulk actions
+
+# Every row ticked on a list page is posted as its own `ids` field, Django's default
+# cap of 1000 fields would reject larger selections
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
+
+# Purge
+
+# Deleted artists are only tombstoned, `python manage.py purge_artists` removes them and
+# their songs this many rows per transaction, at most PURGE_ROWS_PER_SECOND on average,
+# once they are older than DELTA_RETENTION_DAYS
+PURGE_CHUNK_SIZE = 500
+PURGE_ROWS_PER_SECOND = 5000
+
+
+# Imports and exports
+
+# Rows inserted per executemany batch (one transaction each) by the CSV imports
+IMPORT_BATCH_SIZE = 1000
+
+# Fields that identify an artist, compared without case and extra whitespace. A live
+# artist with the same values is updated by an upsert import instead of copied, and
+# cannot be created twice. Run `python manage.py rebuild_natural_keys` after a change
+ARTIST_NATURAL_KEY = ['name', 'dob']
+
+# Uploads larger than this (in bytes) are queued as background import jobs,
+# processed by `python manage.py run_import_worker`
+IMPORT_INLINE_MAX_SIZE = 2 * 1024 * 1024
+
+# Running import jobs whose worker has not reported in for this many seconds are failed
+# by the next worker to poll, keep it well above --poll-interval
+IMPORT_JOB_TIMEOUT = 120
+
+# Rows fetched from the database per batch by the streaming exports
+EXPORT_BATCH_SIZE = 2000
+
+# A delta export starts this many seconds before the previous one ended, keep it above
+# the longest write transaction and REPLICA_SYNC_INTERVAL. Rows in the overlap are sent twice
+DELTA_OVERLAP_SECONDS = 60
+
+# Deletions are reported to delta exports for this long, older sync tokens are refused
+# and need a full pull
+DELTA_RETENTION_DAYS = 7
+
+
+# Page cache
+
+# Rendered artist/song list pages kept per process, least recently used are dropped first
+PAGE_CACHE_SIZE = 512
+# Pages larger than this (in bytes) are rendered every time instead of cached
+PAGE_CACHE_MAX_PAGE_SIZE = 256 * 1024
+
+
+# API
+
+# JSON responses at least this large (in bytes) are gzipped for clients that accept it
+API_GZIP_MIN_SIZE = 4 * 1024
+
+
+# Metrics
+
+# Addresses allowed to scrape /metrics/ without logging in
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+# Add a Server-Timing header (sql, render and total time) to every response
+METRICS_SERVER_TIMING = False